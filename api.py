@@ -2,9 +2,10 @@ import asyncio
 import sys
 import os
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query, Body, Response
 from fastapi.responses import HTMLResponse, FileResponse
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from fastapi.staticfiles import StaticFiles
 from logic.clear_logic import (
     limpiar_archivos_temporales,
@@ -13,8 +14,9 @@ from logic.clear_logic import (
     limpiar_registros_enviadas,
 )
 from logic.logs_logic import log, mail_handler
-from robot import ejecutar_robot_endesa, ejecutar_robot_enel
+from robot import ejecutar_robot_endesa, ejecutar_robot_enel, ejecutar_robot_tenants
 from utils.modelos_datos import FacturaEndesa, FacturaEnel
+from utils.pool_navegadores import pool_navegadores
 
 # === 0. CONFIGURACIÓN DEL ENTORNO DE EJECUCIÓN === 
 
@@ -36,17 +38,32 @@ Permite la limpieza de archivos temporales, la ejecución individual por portal
 * **Ejecución Total**: Consolidación de datos de ambos portales en una sola respuesta.
 """
 
-# C. Inicialización de la aplicación FastAPI
+# C. Ciclo de vida: pool de navegadores calientes compartido entre peticiones
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''
+    Arranca el pool de navegadores al iniciar la API y lo detiene al apagarla.
+    Las ejecuciones de los robots arriendan contextos sobre estos navegadores ya lanzados.
+    '''
+    await pool_navegadores.iniciar()
+    try:
+        yield
+    finally:
+        await pool_navegadores.cerrar()
+
+
+# D. Inicialización de la aplicación FastAPI
 app = FastAPI(
     title="RPA GRUPO MAS - FACTURAS ENDESA Y ENEL",
     description=description,
     version="1.0.0",
     contact={
         "name": "Soporte Técnico - Nexo Neural",
-    }
+    },
+    lifespan=lifespan
 )
 
-# D. Montaje de recursos estáticos (Favicon, CSS, imágenes)
+# E. Montaje de recursos estáticos (Favicon, CSS, imágenes)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
@@ -228,6 +245,36 @@ async def run_all(
         raise HTTPException(status_code=500, detail=f"Error en ejecución global: {str(e)}")
 
 
+# RPA.4 Ejecución concurrente de varios tenants (grupos empresariales o cuentas)
+@app.post("/run/tenants/{portal}", response_model=Dict[str, List[Union[FacturaEndesa, FacturaEnel]]], tags=["Robots"], summary="Ejecución Multi-Tenant")
+async def run_tenants(
+    portal: str,
+    fecha_desde: str = Query(..., examples={"default": {"value": "01/10/2025"}}),
+    fecha_hasta: str = Query(..., examples={"default": {"value": "31/10/2025"}}),
+    tenants: Optional[List[str]] = Query(None, description="Tenants a ejecutar (por defecto, todos)."),
+    cups: Optional[List[str]] = Body(None, description="Lista de CUPS para todos los tenants (solo Endesa).")
+):
+    '''
+    Ejecuta el robot del portal para los tenants configurados a la vez, cada uno con su sesión y registros.
+    \nParametros:
+        \n- portal (str): "endesa" o "enel".
+        \n- fecha_desde (str): Inicio del rango.
+        \n- fecha_hasta (str): Fin del rango.
+        \n- tenants (list): Filtro de tenants (opcional).
+        \n- cups (list): Filtro de suministros para Endesa (opcional).
+    \nRetorna
+        \n- dict[str, list]: Facturas extraídas agrupadas por tenant.
+    '''
+    if portal not in ("endesa", "enel"):
+        raise HTTPException(status_code=404, detail=f"Portal desconocido: {portal}")
+    log.info(f"[API] Lanzando Ejecución Multi-Tenant ({portal}). Periodo: {fecha_desde} - {fecha_hasta}")
+    try:
+        return await ejecutar_robot_tenants(portal, fecha_desde, fecha_hasta, cups, tenants)
+    except Exception as e:
+        log.error(f"[API] Error en ejecución multi-tenant: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error en ejecución multi-tenant: {str(e)}")
+
+
 # === 4. INICIO DEL SERVIDOR === 
 
 if __name__ == "__main__":
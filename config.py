@@ -22,6 +22,127 @@ HEADLESS_MODE = os.getenv("HEADLESS_MODE", "True").lower() == "true"
 # Número máximo de reintentos de inicio de sesión antes de lanzar un error crítico
 MAX_LOGIN_ATTEMPTS = 5
 
+# CFG.3 Pool de navegadores compartidos (solo API)
+# Número de procesos Chromium que la API mantiene lanzados entre ejecuciones
+POOL_NAVEGADORES_TAMANO = int(os.getenv("POOL_NAVEGADORES", 1))
+# Segundos entre comprobaciones de salud de los navegadores del pool
+POOL_INTERVALO_SALUD = 30
+
+# CFG.4 Reutilización de sesiones autenticadas (storage_state)
+# Minutos durante los que una sesión guardada se considera reutilizable sin nuevo login
+SESION_TTL_MINUTOS = int(os.getenv("SESION_TTL_MINUTOS", 90))
+
+# CFG.5 Perfil persistente del navegador por portal (caché HTTP de los recursos Lightning/Aura)
+PERFIL_PERSISTENTE = os.getenv("PERFIL_PERSISTENTE", "False").lower() == "true"
+# Tamaño máximo del perfil en disco antes de vaciar sus cachés (MB)
+PERFIL_CACHE_MAX_MB = int(os.getenv("PERFIL_CACHE_MAX_MB", 300))
+
+# CFG.6 Filtrado de peticiones de red (imágenes, fuentes, media, analítica, chats de terceros)
+FILTRO_RED_ACTIVO = os.getenv("FILTRO_RED", "True").lower() == "true"
+
+# CFG.7 Concurrencia de los robots
+# Número de trabajadores (páginas con la sesión compartida) que procesan la lista de CUPS de Endesa en paralelo
+ENDESA_WORKERS_CUPS = max(1, int(os.getenv("ENDESA_WORKERS_CUPS", 2)))
+# Número de roles de Enel procesados a la vez, cada uno en su propio contexto con un login propio (1 = cambio de rol secuencial)
+ENEL_WORKERS_ROLES = max(1, int(os.getenv("ENEL_WORKERS_ROLES", 1)))
+
+# CFG.8 Reciclaje de contextos en ejecuciones largas (0 desactiva cada umbral)
+# Filas procesadas, memoria del renderizador (MB) y minutos de vida antes de abrir un contexto nuevo
+RECICLAJE_MAX_FILAS = int(os.getenv("RECICLAJE_MAX_FILAS", 150))
+RECICLAJE_MAX_MB = int(os.getenv("RECICLAJE_MAX_MB", 400))
+RECICLAJE_MAX_MINUTOS = int(os.getenv("RECICLAJE_MAX_MINUTOS", 20))
+
+# CFG.9 Reintentos de login y cortocircuito por portal
+# Espera base y máxima (segundos) del backoff exponencial con jitter entre intentos de login
+LOGIN_ESPERA_BASE_S = float(os.getenv("LOGIN_ESPERA_BASE_S", 5))
+LOGIN_ESPERA_MAX_S = float(os.getenv("LOGIN_ESPERA_MAX_S", 60))
+# Ejecuciones consecutivas con login fallido que abren el circuito del portal y minutos que permanece abierto
+CIRCUITO_FALLOS_MAX = int(os.getenv("CIRCUITO_FALLOS_MAX", 3))
+CIRCUITO_ENFRIAMIENTO_MINUTOS = int(os.getenv("CIRCUITO_ENFRIAMIENTO_MINUTOS", 30))
+
+# CFG.10 Timeouts adaptativos aprendidos de la latencia observada de cada paso
+LATENCIAS_ADAPTATIVAS = os.getenv("LATENCIAS_ADAPTATIVAS", "True").lower() == "true"
+# Muestras necesarias antes de sustituir el timeout fijo y muestras conservadas por paso
+LATENCIA_MIN_MUESTRAS = 20
+LATENCIA_MAX_MUESTRAS = 500
+# Timeout = p99 observado x margen, acotado entre el suelo (ms) y el valor fijo original como techo
+LATENCIA_MARGEN = 1.5
+LATENCIA_TIMEOUT_MIN_MS = 5000
+# Cociente entre la mediana de la ejecución y la histórica a partir del cual se informa de deriva
+LATENCIA_FACTOR_DERIVA = 2.0
+
+# CFG.11 Cliente HTTP Aura sin navegador (repite por HTTP las búsquedas capturadas en el navegador)
+CLIENTE_AURA_ACTIVO = os.getenv("CLIENTE_AURA", "False").lower() == "true"
+# Peticiones Aura/descargas simultáneas máximas del cliente HTTP
+CLIENTE_AURA_CONCURRENCIA = int(os.getenv("CLIENTE_AURA_CONCURRENCIA", 8))
+
+# CFG.12 Descargas directas de documentos (context.request con la URL aprendida del primer click)
+DESCARGAS_CONCURRENCIA = int(os.getenv("DESCARGAS_CONCURRENCIA", 6))
+
+# CFG.13 Planificador de búsquedas Endesa en modo lista (una búsqueda por CUP o una global filtrada localmente)
+PLANIFICADOR_BUSQUEDAS = os.getenv("PLANIFICADOR_BUSQUEDAS", "True").lower() == "true"
+# Coste estimado (s) de preparar una búsqueda (recarga y filtros) y de leer una página de la tabla, mientras no haya latencias medidas
+PLAN_COSTE_BUSQUEDA_S = 20
+PLAN_COSTE_PAGINA_S = 3
+# Tamaño de lista a partir del cual se usa la búsqueda global si aún no hay histórico de resultados
+PLAN_CUPS_GLOBAL_SIN_HISTORICO = int(os.getenv("PLAN_CUPS_GLOBAL_SIN_HISTORICO", 25))
+
+# CFG.14 Corte de la paginación tras K páginas seguidas con todas sus facturas ya procesadas (0 = desactivado)
+# Solo se aplica si los resultados llegan ordenados por fecha de emisión
+CORTE_PAGINAS_PROCESADAS = int(os.getenv("CORTE_PAGINAS_PROCESADAS", 0))
+
+# CFG.15 División automática del rango de fechas en dos mitades cuando una búsqueda Endesa llega a TABLE_LIMIT
+DIVISION_VENTANAS = os.getenv("DIVISION_VENTANAS", "True").lower() == "true"
+
+# CFG.16 Catálogo de roles Enel guardado entre ejecuciones y sondeo de roles sin facturas recientes
+# Vigencia (horas) de la lista de roles guardada antes de volver a leer el menú (0 = leerlo siempre)
+ROLES_CACHE_HORAS = int(os.getenv("ROLES_CACHE_HORAS", 24))
+# Ejecuciones seguidas sin facturas tras las que un rol se sondea por HTTP antes de procesarlo (0 = sin sondeo)
+ROLES_RONDAS_INACTIVO = int(os.getenv("ROLES_RONDAS_INACTIVO", 3))
+
+# CFG.17 Varios grupos empresariales o cuentas de portal (tenants) en una misma ejecución
+# Fichero JSON con la lista de tenants adicionales al principal (el definido por las variables de este fichero)
+TENANTS_PATH = os.getenv("TENANTS_PATH", "tenants.json")
+# Tenants que se procesan a la vez en las ejecuciones multi-tenant
+TENANTS_CONCURRENCIA = max(1, int(os.getenv("TENANTS_CONCURRENCIA", 2)))
+
+# CFG.18 Predicción del ciclo de facturación de cada CUP Endesa (orden de la lista y descarte de CUPS sin factura prevista)
+# Si es False solo se ordena la lista (primero los CUPS con factura más probable); si es True se omiten los que aún no tocan
+CICLOS_OMITIR = os.getenv("CICLOS_OMITIR", "False").lower() == "true"
+# Facturas conocidas de un CUP necesarias para estimar su ciclo
+CICLOS_MIN_FACTURAS = 3
+# Holgura (días) sobre la fecha de emisión prevista y desviación máxima entre ciclos para considerarlo estable
+CICLOS_MARGEN_DIAS = int(os.getenv("CICLOS_MARGEN_DIAS", 5))
+# Días tras los que una ejecución recorre todos los CUPS sin omitir ninguno (barrido de seguridad)
+CICLOS_BARRIDO_DIAS = int(os.getenv("CICLOS_BARRIDO_DIAS", 7))
+
+# CFG.19 Perfilado del tiempo de cada acción de Playwright (click, fill, esperas, descargas...) por punto del código
+PERFILADOR_ACCIONES = os.getenv("PERFILADOR_ACCIONES", "False").lower() == "true"
+# Puntos del código que se muestran en el informe de cada ejecución y informes que se conservan por portal
+PERFILADOR_TOP = 15
+PERFILADOR_INFORMES_MAX = 20
+
+# CFG.20 Trazas de Playwright en anillo (capturas, DOM y red) que solo se guardan cuando falla un paso
+TRAZAS_FALLOS = os.getenv("TRAZAS_FALLOS", "False").lower() == "true"
+# Duración de cada tramo de traza y tramos anteriores que se conservan (ventana de unos minutos por contexto)
+TRAZAS_TRAMO_S = int(os.getenv("TRAZAS_TRAMO_S", 60))
+TRAZAS_TRAMOS = 3
+# Límite de disco de las trazas guardadas (se borran las más antiguas) y de capturas por contexto en una ejecución
+TRAZAS_MAX_MB = int(os.getenv("TRAZAS_MAX_MB", 500))
+TRAZAS_MAX_CAPTURAS = 10
+
+# CFG.21 Postproceso de facturas en tubería (parseo, OCR, Google, registro y email) mientras el navegador sigue paginando
+# Si es False cada fila se procesa completa antes de pasar a la siguiente
+POSTPROCESO_TUBERIA = os.getenv("POSTPROCESO_TUBERIA", "True").lower() == "true"
+# Facturas que pueden esperar en la cola de cada etapa antes de frenar al navegador
+POSTPROCESO_COLA = int(os.getenv("POSTPROCESO_COLA", 10))
+# Trabajadores simultáneos por etapa (límite común a todas las tablas en curso)
+POSTPROCESO_WORKERS_PARSEO = 4
+POSTPROCESO_WORKERS_OCR = int(os.getenv("POSTPROCESO_WORKERS_OCR", 3))
+# Google va de uno en uno: la búsqueda de fila en la hoja y la creación de la carpeta mensual en Drive no admiten altas simultáneas
+POSTPROCESO_WORKERS_GOOGLE = 1
+POSTPROCESO_WORKERS_EMAIL = int(os.getenv("POSTPROCESO_WORKERS_EMAIL", 2))
+
 
 # === 2. CREDENCIALES Y SECRETOS (Desde .env) ===
 
@@ -102,6 +223,8 @@ GRUPO_EMPRESARIAL = "GRUPO HERMANOS MARTIN"
 # PATH.1 Directorios raíz
 TEMP_DOWNLOAD_ROOT = "temp_downloads"
 REGISTRO_ROOT = os.path.join(TEMP_DOWNLOAD_ROOT, "registros")
+# Descargas y registros de los tenants adicionales (misma estructura bajo una carpeta por tenant)
+TENANTS_ROOT = os.path.join(TEMP_DOWNLOAD_ROOT, "tenants")
 
 # PATH.2 Carpetas de descarga por tipo de documento y portal
 DOWNLOAD_FOLDERS = {
@@ -122,7 +245,20 @@ REGISTRO_FOLDERS_ENVIADAS = {
     "enel": os.path.join(REGISTRO_ROOT, "enel_enviadas"),
 }
 
-# PATH.4 Recursos para Inteligencia Artificial
+# PATH.4 Estado persistente entre ejecuciones (sesiones, históricos, métricas)
+ESTADO_ROOT = os.path.join(TEMP_DOWNLOAD_ROOT, "estado")
+SESIONES_ROOT = os.path.join(ESTADO_ROOT, "sesiones")
+PERFILES_ROOT = os.path.join(ESTADO_ROOT, "perfiles")
+CIRCUITOS_PATH = os.path.join(ESTADO_ROOT, "circuitos.json")
+LATENCIAS_PATH = os.path.join(ESTADO_ROOT, "latencias.json")
+DESCARGAS_PATH = os.path.join(ESTADO_ROOT, "descargas.json")
+BUSQUEDAS_PATH = os.path.join(ESTADO_ROOT, "busquedas.json")
+ROLES_PATH = os.path.join(ESTADO_ROOT, "roles.json")
+CICLOS_PATH = os.path.join(ESTADO_ROOT, "ciclos.json")
+ACCIONES_ROOT = os.path.join(ESTADO_ROOT, "acciones")
+TRAZAS_ROOT = os.path.join(ESTADO_ROOT, "trazas")
+
+# PATH.5 Recursos para Inteligencia Artificial
 PROMPT_ENDESA_PATH = "prompts/prompt_endesa.txt"
 PROMPT_ENEL_PATH = "prompts/prompt_enel.txt"
 
@@ -137,4 +273,8 @@ for folder in REGISTRO_FOLDERS_PROCESADAS.values():
     os.makedirs(folder, exist_ok=True)
 
 for folder in REGISTRO_FOLDERS_ENVIADAS.values():
-    os.makedirs(folder, exist_ok=True)
\ No newline at end of file
+    os.makedirs(folder, exist_ok=True)
+
+# C. Garantizar la existencia de las carpetas de estado persistente
+os.makedirs(SESIONES_ROOT, exist_ok=True)
+os.makedirs(PERFILES_ROOT, exist_ok=True)
\ No newline at end of file
@@ -1,12 +1,12 @@
 import os
 import re
 from datetime import datetime, timedelta
-from config import DOWNLOAD_FOLDERS
 from logic.logs_logic import log, mail_handler
 from parsers.exportar_datos import (
     borrar_registros_procesados,
     borrar_registros_enviadas,
 )
+from utils.tenants import cargar_tenants, usar_tenant
 
 
 # === MANTENIMIENTO Y LIMPIEZA DE RECURSOS === 
@@ -104,7 +104,7 @@ def truncar_log(nivel: str | None = None, retencion_dias: int = 15) -> dict:
 # CLR.2 Borrado selectivo de archivos temporales
 def limpiar_archivos_temporales(portal=None, tipo=None, fecha_filtro=None):
     '''
-    Elimina archivos de las carpetas de descarga aplicando filtros opcionales de origen, formato y fecha.
+    Elimina archivos de las carpetas de descarga de todos los tenants aplicando filtros opcionales de origen, formato y fecha.
     Parametros:
         - portal (str): Filtro por distribuidora ("ENDESA" o "ENEL").
         - tipo (str): Filtro por extensión o categoría ("PDF", "XML", "CSV").
@@ -115,8 +115,13 @@ def limpiar_archivos_temporales(portal=None, tipo=None, fecha_filtro=None):
     conteo_eliminados = 0
     log.info(f"\t[LIMPIEZA] Iniciando purga de archivos temporales (Portal: {portal}, Tipo: {tipo})")
     
-    # A. Iteración sobre el mapeo de carpetas configurado en config.py
-    for clave, ruta in DOWNLOAD_FOLDERS.items():
+    # A. Iteración sobre las carpetas de descarga de cada tenant (las del principal son las de config.py; sin repetir rutas)
+    carpetas = {}
+    for tenant in cargar_tenants():
+        for clave, ruta in tenant.carpetas_descarga.items():
+            carpetas.setdefault(os.path.abspath(ruta), clave)
+
+    for ruta, clave in carpetas.items():
         
         # A.1. Aplicación de filtro por portal (Origen de los datos)
         if portal and portal.upper() not in clave:
@@ -167,14 +172,17 @@ def limpiar_archivos_temporales(portal=None, tipo=None, fecha_filtro=None):
 
 def limpiar_registros_procesados(portal: str | None = None) -> int:
     """
-    Borra los ficheros CSV que contienen el registro de facturas ya procesadas.
+    Borra los ficheros CSV que contienen el registro de facturas ya procesadas, en todos los tenants.
     - `portal` puede ser "ENDESA" o "ENEL" (no sensible a mayúsculas); si se
       omite se eliminan ambos.
     Retorna el número de ficheros eliminados.
     """
     log.info(f"\t[MANTENIMIENTO] Borrando registros de facturas procesadas ({portal or 'TODOS'})")
     clave = portal.lower() if portal else None
-    cont = borrar_registros_procesados(clave)  # función importada del parser
+    cont = 0
+    for tenant in cargar_tenants():
+        with usar_tenant(tenant):
+            cont += borrar_registros_procesados(clave)  # función importada del parser (rutas del tenant activo)
     log.debug(f"Registros procesados eliminados: {cont}")
     return cont
 
@@ -188,6 +196,9 @@ def limpiar_registros_enviadas(portal: str | None = None) -> int:
     """
     log.info(f"\t[MANTENIMIENTO] Borrando históricos de envíos email ({portal or 'TODOS'})")
     clave = portal.lower() if portal else None
-    cont = borrar_registros_enviadas(clave)
+    cont = 0
+    for tenant in cargar_tenants():
+        with usar_tenant(tenant):
+            cont += borrar_registros_enviadas(clave)
     log.debug(f"Registros de envío eliminados: {cont}")
     return cont
\ No newline at end of file
@@ -1,16 +1,36 @@
 import re
 import os
+import asyncio
+from contextlib import aclosing
 from datetime import datetime
+from typing import AsyncIterator
 from playwright.async_api import Page, TimeoutError, Locator
 from utils.modelos_datos import FacturaEndesa
+from utils.reciclaje import ControlReciclaje
+from utils.esperas import esperar_oculto, pulsar_y_esperar_cambio_tabla
+from utils.latencias import registro_latencias
+from utils.formularios import fijar_fecha_flatpickr
+from utils.captura_aura import capturar, completar_fila, decodificar_filas, valor_valido, ALIAS_ENDESA
+from utils.cliente_aura import ClienteAura
+from utils.descargas import gestor_descargas
+from utils.planificador import FiltroCups, FILAS_POR_PAGINA
+from utils.marca_agua import MarcaAgua
+from utils.tenants import tenant_actual
+from utils.trazas import guardar_traza, paso_error
+from utils.tuberia import Etapa, TuberiaFacturas, procesar_etapas
 from logic.logs_logic import log, mail_handler
-from config import DOWNLOAD_FOLDERS, URL_LOGIN_ENDESA, URL_FACTURAS_ENDESA, GRUPO_EMPRESARIAL, TABLE_LIMIT, REPROCESADO, DESTINATARIOS_FACTURAS
+from config import URL_LOGIN_ENDESA, URL_FACTURAS_ENDESA, TABLE_LIMIT, REPROCESADO, POSTPROCESO_WORKERS_PARSEO, POSTPROCESO_WORKERS_OCR, POSTPROCESO_WORKERS_GOOGLE, POSTPROCESO_WORKERS_EMAIL
 from parsers.xml_parser_endesa import procesar_xml_local_endesa
 from parsers.pdf_parser_endesa import procesar_pdf_local_endesa
-from parsers.exportar_datos import insertar_factura_en_csv, es_factura_procesada, registrar_factura_procesada, es_factura_enviada, registrar_factura_enviada
+from parsers.exportar_datos import insertar_factura_en_csv, es_factura_procesada, registrar_factura_procesada, registrar_factura_enviada, reservar_envio, liberar_envio
 from logic.google_logic import registrar_factura_google_endesa
 from logic.mail_logic import enviar_factura_email
 
+# Selector de las filas de la tabla de resultados de facturas
+FILAS_TABLA_ENDESA = 'table#example1 tbody tr'
+# Campo del modelo que corresponde a cada columna de la tabla (en orden)
+CAMPOS_TABLA_ENDESA = ["fecha_emision", "numero_factura", "fecha_inicio_periodo", "fecha_fin_periodo", "importe_total", "contrato",
+                       "cup", "secuencial", "estado_factura", "fraccionamiento", "tipo_factura"]
 
 # === FUNCIONES AUXILIARES PARA CARGA Y PROCESADO DE DATOS DE ENDESA  === #
 
@@ -30,31 +50,87 @@ def _clean_and_convert_float(text: str) -> float:
         return 0.0
     
 
-# AUX.2 Extracción de texto de una celda
-async def _extraer_texto_de_td(td: Locator) -> str:
+# AUX.2 Lectura en bloque de las filas de la tabla
+# Replica en el navegador la lectura de cada celda: texto de la fecha, botón o enlace si existe, o el texto de la celda
+_JS_LEER_FILA_ENDESA = """
+(tr) => {
+    const texto = (td) => {
+        if (!td) return "";
+        const elemento = td.querySelector("lightning-formatted-date-time, button, a");
+        if (elemento) return (elemento.innerText || "").trim();
+        const t = td.innerText || "";
+        return t.includes("No hay resultados") ? "" : t.trim();
+    };
+    const tds = tr.querySelectorAll("td");
+    const boton = tds[13] ? tds[13].querySelector("button") : null;
+    return {
+        celdas: Array.from(tds).map(texto),
+        descarga_selector: boton ? (boton.getAttribute("value") || "") : "",
+    };
+}
+"""
+
+async def _leer_filas_tabla_endesa(page: Page) -> list[dict]:
     '''
-    Extrae texto de una celda de tabla.
+    Lee en una sola llamada al navegador los textos de todas las filas visibles de la tabla de resultados.
     Parametros:
-        td (Locator): Localizador web de la celda a extraer
+        page (Page): Pagina web del navegador
     Retorna:
-        str: El valor textual de la celda
+        list[dict]: Una entrada por fila con "celdas" (textos de cada td) y "descarga_selector" (value del botón PDF)
     '''
-    try:
-    # A. Dentro de la celda busca los siguiente elementos para extraer el texto (fechas, enlaces o botones)
-        lightning_element = td.locator("lightning-formatted-date-time, button, a")
-           
-        # A.1 Si lo encuentra extrae el texto del elemento en cuestion (fecha, enlace o boton)
-        if await lightning_element.count() > 0:
-            return (await lightning_element.first.inner_text()).strip() 
-        
-        # A.2 Si no encuentra los localizadores extrae el texto directamente.
-        text = await td.inner_text() 
+    return await page.locator(FILAS_TABLA_ENDESA).evaluate_all(f"(filas) => filas.map({_JS_LEER_FILA_ENDESA})")
+
 
-        # A.3 Si hay algun tipo de fallo devuelve una cadena vacía
-        return text.strip() if "No hay resultados" not in text else ""
+def _construir_factura_endesa(datos: dict, capturada: dict | None = None) -> FacturaEndesa:
+    '''
+    Crea el objeto Factura a partir de los textos de una fila leídos con `_leer_filas_tabla_endesa`.
+    Las celdas vacías o aún en "Cargando..." se completan con la fila capturada de la respuesta Aura, si la hay.
+    Parametros:
+        datos (dict): Entrada de una fila con "celdas" y "descarga_selector"
+        capturada (dict): Opcional. Fila decodificada de la captura Aura con el mismo número de factura
+    Retorna:
+        FacturaEndesa: Factura con los datos directos de la tabla
+    '''
+    campos = dict(zip(CAMPOS_TABLA_ENDESA, datos["celdas"] + [""] * (len(CAMPOS_TABLA_ENDESA) - len(datos["celdas"]))))
+    campos = completar_fila(campos, capturada)
+    return FacturaEndesa(
+        fecha_emision=campos["fecha_emision"],
+        numero_factura=campos["numero_factura"],
+        fecha_inicio_periodo=campos["fecha_inicio_periodo"],
+        fecha_fin_periodo=campos["fecha_fin_periodo"],
+        importe_total=_clean_and_convert_float(campos["importe_total"]),
+        contrato=campos["contrato"],
+        cup=campos["cup"],
+        secuencial=campos["secuencial"],
+        estado_factura=campos["estado_factura"],
+        fraccionamiento=campos["fraccionamiento"],
+        tipo_factura=campos["tipo_factura"],
+        descarga_selector=datos["descarga_selector"]
+    )
+
+
+# AUX.2.1 Comprobación de que la captura Aura cubre la página visible
+async def _pagina_cubierta_por_captura(page: Page) -> bool:
+    '''
+    Indica si las respuestas Aura capturadas ya contienen los datos dinámicos (importe, estado y fraccionamiento)
+    de todas las facturas visibles, en cuyo caso no hace falta esperar a que la tabla los pinte.
+    Parametros:
+        page (Page): Pagina web del navegador
+    Retorna:
+        bool: True si todas las filas visibles están en la captura con sus datos dinámicos
+    '''
+    try:
+        numeros = await page.locator(FILAS_TABLA_ENDESA).evaluate_all(
+            "(filas) => filas.map(f => { const td = f.querySelectorAll('td')[1]; return td ? td.innerText.trim() : ''; })"
+        )
     except Exception:
-        return ""
-    
+        return False
+    if not numeros or not all(numeros):
+        return False
+    capturadas = {f["numero_factura"]: f for f in capturar(page).filas(ALIAS_ENDESA)}
+    dinamicos = {"importe_total", "estado_factura", "fraccionamiento"}
+    return all(n in capturadas and all(valor_valido(c, capturadas[n].get(c)) for c in dinamicos) for n in numeros)
+
 
 # AUX.3 Espera que cargue la página de la tabla de resultados
 async def _wait_for_data_load(page: Page, timeout: int = 90000) -> bool:
@@ -72,21 +148,23 @@ async def _wait_for_data_load(page: Page, timeout: int = 90000) -> bool:
     fraccionamiento_cell_selector = 'table#example1 tbody tr:nth-child(1) td:nth-child(10)'
     
     try:
-    # B. Esperamos que se carguen los datos por un máximo de timeout definido
-        log.debug(f"Esperando carga de datos dinámicos en la tabla (Timeout: {timeout}ms)")
-        await page.locator(importe_cell_selector).filter(
-            has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
-        ).wait_for(state="visible", timeout=timeout)
-        
-        await page.locator(estado_cell_selector).filter(
-            has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
-        ).wait_for(state="visible", timeout=timeout)
-        
-        await page.locator(fraccionamiento_cell_selector).filter(
-            has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
-        ).wait_for(state="visible", timeout=timeout)
+    # B. Esperamos que se carguen los datos por un máximo de timeout (adaptado a la latencia observada)
+        with registro_latencias.medir("endesa", "carga_datos", timeout) as medicion:
+            timeout = medicion.timeout
+            log.debug(f"Esperando carga de datos dinámicos en la tabla (Timeout: {timeout}ms)")
+            await page.locator(importe_cell_selector).filter(
+                has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
+            ).wait_for(state="visible", timeout=timeout)
+            
+            await page.locator(estado_cell_selector).filter(
+                has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
+            ).wait_for(state="visible", timeout=timeout)
+            
+            await page.locator(fraccionamiento_cell_selector).filter(
+                has_not_text=re.compile(r"(Cargando|\.\.\.)", re.IGNORECASE)
+            ).wait_for(state="visible", timeout=timeout)
 
-        await page.locator('span.pagination-flex-central').wait_for(state="visible", timeout=timeout)
+            await page.locator('span.pagination-flex-central').wait_for(state="visible", timeout=timeout)
 
     # C. Si han cargado, devolvemos True y confirmamos
         log.info("    -> [OK] Tabla cargada correctamente")
@@ -98,10 +176,34 @@ async def _wait_for_data_load(page: Page, timeout: int = 90000) -> bool:
         return False
 
 
+# AUX.4.1 Ruta local y datos de la fila que identifican cada documento
+def _ruta_descarga_endesa(factura: FacturaEndesa, doc_type: str) -> str:
+    '''
+    Construye la ruta donde se guarda el PDF o XML de una factura.
+    Parametros:
+        - factura (FacturaEndesa): Factura a la que pertenece el archivo
+        - doc_type (str): Formato del archivo. PDF o XML
+    Retorna:
+        - str: Ruta local del archivo
+    '''
+    fecha = datetime.strptime(factura.fecha_fin_periodo, "%d/%m/%Y")
+    mes = fecha.strftime("%m")
+    anio = fecha.strftime("%Y")
+
+    filename = f"{anio}{mes}_{factura.cup}_{factura.numero_factura}_ENDESA.{doc_type.lower()}"
+    return os.path.join(tenant_actual().carpetas_descarga[doc_type+"_ENDESA"], filename)
+
+
+def _claves_descarga_endesa(factura: FacturaEndesa) -> dict[str, str]:
+    # Datos de la fila que pueden formar parte de la URL del documento (para la descarga directa)
+    return {"descarga_selector": factura.descarga_selector, "numero_factura": factura.numero_factura}
+
+
 # AUX.4 Descarga de archivos mediante botenes de la tabla de resultados
 async def _descargar_archivo(page: Page, row: Locator, factura: FacturaEndesa, doc_type: str)->str | None:
     '''
     Intenta descargar un tipo de archivo (PDF, XML) haciendo clic en el botón de la fila y guardándolo localmente.
+    Si ya se conoce la URL del documento (aprendida de una descarga anterior) se descarga directamente sin click.
     Parametros:
         - page (Page): Pagina web del navegador
         - row (Locator): Localizador web de la fila de la que se quiere descargar los archivos
@@ -115,11 +217,9 @@ async def _descargar_archivo(page: Page, row: Locator, factura: FacturaEndesa, d
     doc_type = doc_type.upper()
     if doc_type == 'PDF':
         button_col_index = 13
-        file_ext = 'pdf'
         button_locator_selector = f'button[value*="{factura.descarga_selector}"]' 
     elif doc_type == 'XML':
         button_col_index = 11
-        file_ext = 'xml'
         button_locator_selector = 'button:has-text("@")' 
     else:
         return None
@@ -127,25 +227,26 @@ async def _descargar_archivo(page: Page, row: Locator, factura: FacturaEndesa, d
     button_locator = row.locator(f'td').nth(button_col_index).locator(button_locator_selector)
     
     # B. Definimos la ruta donde se descargara el archivo
-    target_folder = DOWNLOAD_FOLDERS[doc_type+"_ENDESA"]
-
-    fecha = datetime.strptime(factura.fecha_fin_periodo, "%d/%m/%Y")
-    mes = fecha.strftime("%m")
-    anio = fecha.strftime("%Y")
-
-    filename = f"{anio}{mes}_{factura.cup}_{factura.numero_factura}_ENDESA.{file_ext}" 
-    save_path = os.path.join(target_folder, filename)
+    save_path = _ruta_descarga_endesa(factura, doc_type)
+    claves = _claves_descarga_endesa(factura)
 
     # C. Proceso de descarga
     try:
+        # C.0. Descarga directa por la URL aprendida (o recogida de la descarga anticipada de la página)
+        if await gestor_descargas.descargar(page.context, "endesa", doc_type, claves, save_path):
+            log.info(f"\t   -> [OK] [DESCARGA {doc_type}] Guardado en: {save_path} (directa)")
+            return save_path
+
         # C.1. Pulsamos el boton
         log.debug(f"Iniciando descarga de {doc_type} para factura {factura.numero_factura}")
-        async with page.expect_download(timeout=30000) as download_info:
-            await button_locator.click(timeout=10000)
-        # C.2 Leemos los valores del archivo descargado en el navegador
-        download = await download_info.value
-        # C.3 Guardamos localmente el archivo
+        with registro_latencias.medir("endesa", "descarga", 30000) as medicion:
+            async with page.expect_download(timeout=medicion.timeout) as download_info:
+                await button_locator.click(timeout=10000)
+            # C.2 Leemos los valores del archivo descargado en el navegador
+            download = await download_info.value
+        # C.3 Guardamos localmente el archivo y aprendemos su URL para las siguientes descargas
         await download.save_as(save_path)
+        gestor_descargas.aprender("endesa", doc_type, download.url, claves)
         
     # D. Si se ha descargado correctamente, informamos y devolvemos la ruta del archivo descargado
         log.info(f"\t   -> [OK] [DESCARGA {doc_type}] Guardado en: {save_path}")
@@ -169,6 +270,8 @@ async def _descargar_archivo(page: Page, row: Locator, factura: FacturaEndesa, d
 async def _seleccionar_fecha_flatpickr(page: Page, input_selector: Locator, fecha_str: str)-> bool:
     """
     Interactúa con el calendario dinámico de Flatpickr.
+    Primero fija la fecha con `setDate` de la instancia flatpickr; si no se puede o no queda aplicada,
+    recorre el calendario en la interfaz (año, mes y día).
     Parametros:
         - page (Page): Pagina web del navegador
         - input_selector (Locator): Localizador web del campo de fecha a rellenar
@@ -176,6 +279,11 @@ async def _seleccionar_fecha_flatpickr(page: Page, input_selector: Locator, fech
     Retorna:
         - bool: Devuelve True si se ha seleccionado la fecha correctamente, False en caso de cualquier error
     """
+    # 0. Vía rápida: asignación directa sobre la instancia flatpickr
+    if await fijar_fecha_flatpickr(input_selector, fecha_str):
+        log.debug(f"Fecha {fecha_str} fijada con setDate en Flatpickr")
+        return True
+
     try:
         # A. Abrir el calendario haciendo click
         await input_selector.click()
@@ -202,8 +310,8 @@ async def _seleccionar_fecha_flatpickr(page: Page, input_selector: Locator, fech
         dia_selector = calendar.locator('.flatpickr-day').filter(has_text=re.compile(f"^{int(dia)}$")).first
         await dia_selector.click()
         
-        # Espera breve para que el calendario se cierre
-        await page.wait_for_timeout(300)
+        # Espera a que el calendario se cierre
+        await esperar_oculto(calendar)
         log.debug(f"Fecha {fecha_str} seleccionada correctamente en Flatpickr")
         return True
     
@@ -214,40 +322,31 @@ async def _seleccionar_fecha_flatpickr(page: Page, input_selector: Locator, fech
 
 # === FUNCIONES PARA LECTURA Y EXTRACCION DE DATOS  === #
 
-# DATA.1 Extraccion y procesado de los datos copletos de una fila de la tabla de resultados
-async def _extraer_datos_fila_endesa(page: Page, row: Locator) -> FacturaEndesa | None:
+# DATA.1 Extraccion de los datos de una fila de la tabla de resultados y descarga de sus archivos
+async def _descargar_fila_endesa(page: Page, row: Locator, datos: dict | None = None, capturada: dict | None = None) -> tuple[FacturaEndesa, str | None, str | None] | None:
     '''
     Para una fila de la tabla de resultados, extrae los datos completos directos de la fila, 
-    llama a las funciones de descarga de los archivos XML y PDF de la fila,
-    llama a las funciones de parseo y procesado de los archivos XML o PDF (según corresponda) extrayendo los datos de las facturas,
-    y crea y devuelve un objeto de la clase Factura con todos los datos actualizados.
+    crea un objeto de la clase Factura y llama a las funciones de descarga de los archivos XML y PDF de la fila.
+    Es la única parte del procesado de la fila que usa el navegador; el parseo, OCR, Google, registro y email
+    son las etapas de DATA.1.1 y se ejecutan aparte (ver `TuberiaFacturas`).
     Parametros:
         - page (Page): Pagina web del navegador
         - row (Locator): Localizador web de la fila de la que se quiere procesar
+        - datos (dict): Opcional. Textos de la fila ya leídos en bloque; si se omite se leen de la fila
+        - capturada (dict): Opcional. Datos de la misma factura capturados de la respuesta Aura
     Retorna:
-        - FacturaEndesa: Factura con todos los datos extraidos durante el procesado de la fila y los archivos
-        - None: Unicamente si ni si quiera ha podido extrear los datos de la fila.
+        - tuple: Factura con los datos de la fila y rutas del PDF y del XML descargados (None si no se han podido descargar)
+        - None: Si la fila está vacía, la factura ya estaba procesada o no se han podido extraer los datos de la fila.
     '''
     
     try:
     # A. Extracción de datos de las celdas de la fila y creación del objeto Factura
-        
-        tds = row.locator("td")
-
-        factura = FacturaEndesa(
-            fecha_emision=await _extraer_texto_de_td(tds.nth(0)),
-            numero_factura=await _extraer_texto_de_td(tds.nth(1)),
-            fecha_inicio_periodo=await _extraer_texto_de_td(tds.nth(2)),
-            fecha_fin_periodo=await _extraer_texto_de_td(tds.nth(3)),
-            importe_total=_clean_and_convert_float(await _extraer_texto_de_td(tds.nth(4))),
-            contrato=await _extraer_texto_de_td(tds.nth(5)),
-            cup=await _extraer_texto_de_td(tds.nth(6)),
-            secuencial=await _extraer_texto_de_td(tds.nth(7)),
-            estado_factura=await _extraer_texto_de_td(tds.nth(8)),
-            fraccionamiento=await _extraer_texto_de_td(tds.nth(9)),
-            tipo_factura=await _extraer_texto_de_td(tds.nth(10)),
-            descarga_selector=await tds.nth(13).locator('button').get_attribute("value") or ""
-        )
+        if datos is None:
+            datos = await row.evaluate(_JS_LEER_FILA_ENDESA)
+        if not any(datos["celdas"]):
+            log.debug("Fila sin datos (tabla vacía), se omite.")
+            return None
+        factura = _construir_factura_endesa(datos, capturada)
     
         log.info(f"\t\t[OK] Datos extraídos correctamente de la fila de la tabla: {factura.numero_factura}")
 
@@ -261,190 +360,411 @@ async def _extraer_datos_fila_endesa(page: Page, row: Locator) -> FacturaEndesa
     # B. Descarga de archivos PDF y XML
         pdf_path = await _descargar_archivo(page, row, factura, 'PDF')
         xml_path = await _descargar_archivo(page, row, factura, 'XML')
+        return factura, pdf_path, xml_path
+    
+    # C. Si no se ha podido procesar nada de la fila se informa y se devuelve None
+    except Exception as e:
+        log.error(f"\t\t   -->[ERROR] Fallo al extraer datos de fila: {str(e)}", exc_info=True)
+        # La traza se etiqueta con la factura de la fila (número en la celda 1, CUP en la 6), si llegó a leerse
+        celdas = (datos or {}).get("celdas") or []
+        await guardar_traza(page, celdas[6] if len(celdas) > 6 else None, celdas[1] if len(celdas) > 1 else None,
+                            paso=f"fila-{type(e).__name__}")
+        return None
+
 
+# DATA.1.1 Etapas del postproceso de una factura descargada (no usan el navegador)
+# Todas reciben la factura y las rutas de sus documentos, y la modifican en el sitio
 
-    # C. Procesamiento de archivos descargados, extracción de datos adicionales y actualizacion de objeto Factura
+# DATA.1.1.1 Parseo del XML de la factura
+async def _parsear_xml_endesa(factura: FacturaEndesa, pdf_path: str | None, xml_path: str | None) -> None:
+    '''
+    Completa la factura con los datos del XML descargado, que tiene prioridad sobre el PDF.
+    Parametros:
+        - factura (FacturaEndesa): Factura con los datos de la tabla.
+        - pdf_path (str): Ruta del PDF descargado (None si no se descargó).
+        - xml_path (str): Ruta del XML descargado (None si no se descargó).
+    '''
+    # A. Si se ha podido descargar el archivo XML se procesa este archivo con prioridad
+    if xml_path:
+        log.info(f"\t\t[XML PROCESSING] {factura.numero_factura}")
+        exito_xml = await asyncio.to_thread(procesar_xml_local_endesa, factura, xml_path)
+
+        # A.1 Si no se ha podido procesar el XML se registra el error
+        if not exito_xml:
+            log.error(f"\t\t   -> [ERROR XML] Fallo al extraer datos del XML para factura {factura.numero_factura} ({factura.cup})")
+            factura.error_RPA = True
+            factura.msg_error_RPA = "ERROR_PARSEO: El archivo XML no contenía datos válidos o estaba incompleto."
+    
+    # B. Si no se ha descargado el XML se anota el aviso (la etapa de OCR procesará el PDF)
+    else:
+        log.warning(f"\t\t   -> [ADVERTENCIA XML] No se descargó el XML para factura {factura.numero_factura}")
+        factura.error_RPA = False
+        factura.msg_error_RPA += "ERROR_FILES: El archivo XML no se ha podido descargar."
 
-        # C.1. Si se ha podido descargar el archivo XML se procesa este archivocon prioridad
-        if xml_path:
-            log.info(f"\t\t[XML PROCESSING]")
-            exito_xml = procesar_xml_local_endesa(factura, xml_path)
 
-            # C.1.1 Si no se ha podido procesar el XML se registra el error
-            if not exito_xml:
-                log.error(f"\t\t   -> [ERROR XML] Fallo al extraer datos del XML para factura {factura.numero_factura} ({factura.cup})")
-                factura.error_RPA = True
-                factura.msg_error_RPA = "ERROR_PARSEO: El archivo XML no contenía datos válidos o estaba incompleto."
-        
-        # C.2. Si no se ha descargado el XML, se procesa el PDF
-        else:
-            log.warning(f"\t\t   -> [ADVERTENCIA XML] No se descargó el XML para factura {factura.numero_factura}")
-            factura.error_RPA = False
-            factura.msg_error_RPA += "ERROR_FILES: El archivo XML no se ha podido descargar."
-            
-            # C.2.1 Procesamos el PDF mediante OCR
-        if not xml_path and pdf_path:
-            log.info(f"\t\t[PDF OCR]")
-            exito_pdf = procesar_pdf_local_endesa(factura, pdf_path)
-        
-            # C.2.2 Si no se ha podido procesar el PDF se registra el error
-            if not exito_pdf:
-                log.error(f"\t\t   -> [ERROR PDF] Fallo al extraer datos del PDF para factura {factura.numero_factura} ({factura.cup})")
-                factura.error_RPA = True
-                factura.msg_error_RPA += " ERROR_PARSEO: El archivo PDF no contenía datos válidos o estaba incompleto."
-                
-        # C.3. Si no se ha descargado ni el XML ni el PDF, se registra el error y se devuelve la factura solo con los datos básico de la tabla.
-        if not xml_path and not pdf_path:
+# DATA.1.1.2 OCR del PDF cuando no hay XML
+async def _ocr_pdf_endesa(factura: FacturaEndesa, pdf_path: str | None, xml_path: str | None) -> None:
+    '''
+    Completa la factura con el OCR del PDF si no se descargó el XML, y marca el error si no hay ningún documento.
+    Parametros:
+        - factura (FacturaEndesa): Factura con los datos de la tabla.
+        - pdf_path (str): Ruta del PDF descargado (None si no se descargó).
+        - xml_path (str): Ruta del XML descargado (None si no se descargó).
+    '''
+    # A. Procesamos el PDF mediante OCR
+    if not xml_path and pdf_path:
+        log.info(f"\t\t[PDF OCR] {factura.numero_factura}")
+        exito_pdf = await asyncio.to_thread(procesar_pdf_local_endesa, factura, pdf_path)
+    
+        # A.1 Si no se ha podido procesar el PDF se registra el error
+        if not exito_pdf:
+            log.error(f"\t\t   -> [ERROR PDF] Fallo al extraer datos del PDF para factura {factura.numero_factura} ({factura.cup})")
             factura.error_RPA = True
-            factura.msg_error_RPA = "ERROR_DESCARGA: No se pudo descargar ningún archivo (XML/PDF) para esta factura."
-            log.error(f"\t\t[!] Fallo crítico: No hay archivos descargables para factura {factura.numero_factura}")
-        
-        # D. Insertar datos en CSV
-        csv_path = os.path.join(DOWNLOAD_FOLDERS["CSV_ENDESA"],"facturas_endesa.csv")
-        if csv_path:
-            log.debug(f"Insertando registro de factura {factura.numero_factura} en CSV histórico")
-            insertar_factura_en_csv(factura, csv_path)
-
-        # E. Registrar datos en Google Sheets y subir PDF a Google Drive
-        log.info(f"\t\t[GOOGLE SHEETS/DRIVE]")
+            factura.msg_error_RPA += " ERROR_PARSEO: El archivo PDF no contenía datos válidos o estaba incompleto."
+            
+    # B. Si no se ha descargado ni el XML ni el PDF, se registra el error y la factura se queda con los datos básicos de la tabla
+    if not xml_path and not pdf_path:
+        factura.error_RPA = True
+        factura.msg_error_RPA = "ERROR_DESCARGA: No se pudo descargar ningún archivo (XML/PDF) para esta factura."
+        log.error(f"\t\t[!] Fallo crítico: No hay archivos descargables para factura {factura.numero_factura}")
+
+
+# DATA.1.1.3 Volcado al CSV histórico y a Google Sheets / Drive
+async def _sincronizar_google_endesa(factura: FacturaEndesa, pdf_path: str | None, xml_path: str | None) -> None:
+    '''
+    Inserta la factura en el CSV histórico del tenant, la registra en Google Sheets y sube su PDF a Google Drive.
+    Parametros:
+        - factura (FacturaEndesa): Factura ya parseada.
+        - pdf_path (str): Ruta del PDF descargado (None si no se descargó).
+        - xml_path (str): Ruta del XML descargado (no se usa en esta etapa).
+    '''
+    # A. Insertar datos en CSV
+    csv_path = os.path.join(tenant_actual().carpetas_descarga["CSV_ENDESA"],"facturas_endesa.csv")
+    if csv_path:
+        log.debug(f"Insertando registro de factura {factura.numero_factura} en CSV histórico")
+        insertar_factura_en_csv(factura, csv_path)
+
+    # B. Registrar datos en Google Sheets y subir PDF a Google Drive (en un hilo: el cliente de Google es síncrono)
+    log.info(f"\t\t[GOOGLE SHEETS/DRIVE] {factura.numero_factura}")
+    try:
+        factura.procesada = True
+        await asyncio.to_thread(registrar_factura_google_endesa, factura, pdf_path)
+        log.info(f"\t\t   -> [OK] [GOOGLE] Registro y subida completados para factura {factura.numero_factura}")
+    except Exception as e_google:
+        factura.procesada = False
+        factura.error_RPA = True
+        factura.msg_error_RPA += " ERROR_GOOGLE: Fallo al registrar en Google Sheets o subir a Google Drive."
+        log.error(f"\t\t   --> [ERROR GOOGLE] Fallo en sincronización: {str(e_google)}")
+
+
+# DATA.1.1.4 Registro de la factura como procesada
+async def _registrar_procesada_endesa(factura: FacturaEndesa, pdf_path: str | None, xml_path: str | None) -> None:
+    '''
+    Añade la factura al registro de procesadas si ha pasado las etapas anteriores sin errores.
+    Va antes del email: una ejecución posterior ya no vuelve a descargarla aunque el envío esté en curso o falle
+    (el reintento del email lo gobierna el registro de enviadas).
+    Parametros:
+        - factura (FacturaEndesa): Factura ya sincronizada.
+        - pdf_path (str): No se usa en esta etapa.
+        - xml_path (str): No se usa en esta etapa.
+    '''
+    if not factura.error_RPA and factura.cup and factura.numero_factura:
         try:
-            # pdf_path es la variable que ya tienes definida en tu código con la ruta local del archivo
             factura.procesada = True
-            registrar_factura_google_endesa(factura, pdf_path)
-            log.info(f"\t\t   -> [OK] [GOOGLE] Registro y subida completados para factura {factura.numero_factura}")
-        except Exception as e_google:
+            registrar_factura_procesada("endesa", factura.cup, factura.numero_factura)
+            log.info(f"\t\t[REGISTRO] Factura {factura.numero_factura} marcada como procesada.")
+        except Exception:
             factura.procesada = False
-            factura.error_RPA = True
-            factura.msg_error_RPA += " ERROR_GOOGLE: Fallo al registrar en Google Sheets o subir a Google Drive."
-            log.error(f"\t\t   --> [ERROR GOOGLE] Fallo en sincronización: {str(e_google)}")
+            pass
 
-        # F. Si todo ha ido bien sin errores RPA añadimos el registro de procesada
-        if not factura.error_RPA and factura.cup and factura.numero_factura:
-            try:
-                factura.procesada = True
-                registrar_factura_procesada("endesa", factura.cup, factura.numero_factura)
-                log.info(f"\t\t[REGISTRO] Factura {factura.numero_factura} marcada como procesada.")
-            except Exception:
-                factura.procesada = False
-                pass
-
-        # G. Envio de Factura por correo.
-        log.info(f"\t\t[EMAIL SENDING]")
-        if pdf_path and not factura.error_RPA:
-            # Listado de correos ledo desde la configuracin (.env via config.py)
-            lista_distribucion = DESTINATARIOS_FACTURAS
-
-            if not es_factura_enviada("endesa", factura.cup, factura.numero_factura):
-                # Llamada asíncrona al envío
-                exito_mail = await enviar_factura_email(
-                    destinatarios=lista_distribucion,
-                    ruta_pdf=pdf_path,
-                    numero_factura=factura.numero_factura,
-                    cup=factura.cup
-                )
-            
-            else:
-                exito_mail = True
-                log.info(f"\t\t   [SKIP] La factura {factura.numero_factura} ya fue enviada previamente.")
-            
-            if exito_mail:
-                registrar_factura_enviada("endesa", factura.cup, factura.numero_factura)
-                log.debug(f"Email enviado correctamente: {factura.numero_factura}")
-            else:
-                factura.msg_error_RPA += " | Error en envío de email."
-                log.error(f"\t\t   [ERROR] Fallo en el envío de email para la factura {factura.numero_factura} ({factura.cup})")
 
-        # H. Devolvemos la factura con los datos extraidos y procesados.
-        return factura
-    
-        # I. Si no se ha podido procesar nada de la fila se informa y se devuelve None
+# DATA.1.1.5 Envío de la factura por correo
+async def _enviar_email_endesa(factura: FacturaEndesa, pdf_path: str | None, xml_path: str | None) -> None:
+    '''
+    Envía el PDF de la factura a los destinatarios del tenant, salvo que ya conste como enviada o la esté
+    enviando otra tubería de este proceso (`reservar_envio`), y registra el envío.
+    Parametros:
+        - factura (FacturaEndesa): Factura ya registrada.
+        - pdf_path (str): Ruta del PDF que se adjunta (sin PDF no se envía).
+        - xml_path (str): No se usa en esta etapa.
+    '''
+    log.info(f"\t\t[EMAIL SENDING] {factura.numero_factura}")
+    if not pdf_path or factura.error_RPA:
+        return
+
+    # A. Reserva del envío: si ya se envió (o se está enviando) no se repite
+    if not reservar_envio("endesa", factura.cup, factura.numero_factura):
+        log.info(f"\t\t   [SKIP] La factura {factura.numero_factura} ya fue enviada previamente.")
+        return
+
+    # B. Envío a la lista de correos del tenant en curso (el principal la lee de .env via config.py) y registro
+    try:
+        exito_mail = await enviar_factura_email(
+            destinatarios=tenant_actual().destinatarios,
+            ruta_pdf=pdf_path,
+            numero_factura=factura.numero_factura,
+            cup=factura.cup
+        )
+        if exito_mail:
+            registrar_factura_enviada("endesa", factura.cup, factura.numero_factura)
+            log.debug(f"Email enviado correctamente: {factura.numero_factura}")
+        else:
+            factura.msg_error_RPA += " | Error en envío de email."
+            log.error(f"\t\t   [ERROR] Fallo en el envío de email para la factura {factura.numero_factura} ({factura.cup})")
+    finally:
+        liberar_envio("endesa", factura.cup, factura.numero_factura)
+
+
+# Etapas del postproceso en orden, con sus trabajadores simultáneos (el registro de procesadas va de uno en uno
+# y antes del email, para que la factura conste como procesada aunque el envío tarde o falle)
+ETAPAS_ENDESA = [
+    Etapa("parseo", _parsear_xml_endesa, POSTPROCESO_WORKERS_PARSEO),
+    Etapa("ocr", _ocr_pdf_endesa, POSTPROCESO_WORKERS_OCR),
+    Etapa("google", _sincronizar_google_endesa, POSTPROCESO_WORKERS_GOOGLE),
+    Etapa("registro", _registrar_procesada_endesa, 1),
+    Etapa("email", _enviar_email_endesa, POSTPROCESO_WORKERS_EMAIL),
+]
+
+
+# DATA.1.2 Extraccion y procesado completo de una fila (sin tubería)
+async def _extraer_datos_fila_endesa(page: Page, row: Locator, datos: dict | None = None, capturada: dict | None = None) -> FacturaEndesa | None:
+    '''
+    Descarga la fila con `_descargar_fila_endesa` y ejecuta sobre ella todas las etapas del postproceso antes de volver.
+    Retorna:
+        - FacturaEndesa: Factura con todos los datos extraidos durante el procesado de la fila y los archivos
+        - None: Si la fila no se ha descargado o el postproceso ha fallado.
+    '''
+    descargada = await _descargar_fila_endesa(page, row, datos, capturada)
+    if descargada is None:
+        return None
+    try:
+        return await procesar_etapas(ETAPAS_ENDESA, *descargada)
     except Exception as e:
-        log.error(f"\t\t   -->[ERROR] Fallo al extraer datos de fila: {str(e)}", exc_info=True)
+        log.error(f"\t\t   -->[ERROR] Fallo al procesar la factura {descargada[0].numero_factura}: {str(e)}", exc_info=True)
         return None
     
 
 # DATA.2 Bucle de lectura para todas las filas de una página de la tabla de resultados
-async def _extraer_pagina_actual_endesa(page: Page, page_index: int) -> list[FacturaEndesa]:
+async def _iterar_pagina_actual_endesa(page: Page, page_index: int, filtro_cups: FiltroCups | None = None, datos_filas: list[dict] | None = None,
+                                       tuberia: TuberiaFacturas | None = None) -> AsyncIterator[FacturaEndesa]:
     '''
     Realiza un bucle que recorre todas las filas de la página visible de la tabla de resultados, llamando en cada iteración a la funcion de procesado de dicha fila
     Parametros:
         - page (Page): Pagina web del navegador
         - page_index (int): Indice numerico de la página de la tabla en la que se encuentra
+        - filtro_cups (FiltroCups): Opcional. Solo se procesan las filas de los CUPS del filtro (búsqueda global de una lista)
+        - datos_filas (list[dict]): Opcional. Filas ya leídas con `_leer_filas_tabla_endesa`; si se omite se leen aquí
+        - tuberia (TuberiaFacturas): Opcional. Postproceso compartido por toda la tabla; si se omite cada fila se procesa completa
     Retorna:
-        - list[FacturaEndesa]: Una lista de objetos del tipo factura donde se han registrado todos los datos de las filas que se han procesado
+        - AsyncIterator[FacturaEndesa]: Las facturas que terminan su postproceso mientras se recorre la página
     '''
 
-    facturas: list[FacturaEndesa] = []
+    anticipadas: list[str] = []
+    tuberia = tuberia or TuberiaFacturas(ETAPAS_ENDESA, activa=False)
     try:
 
     # A. Identificación de los localizadores web de las distintas filas 
-        rows = page.locator('table#example1 tbody tr')
-        row_count = await rows.count()
+        rows = page.locator(FILAS_TABLA_ENDESA)
+
+        # A.1. Lectura en bloque de los textos de todas las filas (una sola llamada al navegador)
+        if datos_filas is None:
+            datos_filas = await _leer_filas_tabla_endesa(page)
+        row_count = len(datos_filas)
         log.debug(f"Detectadas {row_count} filas en la página {page_index}")
 
+        # A.2. Filas de la respuesta Aura de la búsqueda, para completar celdas aún sin pintar
+        capturadas = {f["numero_factura"]: f for f in capturar(page).filas(ALIAS_ENDESA)}
+
+        # A.3. Descarga anticipada de los documentos de la página (solo si ya se conoce su URL)
+        _precargar_documentos_endesa(page, datos_filas, capturadas, anticipadas, filtro_cups)
+
     # B. Bucle para recorer cada una de las filas
         for i in range(row_count):
+            # B.0 En la búsqueda global de una lista se omiten las filas de CUPS no solicitados
+            celdas = datos_filas[i]["celdas"]
+            numero = celdas[1] if len(celdas) > 1 else ""
+            if filtro_cups and any(celdas) and not filtro_cups.admite(celdas[6] if len(celdas) > 6 else "", numero):
+                log.debug(f"Fila {numero} de un CUP no solicitado, se omite.")
+                continue
+
             log.info(f"\n\t[ROW {(i+1)+5*(page_index-1)}] {'='*40}")
             row = rows.nth(i)
             
-            # B.1 Procesado y extraccion de la fila iterada
-            factura = await _extraer_datos_fila_endesa(page, row)
+            # B.1 Extraccion de la fila iterada y descarga de sus archivos (el localizador se usa solo para las descargas)
+            descargada = await _descargar_fila_endesa(page, row, datos_filas[i], capturadas.get(numero))
             
-            # B.2 Si la fila se ha procesado correctamente, se añade la factura a la lista
-            if factura:
-                facturas.append(factura)
-        
-    # C. Devolvemos el listado de facturas procesadas
-        return facturas
+            # B.2 La factura descargada pasa al postproceso (si falló en el navegador se guarda su traza)
+            if descargada:
+                factura = descargada[0]
+                paso = paso_error(factura.msg_error_RPA)
+                if paso:
+                    await guardar_traza(page, factura.cup, factura.numero_factura, paso)
+                await tuberia.enviar(*descargada)
+
+            # B.3 Se entregan las facturas que ya han terminado su postproceso
+            for factura in tuberia.terminadas():
+                yield factura
     
-    # D. Si hay algún fallo se devuelve la lista en su estado actual y se informa del error
+    # C. Si hay algún fallo se detiene la página (las facturas ya entregadas se conservan) y se informa del error
     except Exception as e:
         log.error(f"\t   -->[ERROR] Fallo al extraer datos de la Página {page_index}: {str(e)}")
-        return facturas
+        await guardar_traza(page, paso=type(e).__name__)
 
+    # D. Se cancelan las descargas anticipadas que no se han llegado a usar
+    finally:
+        gestor_descargas.cancelar_pendientes(anticipadas)
 
-# DATA.3 Bucle de lectura consciente para todas las páginas de la tabla
-async def _extraer_tabla_facturas_endesa(page: Page) -> list[FacturaEndesa]:
+
+# DATA.2.1 Descarga anticipada de los documentos de la página visible
+def _precargar_documentos_endesa(page: Page, datos_filas: list[dict], capturadas: dict[str, dict], anticipadas: list[str],
+                                 filtro_cups: FiltroCups | None = None) -> None:
+    '''
+    Lanza en segundo plano la descarga directa del PDF y XML de las filas pendientes de procesar,
+    de forma que se solapen entre sí mientras se procesan las filas una a una.
+    Parametros:
+        - page (Page): Pagina web del navegador (se usa su contexto autenticado)
+        - datos_filas (list[dict]): Filas leídas en bloque con `_leer_filas_tabla_endesa`
+        - capturadas (dict): Filas de la captura Aura por número de factura
+        - anticipadas (list[str]): Lista del llamador a la que se añaden las rutas anticipadas antes de lanzarlas
+          (para cancelar en su `finally` las que no se lleguen a usar, aunque el lanzamiento falle a medias)
+        - filtro_cups (FiltroCups): Opcional. Solo se anticipan los documentos de los CUPS del filtro
+    '''
+    documentos = []
+    for datos in datos_filas:
+        if not any(datos["celdas"]):
+            continue
+        try:
+            factura = _construir_factura_endesa(datos, capturadas.get(datos["celdas"][1] if len(datos["celdas"]) > 1 else ""))
+            if not factura.cup or not factura.numero_factura or es_factura_procesada("endesa", factura.cup, factura.numero_factura):
+                continue
+            if filtro_cups and not filtro_cups.contiene(factura.cup):
+                continue
+            documentos += [(doc_type, _claves_descarga_endesa(factura), _ruta_descarga_endesa(factura, doc_type)) for doc_type in ("PDF", "XML")]
+        except Exception:
+            continue
+    anticipadas.extend(destino for _, _, destino in documentos)
+    gestor_descargas.precargar(page.context, "endesa", documentos)
+
+
+# DATA.2.2 Resumen de una página para el corte por facturas ya procesadas
+def _resumen_pagina_endesa(datos_filas: list[dict], filtro_cups: FiltroCups | None = None) -> tuple[list[str], int]:
+    '''
+    Obtiene las fechas de emisión de la página y cuántas de sus filas quedan por procesar.
+    Parametros:
+        - datos_filas (list[dict]): Filas leídas con `_leer_filas_tabla_endesa`
+        - filtro_cups (FiltroCups): Opcional. Las filas de CUPS no solicitados no cuentan como pendientes
+    Retorna:
+        - tuple: (fechas de emisión, número de filas pendientes)
+    '''
+    fechas, pendientes = [], 0
+    for datos in datos_filas:
+        celdas = datos["celdas"]
+        if len(celdas) < 7 or not any(celdas):
+            continue
+        fechas.append(celdas[0])
+        cup, numero = celdas[6], celdas[1]
+        if filtro_cups and not filtro_cups.contiene(cup):
+            continue
+        if not cup or not numero or not es_factura_procesada("endesa", cup, numero):
+            pendientes += 1
+    return fechas, pendientes
+
+
+# DATA.3 Lectura de la tabla con el postproceso de las facturas en tubería
+async def _iterar_tabla_facturas_endesa(page: Page, reciclaje: ControlReciclaje | None = None, reanudar = None, filtro_cups: FiltroCups | None = None) -> AsyncIterator[FacturaEndesa]:
     '''
     Realiza un bucle que recorre cada una de las páginas de la tabla de resultado llamando a la función que procesa dicha página.
+    Las facturas se entregan una a una según se terminan, sin acumular la tabla completa en memoria. El navegador sigue
+    paginando mientras las facturas ya descargadas pasan por el postproceso (parseo, OCR, Google, registro y email).
     Parametros:
         - page (Page): Pagina web del navegador
+        - reciclaje (ControlReciclaje): Opcional. Control de reciclaje del contexto entre páginas de la tabla
+        - reanudar: Opcional. Corrutina (page) -> bool que repite la búsqueda sobre una página nueva tras reciclar
+        - filtro_cups (FiltroCups): Opcional. Filtro local de CUPS para una búsqueda global de una lista
     Retorna:
-        - list[FacturaEndesaCliente]: Listado de todas las facturas que se han procesado en el proceso
+        - AsyncIterator[FacturaEndesa]: Cada factura procesada en cuanto está lista
     '''
-    todas_facturas: list[FacturaEndesa] = []
+    tuberia = TuberiaFacturas(ETAPAS_ENDESA)
+    try:
+        async for factura in _recorrer_tabla_endesa(page, tuberia, reciclaje, reanudar, filtro_cups):
+            yield factura
+
+        # Al terminar la tabla se entregan las facturas que siguen en postproceso
+        async for factura in tuberia.vaciar():
+            yield factura
+    finally:
+        await tuberia.cancelar()
+
+
+# DATA.3.0 Bucle de lectura consciente para todas las páginas de la tabla
+async def _recorrer_tabla_endesa(page: Page, tuberia: TuberiaFacturas, reciclaje: ControlReciclaje | None = None, reanudar = None,
+                                 filtro_cups: FiltroCups | None = None) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Recorre las páginas de la tabla entregando cada fila descargada a la tubería de postproceso.
+    Si la tabla no se recorre entera (error, paginación o reanudación fallidas) se marca el filtro como incompleto.
+    Retorna:
+        - AsyncIterator[FacturaEndesa]: Las facturas que terminan su postproceso mientras se recorre la tabla
+    '''
+    completa = False
+    marca_agua = MarcaAgua("endesa")
+    # En la búsqueda global filtrada no se corta la paginación: un CUP cuyas filas solo estén en las páginas omitidas
+    # quedaría como "sin facturas" y con 0 filas en el planificador
+    if filtro_cups and filtro_cups.descartar:
+        marca_agua.paginas = 0
 
     try:
     # A. Esperar a que la tabla sea visible
         log.debug("Esperando visibilidad del contenedor de tabla #example1")
-        await page.wait_for_selector('div.style-table.contenedorGeneral table#example1', timeout=60000)
+        with registro_latencias.medir("endesa", "tabla_resultados", 60000) as medicion:
+            await page.wait_for_selector('div.style-table.contenedorGeneral table#example1', timeout=medicion.timeout)
         
     # B. Detectar el número total de páginas del elemento tiene el formato "PáginaActual / TotalPaginas" (ej: "1 / 37")
-        pagination_text_element = page.locator('span.pagination-flex-central')
-        await pagination_text_element.wait_for(state="visible", timeout=10000)
-        pagination_text = await pagination_text_element.inner_text()
-        
-
-        try:
-            total_paginas = int(pagination_text.split('/')[-1].strip())
+        total_paginas = await _total_paginas_endesa(page)
+        if total_paginas is not None:
             log.info(f"    [INFO] Tabla detectada con {total_paginas} páginas.")
-        except (ValueError, IndexError):
+        else:
             log.warning("    [ADVERTENCIA] No se pudo determinar el total de páginas en la tabla.")
             total_paginas = 1
+        if filtro_cups:
+            filtro_cups.filas_tabla += total_paginas * FILAS_POR_PAGINA
 
     # C. Bucle consciente basado en el número total de páginas
         for current_page in range(1, total_paginas + 1):
             log.info(f"\n\n[PAGE {current_page} / {total_paginas}]")
             
-            # C.1. Esperar a que los datos de la página actual estén cargados
-            await _wait_for_data_load(page)
+            # C.1. Esperar a que los datos de la página actual estén cargados (salvo que ya vengan en la respuesta Aura)
+            if await _pagina_cubierta_por_captura(page):
+                log.debug("Datos dinámicos de la página disponibles en la captura Aura; se omite la espera de carga.")
+            else:
+                await _wait_for_data_load(page)
 
             # C.2. Extraer datos de la página actual
-            facturas_pagina = await _extraer_pagina_actual_endesa(page, current_page)
-            todas_facturas.extend(facturas_pagina)
+            datos_filas = await _leer_filas_tabla_endesa(page)
+            # aclosing: si la lectura se interrumpe, la página se cierra en el acto y cancela sus descargas anticipadas
+            async with aclosing(_iterar_pagina_actual_endesa(page, current_page, filtro_cups, datos_filas, tuberia)) as facturas:
+                async for factura in facturas:
+                    yield factura
+
+            # C.2.1 Corte de la paginación tras K páginas seguidas ya procesadas (resultados ordenados por fecha)
+            if current_page < total_paginas and marca_agua.registrar_pagina(*_resumen_pagina_endesa(datos_filas, filtro_cups)):
+                log.info(f"    [CORTE] {marca_agua.consecutivas} páginas seguidas ya procesadas; se omiten las páginas {current_page + 1}-{total_paginas}.")
+                completa = True
+                break
 
             # C.3 Navegar a la siguiente página si no es la última
             if current_page < total_paginas:
+
+                # C.3.0 Reciclaje del contexto en ejecuciones largas, reanudando en la página siguiente
+                if reciclaje and reanudar:
+                    reciclaje.contar_filas(await page.locator(FILAS_TABLA_ENDESA).count())
+                    motivo = await reciclaje.debe_reciclar(page)
+                    if motivo:
+                        page = await reciclaje.reciclar(page, motivo)
+                        if await reanudar(page) and await _avanzar_a_pagina_endesa(page, current_page + 1):
+                            continue
+                        log.error(f"\t   -->[ERROR] No se pudo reanudar la tabla en la página {current_page + 1} tras reciclar.")
+                        break
+
                 next_button = page.locator('button.pagination-flex-siguiente')
                 
                 # C.3.1 Verificación extra: si el botón está deshabilitado pero el contador dice que faltan páginas
@@ -452,24 +772,110 @@ async def _extraer_tabla_facturas_endesa(page: Page) -> list[FacturaEndesa]:
                     log.warning(f"    [AVISO] El botón 'SIGUIENTE' está bloqueado en la página {current_page}.")
                     break
                 
-                # C.3.2 Pulsamos el boton de página siguiente
-                
+                # C.3.2 Pulsamos el boton de página siguiente y esperamos a que se pinten las nuevas filas
+                #       (si la tabla no cambia ni tras un segundo click se deja de paginar: volver a leerla duplicaría la página)
                 try:
                     log.debug(f"Navegando a la siguiente página (P{current_page} -> P{current_page+1})")
-                    await next_button.click(timeout=10000)
-                    await page.wait_for_timeout(1500) 
+                    with registro_latencias.medir("endesa", "pagina_siguiente", 30000) as medicion:
+                        if not await pulsar_y_esperar_cambio_tabla(page, next_button, FILAS_TABLA_ENDESA, medicion.timeout):
+                            medicion.fallo()
+                    if medicion.fallida:
+                        log.error(f"\t   -->[ERROR] La tabla no pasó de la página {current_page} tras reintentar. Se detiene la paginación.")
+                        break
                 except TimeoutError:
                     log.error(f"\t   -->[ERROR] Timeout al pulsar siguiente en página {current_page}")
                     break
+
+        # C.4 Solo se llega aquí sin salir del bucle con break: se han leído todas las páginas
+        else:
+            completa = True
     
     # D. Si existe algún error se informa
     except TimeoutError:
         log.error("    -->[ERROR] Tiempo excedido esperando la tabla de resultados.")
     except Exception as e:
         log.error(f"    -->[ERROR] Fallo inesperado en la navegación de tabla: {str(e)}", exc_info=True)
-    
-    # E. Se devuleve la lista de todas las facturas que se han procesado
-    return todas_facturas
+    finally:
+        if filtro_cups and not completa:
+            filtro_cups.completa = False
+
+
+# DATA.3.1 Lectura completa de la tabla como lista (compatibilidad)
+async def _extraer_tabla_facturas_endesa(page: Page, reciclaje: ControlReciclaje | None = None, reanudar = None, filtro_cups: FiltroCups | None = None) -> list[FacturaEndesa]:
+    '''
+    Igual que `_iterar_tabla_facturas_endesa`, pero devuelve todas las facturas de la tabla en una lista.
+    Retorna:
+        - list[FacturaEndesa]: Listado de todas las facturas que se han procesado en el proceso
+    '''
+    return [factura async for factura in _iterar_tabla_facturas_endesa(page, reciclaje, reanudar, filtro_cups)]
+
+
+
+# DATA.4 Avance directo a una página de la tabla (reanudación tras reciclar el contexto)
+async def _avanzar_a_pagina_endesa(page: Page, destino: int) -> bool:
+    '''
+    Tras repetir una búsqueda, avanza la tabla de resultados hasta la página indicada sin procesar las anteriores.
+    Parametros:
+        - page (Page): Pagina web del navegador con la búsqueda ya realizada
+        - destino (int): Número de página (1..N) en la que se quiere reanudar
+    Retorna:
+        - bool: True si la tabla queda en la página destino, False en caso contrario
+    '''
+    try:
+        pagination_text_element = page.locator('span.pagination-flex-central')
+        await pagination_text_element.wait_for(state="visible", timeout=60000)
+        next_button = page.locator('button.pagination-flex-siguiente')
+
+        # A. Pulsamos "siguiente" hasta alcanzar la página destino
+        for _ in range(destino - 1):
+            if not await pulsar_y_esperar_cambio_tabla(page, next_button, FILAS_TABLA_ENDESA):
+                return False
+
+        # B. Verificamos la página actual en el texto "PáginaActual / TotalPaginas"
+        texto = await pagination_text_element.inner_text()
+        return texto.split('/')[0].strip() == str(destino)
+
+    except Exception as e:
+        log.error(f"\t   -->[ERROR] No se pudo avanzar a la página {destino}: {e}")
+        return False
+
+
+# DATA.5 Número total de páginas de la tabla de resultados
+async def _total_paginas_endesa(page: Page) -> int | None:
+    '''
+    Lee el total de páginas del paginador, con formato "PáginaActual / TotalPaginas" (ej: "1 / 37").
+    Parametros:
+        - page (Page): Pagina web del navegador con la búsqueda ya realizada
+    Retorna:
+        - int: Total de páginas de la tabla
+        - None: Si no se puede leer el paginador (el TimeoutError de su espera se propaga)
+    '''
+    pagination_text_element = page.locator('span.pagination-flex-central')
+    await pagination_text_element.wait_for(state="visible", timeout=10000)
+    pagination_text = await pagination_text_element.inner_text()
+    try:
+        return int(pagination_text.split('/')[-1].strip())
+    except (ValueError, IndexError):
+        return None
+
+
+# DATA.6 Comprobación de resultados recortados por el límite de filas de la tabla
+async def _resultados_saturados_endesa(page: Page) -> bool:
+    '''
+    Indica si la búsqueda cargada ha alcanzado TABLE_LIMIT, en cuyo caso el portal puede haber omitido facturas.
+    Parametros:
+        - page (Page): Pagina web del navegador con la búsqueda ya realizada
+    Retorna:
+        - bool: True si las filas de la tabla llegan al límite configurado
+    '''
+    try:
+        # Con menos filas que una página completa no hay paginador que esperar
+        if await page.locator(FILAS_TABLA_ENDESA).count() < FILAS_POR_PAGINA:
+            return False
+        total_paginas = await _total_paginas_endesa(page)
+    except TimeoutError:
+        return False
+    return total_paginas is not None and total_paginas * FILAS_POR_PAGINA >= TABLE_LIMIT
 
 
 
@@ -490,7 +896,7 @@ async def _iniciar_sesion_endesa(page: Page, username: str, password: str) -> bo
     try:
     # A. Espera que se cargue el formulario de inicio de sesion
         log.debug("Localizando formulario de inicio de sesión slds-form")
-        await page.wait_for_selector('form.slds-form', timeout=10000)
+        await page.wait_for_selector('form.slds-form', timeout=30000)
 
     # B. Rellena los campos de Usuario y Contraseña
         await page.fill('input[name="Username"]', username)
@@ -501,7 +907,8 @@ async def _iniciar_sesion_endesa(page: Page, username: str, password: str) -> bo
         
     # D. Esperar el indicador de éxito (el botón de cookies) en la nueva página
         log.debug("Login enviado, esperando selector de éxito (#truste-consent-button)")
-        await page.wait_for_selector("#truste-consent-button", timeout=60000)
+        with registro_latencias.medir("endesa", "login", 60000) as medicion:
+            await page.wait_for_selector("#truste-consent-button", timeout=medicion.timeout)
         
         return True
 
@@ -520,6 +927,30 @@ async def _iniciar_sesion_endesa(page: Page, username: str, password: str) -> bo
         return False
     
 
+# NAV.1.1 Verificación de una sesión restaurada
+async def _verificar_sesion_endesa(page: Page) -> bool:
+    '''
+    Comprueba de forma barata si la sesión cargada desde disco sigue autenticada,
+    abriendo el buscador de facturas y verificando que no se redirige al login.
+    Parametros:
+        - page (Page): Pagina web del navegador con el storage_state restaurado
+    Retorna:
+        - bool: True si la sesión es válida, False si el portal exige un nuevo login
+    '''
+    try:
+    # A. Navegamos directamente a la página privada de búsqueda
+        log.debug("Verificando sesión restaurada en el buscador de facturas de Endesa")
+        await page.goto(URL_FACTURAS_ENDESA, wait_until="domcontentloaded")
+
+    # B. Si carga el contenedor de filtros sin pasar por el login, la sesión es válida
+        await page.wait_for_selector('div.filter-padd-container', timeout=15000)
+        return "/login" not in page.url
+
+    except Exception as e:
+        log.debug(f"Sesión restaurada de Endesa no válida: {e}")
+        return False
+
+
 # NAV.2 Aceptar Coockies y cerrar baners de promociones.
 async def _aceptar_cookies_endesa(page: Page) -> bool:
     '''
@@ -547,7 +978,7 @@ async def _aceptar_cookies_endesa(page: Page) -> bool:
                 # B.2. Pulsamos el boton en caso de estar visible
                     log.info(f"\t\tDetectada ventana modal. Pulsando cerrar ({selector}).")
                     await boton_modal.click()
-                    await page.wait_for_timeout(500) 
+                    await esperar_oculto(boton_modal)
 
                 # B.3. Si falla o no es visible en 3s, continuamos al siguiente
             except Exception:
@@ -559,7 +990,7 @@ async def _aceptar_cookies_endesa(page: Page) -> bool:
             # C.2. Pulsamos el boton en caso de estar visible
             await page.click(cookie_button_selector)
             log.info("\t\tCookies aceptadas correctamente.")
-            await page.wait_for_timeout(500) 
+            await esperar_oculto(page.locator(cookie_button_selector))
             # C.3. Si el boton no está visble, informamos y continuamos con el proceso
         else:
             log.warning("\t\tBanner de cookies no detectado tras cerrar modales.")
@@ -589,7 +1020,8 @@ async def _realizar_busqueda_facturas_endesa(page: Page, fecha_desde: str, fecha
     '''
     
     try:
-        # A. Navegar a la página de búsqueda y esperar que carguen los filtros
+        # A. Navegar a la página de búsqueda y esperar que carguen los filtros (capturando las respuestas Aura de la nueva búsqueda)
+        capturar(page).reiniciar()
         log.debug(f"Navegando a la URL de facturas: {URL_FACTURAS_ENDESA}")
         await page.goto(URL_FACTURAS_ENDESA, wait_until="domcontentloaded")
         main_filter_container_selector = 'div.filter-padd-container'
@@ -597,11 +1029,13 @@ async def _realizar_busqueda_facturas_endesa(page: Page, fecha_desde: str, fecha
 
         # B. Rellenar filtros
             
-            # B.1. Grupo Empresarial
-        log.debug(f"Rellenando filtro Grupo Empresarial: {GRUPO_EMPRESARIAL}")
-        await page.click('button[name="periodo"]:has-text("Grupo empresarial")')
-        await page.fill('input[placeholder="Buscar"]', GRUPO_EMPRESARIAL)
-        await page.click(f'span[role="option"] >> text="{GRUPO_EMPRESARIAL}"')
+            # B.1. Grupo Empresarial del tenant en curso (sin grupo se busca en toda la cuenta)
+        grupo_empresarial = tenant_actual().grupo_empresarial
+        if grupo_empresarial:
+            log.debug(f"Rellenando filtro Grupo Empresarial: {grupo_empresarial}")
+            await page.click('button[name="periodo"]:has-text("Grupo empresarial")')
+            await page.fill('input[placeholder="Buscar"]', grupo_empresarial)
+            await page.click(f'span[role="option"] >> text="{grupo_empresarial}"')
 
             # B.2. Filtro CUPS
         if cup:
@@ -640,7 +1074,8 @@ async def _realizar_busqueda_facturas_endesa(page: Page, fecha_desde: str, fecha
 
         # D. Esperar que carguen los resultados
         tabla_selector = 'div.style-table.contenedorGeneral table#example1'
-        await page.wait_for_selector(tabla_selector, timeout=60000)
+        with registro_latencias.medir("endesa", "busqueda", 60000) as medicion:
+            await page.wait_for_selector(tabla_selector, timeout=medicion.timeout)
         
         
         log.info(f"    [OK] Filtros Aplicados con éxito (Desde {fecha_desde} hasta {fecha_hasta})")
@@ -650,4 +1085,26 @@ async def _realizar_busqueda_facturas_endesa(page: Page, fecha_desde: str, fecha
 
     except Exception as e:
         log.error(f"Error crítico al aplicar filtros: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
+
+
+# NAV.4 Búsqueda de facturas por HTTP (sin navegador) repitiendo la búsqueda capturada
+async def _buscar_facturas_endesa_http(cliente: ClienteAura, accion_busqueda: dict, cup_original: str, cup: str) -> list[dict] | None:
+    '''
+    Repite por HTTP la acción Aura de una búsqueda hecha en el navegador cambiando el CUP, y decodifica las filas.
+    El rango de fechas y el resto de filtros son los de la búsqueda capturada.
+    Parametros:
+        - cliente (ClienteAura): Cliente HTTP con la sesión del portal
+        - accion_busqueda (dict): Acción capturada de la búsqueda (`CapturaAura.accion_con_filas`)
+        - cup_original (str): CUP usado en la búsqueda capturada
+        - cup (str): CUP a consultar
+    Retorna:
+        - list[dict]: Filas de factura decodificadas (vacía si el CUP no tiene facturas)
+        - None: Si la consulta falla y hay que usar el navegador
+    '''
+    valor = await cliente.repetir(accion_busqueda, {cup_original: cup})
+    if valor is None:
+        return None
+    filas = decodificar_filas(valor, ALIAS_ENDESA)
+    log.debug(f"[AURA] {cup}: {len(filas)} facturas en la respuesta HTTP.")
+    return filas
@@ -2,15 +2,29 @@ import re
 import os
 from datetime import datetime
 import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator
 from playwright.async_api import Page, TimeoutError, Locator
 from utils.modelos_datos import FacturaEnel
+from utils.esperas import ejecutar_y_esperar_aura, esperar_aura_inactiva, pulsar_y_esperar_cambio_tabla
+from utils.latencias import registro_latencias
+from utils.formularios import fijar_valor_input
+from utils.captura_aura import capturar, completar_fila, ALIAS_ENEL
+from utils.descargas import gestor_descargas
+from utils.marca_agua import MarcaAgua
+from utils.tenants import tenant_actual
+from utils.trazas import guardar_traza, paso_error
+from utils.tuberia import Etapa, TuberiaFacturas, procesar_etapas
 from logic.logs_logic import log, mail_handler
-from config import DOWNLOAD_FOLDERS, URL_FACTURAS_ENEL, REPROCESADO, DESTINATARIOS_FACTURAS
+from config import URL_FACTURAS_ENEL, REPROCESADO, POSTPROCESO_WORKERS_OCR, POSTPROCESO_WORKERS_GOOGLE, POSTPROCESO_WORKERS_EMAIL
 from parsers.pdf_parser_enel import procesar_pdf_local_enel
-from parsers.exportar_datos import insertar_factura_en_csv, es_factura_procesada, registrar_factura_procesada, es_factura_enviada, registrar_factura_enviada
+from parsers.exportar_datos import insertar_factura_en_csv, es_factura_procesada, registrar_factura_procesada, registrar_factura_enviada, reservar_envio, liberar_envio
 from logic.google_logic import registrar_factura_google_enel
 from logic.mail_logic import enviar_factura_email
 
+# Selector de las filas de la tabla de resultados de facturas (datatable LWC)
+FILAS_TABLA_ENEL = 'table[lwc-392cvb27u8q] tbody tr'
+
 # === FUNCIONES AUXILIARES PARA CARGA Y PROCESADO DE DATOS DE ENDESA CLIENTE  === #
 
 # AUX.1.Conversión de importes (str) a float
@@ -44,10 +58,33 @@ def _clean_and_convert_float(text: str) -> float:
         return 0.0
     
 
+# AUX.2.1 Ruta local y datos de la fila que identifican el PDF
+def _ruta_descarga_enel(factura: FacturaEnel) -> str:
+    '''
+    Construye la ruta donde se guarda el PDF de una factura.
+    Parametros:
+        - factura (FacturaEnel): Factura a la que pertenece el archivo
+    Retorna:
+        - str: Ruta local del archivo
+    '''
+    fecha = datetime.strptime(factura.fecha_emision, "%d/%m/%Y")
+    mes = fecha.strftime("%m")
+    anio = fecha.strftime("%Y")
+
+    filename = f"{anio}{mes}_{factura.cup}_{factura.numero_factura}_ENEL.pdf"
+    return os.path.join(tenant_actual().carpetas_descarga["PDF_ENEL"], filename)
+
+
+def _claves_descarga_enel(factura: FacturaEnel) -> dict[str, str]:
+    # Dato de la fila que puede formar parte de la URL del PDF (para la descarga directa); el CUP no identifica la factura
+    return {"numero_factura": factura.numero_factura}
+
+
 # AUX.2.Descarga de archivos mediante botenes de la tabla de resultados
 async def _descargar_archivo_fila(page: Page, row_locator: Locator, factura: FacturaEnel) -> str | None:
     """
     Intenta descargar el archivo PDF haciendo clic en el botón de la fila, y guardándolo localmente.
+    Si ya se conoce la URL del PDF (aprendida de una descarga anterior) se descarga directamente sin click.
     Parametros:
         - page (Page): Pagina web del navegador
         - row (Locator): Localizador web de la fila de la que se quiere descargar los archivos
@@ -65,24 +102,26 @@ async def _descargar_archivo_fila(page: Page, row_locator: Locator, factura: Fac
         return None
 
     # B. Definimos la ruta donde se descargará el archivo
-    target_folder = DOWNLOAD_FOLDERS["PDF_ENEL"]
-    fecha = datetime.strptime(factura.fecha_emision, "%d/%m/%Y")
-    mes = fecha.strftime("%m")
-    anio = fecha.strftime("%Y")
-
-    filename = f"{anio}{mes}_{factura.cup}_{factura.numero_factura}_ENEL.pdf" 
-    save_path = os.path.join(target_folder, filename)
+    save_path = _ruta_descarga_enel(factura)
+    claves = _claves_descarga_enel(factura)
 
     # C. Proceso de descarga
     try:
+        # C.0. Descarga directa por la URL aprendida (o recogida de la descarga anticipada de la página)
+        if await gestor_descargas.descargar(page.context, "enel", "PDF", claves, save_path):
+            log.info(f"\t   -> [OK] [DESCARGA PDF] Guardado en: {save_path} (directa)")
+            return save_path
+
         # C.1. Pulsamos el boton
         log.debug(f"Iniciando descarga PDF para factura: {factura.numero_factura}")
-        async with page.expect_download(timeout=20000) as download_info:
-            await button_locator.click(timeout=20000)
-        # C.2. Leemos los valores del archivo descargado en el navegador
-        download = await download_info.value
-        # C.3. Guardamos localmente el archivo
+        with registro_latencias.medir("enel", "descarga", 20000) as medicion:
+            async with page.expect_download(timeout=medicion.timeout) as download_info:
+                await button_locator.click(timeout=20000)
+            # C.2. Leemos los valores del archivo descargado en el navegador
+            download = await download_info.value
+        # C.3. Guardamos localmente el archivo y aprendemos su URL para las siguientes descargas
         await download.save_as(save_path)
+        gestor_descargas.aprender("enel", "PDF", download.url, claves)
         
     # D. Si se ha descargado correctamente, informamos y devolvemos la ruta del archivo descargado
         log.info(f"\t   -> [OK] [DESCARGA PDF] Guardado en: {save_path}")
@@ -102,44 +141,122 @@ async def _descargar_archivo_fila(page: Page, row_locator: Locator, factura: Fac
         return None
     
 
+# AUX.3 Escritura de una fecha en los filtros
+async def _escribir_fecha_enel(page: Page, selector: str, fecha: str) -> bool:
+    '''
+    Escribe una fecha en un campo del filtro. Primero se asigna el valor con eventos sintéticos (input/change/blur);
+    si el componente no lo conserva se teclea sin retardo y, como último recurso, con el retardo antiguo.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - selector (str): Selector CSS del input de fecha
+        - fecha (str): Fecha en formato dd/mm/yyyy
+    Retorna:
+        - bool: True si el campo contiene la fecha indicada
+    '''
+    campo = page.locator(selector)
+    if await fijar_valor_input(campo, fecha):
+        return True
+    for retardo in (0, 60):
+        await campo.fill("")
+        await campo.press_sequentially(fecha, delay=retardo)
+        if await campo.input_value() == fecha:
+            return True
+    log.warning(f"\t   --> [!] El campo {selector} no aceptó la fecha {fecha}.")
+    return False
+
+
+
+# AUX.4 Lectura en bloque de las filas de la tabla
+# Textos de las celdas identificadas por su data-label (null si la celda no existe en la fila)
+_JS_LEER_FILA_ENEL = """
+(tr) => {
+    const texto = (selector) => {
+        const celda = tr.querySelector(selector);
+        return celda ? (celda.innerText || "") : null;
+    };
+    return {
+        cups: texto('th[data-label="CUPS"]'),
+        factura_fiscal: texto('td[data-label="FACTURA FISCAL"]'),
+        fecha: texto('td[data-label="FECHA"]'),
+        importe: texto('td[data-label="TOTAL/PDTE"]'),
+        estado: texto('td[data-label="Estado"]'),
+        tipo: texto('td[data-label="Tipo"]'),
+    };
+}
+"""
+
+async def _leer_filas_tabla_enel(page: Page) -> list[dict]:
+    '''
+    Lee en una sola llamada al navegador los textos de todas las filas visibles de la tabla de resultados.
+    Parametros:
+        - page (Page): Pagina web del navegador
+    Retorna:
+        - list[dict]: Una entrada por fila con los textos de sus celdas
+    '''
+    return await page.locator(FILAS_TABLA_ENEL).evaluate_all(f"(filas) => filas.map({_JS_LEER_FILA_ENEL})")
+
+
+def _construir_factura_enel(datos: dict, capturada: dict | None = None) -> FacturaEnel:
+    '''
+    Crea el objeto Factura a partir de los textos de una fila leídos con `_leer_filas_tabla_enel`.
+    Las celdas vacías se completan con la fila capturada de la respuesta Aura, si la hay.
+    Parametros:
+        - datos (dict): Textos de las celdas de la fila
+        - capturada (dict): Opcional. Fila decodificada de la captura Aura con el mismo número de factura
+    Retorna:
+        - FacturaEnel: Factura con los datos directos de la tabla
+    '''
+    campos = {
+        "cup": datos["cups"],
+        "numero_factura": datos["factura_fiscal"],
+        "fecha_emision": datos["fecha"],
+        "importe_total": datos["importe"],
+        "estado_factura": datos["estado"],
+        "tipo_factura": datos["tipo"],
+    }
+    campos = completar_fila(campos, capturada, marcadores=())
+    faltan = [campo for campo, valor in campos.items() if valor is None]
+    if faltan:
+        raise ValueError(f"Celdas no encontradas en la fila: {', '.join(faltan)}")
+
+    f_fiscal = campos["numero_factura"].strip()
+    return FacturaEnel(
+        cup = campos["cup"].strip(),
+        numero_factura = f_fiscal,
+        fecha_emision = campos["fecha_emision"].strip(),
+        importe_total = _clean_and_convert_float(campos["importe_total"]),
+        estado_factura = campos["estado_factura"].strip(),
+        tipo_factura = campos["tipo_factura"].strip(),
+        descarga_selector = f_fiscal
+        )
+
 
 
 # === FUNCIONES PARA LECTURA Y EXTRACCION DE DATOS  === #
 
-# DATA.1 Extraccion y procesado de los datos copletos de una fila de la tabla de resultados
-async def _extraer_datos_fila_enel(page: Page, row: Locator) -> FacturaEnel | None:
+# DATA.1 Extraccion de los datos de una fila de la tabla de resultados y descarga de su archivo
+async def _descargar_fila_enel(page: Page, row: Locator, datos: dict | None = None, capturada: dict | None = None) -> tuple[FacturaEnel, str | None] | None:
     '''
     Para una fila de la tabla de resultados, extrae los datos completos directos de la fila, 
-    llama a la funcion de descarga del archivo PDF de la fila,
-    llama a la funcion de parseo y procesado de los archivos PDF extrayendo los datos de las facturas,
-    y crea y devuelve un objeto de la clase Factura con todos los datos actualizados.
+    crea un objeto de la clase Factura y llama a la funcion de descarga del archivo PDF de la fila.
+    Es la única parte del procesado de la fila que usa el navegador; el OCR, Google, registro y email
+    son las etapas de DATA.1.1 y se ejecutan aparte (ver `TuberiaFacturas`).
     Parametros:
         - page (Page): Pagina web del navegador
         - row (Locator): Localizador web de la fila de la que se quiere procesar
+        - datos (dict): Opcional. Textos de la fila ya leídos en bloque; si se omite se leen de la fila
+        - capturada (dict): Opcional. Datos de la misma factura capturados de la respuesta Aura
     Retorna:
-        - FacturaEnel: Factura con todos los datos extraidos durante el procesado de la fila y los archivos
-        - None: Unicamente si ni si quiera ha podido extrear los datos de la fila.
+        - tuple: Factura con los datos de la fila y ruta del PDF descargado (None si no se ha descargado)
+        - None: Si la factura ya estaba procesada o no se han podido extraer los datos de la fila.
     '''
     try:
     # A. Extracción de datos de las celdas de la fila y creación del objeto Factura
 
-        # A.1. Extracción de datos de la fila
-        cups_val = (await row.locator('th[data-label="CUPS"]').inner_text()).strip()
-        f_fiscal = (await row.locator('td[data-label="FACTURA FISCAL"]').inner_text()).strip()
-        fecha_em = (await row.locator('td[data-label="FECHA"]').inner_text()).strip()
-        imp_raw = await row.locator('td[data-label="TOTAL/PDTE"]').inner_text()
-        est = (await row.locator('td[data-label="Estado"]').inner_text()).strip()
-        tipo_f = (await row.locator('td[data-label="Tipo"]').inner_text()).strip()
-
-        factura = FacturaEnel(
-            cup = cups_val,
-            numero_factura = f_fiscal,
-            fecha_emision = fecha_em,
-            importe_total = _clean_and_convert_float(imp_raw),
-            estado_factura = est,
-            tipo_factura = tipo_f,
-            descarga_selector = f_fiscal
-            )
+        # A.1. Extracción de datos de la fila (si no se han leído ya en bloque)
+        if datos is None:
+            datos = await row.evaluate(_JS_LEER_FILA_ENEL)
+        factura = _construir_factura_enel(datos, capturada)
         
         log.info(f"\t\t[OK] Datos extraídos de la tabla para: {factura.numero_factura}")
 
@@ -150,111 +267,196 @@ async def _extraer_datos_fila_enel(page: Page, row: Locator) -> FacturaEnel | No
                 log.info(f"\t\t[SKIP] Factura {factura.numero_factura} ({factura.cup}) ya procesada previamente.")
                 return None
 
-    # B. Validación de importe positivo (Requisito de negocio)
-            
+    # B. Descarga de archivo PDF (las facturas con importe negativo no se descargan, ver DATA.1.1)
         if factura.importe_total < 0:
+            return factura, None
+        pdf_path = await _descargar_archivo_fila(page, row, factura)
+        return factura, pdf_path
+    
+    # C. Si no se ha podido procesar nada de la fila se informa y se devuelve None
+    except Exception as e:
+        log.error(f"\t\t   -->[ERROR] Fallo al extraer datos: {str(e)}", exc_info=True)
+        # La traza se etiqueta con el CUPS y la factura fiscal de la fila, si llegó a leerse
+        datos = datos or {}
+        await guardar_traza(page, (datos.get("cups") or "").strip(), (datos.get("factura_fiscal") or "").strip(),
+                            paso=f"fila-{type(e).__name__}")
+        return None
+
+
+# DATA.1.1 Etapas del postproceso de una factura descargada (no usan el navegador)
+# Todas reciben la factura y la ruta de su PDF, y la modifican en el sitio
+
+# DATA.1.1.1 Validación del importe y OCR del PDF
+async def _ocr_pdf_enel(factura: FacturaEnel, pdf_path: str | None) -> bool:
+    '''
+    Completa la factura con el OCR del PDF descargado, salvo que su importe sea negativo.
+    Parametros:
+        - factura (FacturaEnel): Factura con los datos de la tabla.
+        - pdf_path (str): Ruta del PDF descargado (None si no se descargó).
+    Retorna:
+        - bool: False si la factura no debe seguir en el postproceso (importe negativo), True en caso contrario
+    '''
+    # A. Validación de importe positivo (Requisito de negocio): la factura no sigue en el postproceso
+    if factura.importe_total < 0:
+        factura.error_RPA = True
+        factura.msg_error_RPA = "IMPORTE_NEGATIVO: El importe total de la factura es negativo, por lo que no se procesará su PDF."
+        log.warning(f"\t\t[!] Importe total negativo ({factura.importe_total} €). Omitiendo PDF.")
+        return False
+
+    # B. Procesado del archivo PDF descargado, extracción de datos adicionales y actualizacion de objeto Factura
+    if pdf_path:
+        log.info(f"\t\t[PDF OCR] {factura.numero_factura}")
+        exito_pdf = await asyncio.to_thread(procesar_pdf_local_enel, factura, pdf_path)
+
+        if not exito_pdf:
+            log.error(f"\t\t   -> [ERROR PDF] Fallo al extraer datos del PDF: {factura.numero_factura}")
             factura.error_RPA = True
-            factura.msg_error_RPA = "IMPORTE_NEGATIVO: El importe total de la factura es negativo, por lo que no se procesará su PDF."
-            log.warning(f"\t\t[!] Importe total negativo ({factura.importe_total} €). Omitiendo PDF.")
-            return factura
+            factura.msg_error_RPA += " ERROR_PARSEO: El archivo PDF no contenía datos válidos o estaba incompleto."
+    return True
+
+
+# DATA.1.1.2 Volcado al CSV histórico y a Google Sheets / Drive
+async def _sincronizar_google_enel(factura: FacturaEnel, pdf_path: str | None) -> None:
+    '''
+    Inserta la factura en el CSV histórico del tenant, la registra en Google Sheets y sube su PDF a Google Drive.
+    Parametros:
+        - factura (FacturaEnel): Factura ya procesada por OCR.
+        - pdf_path (str): Ruta del PDF descargado (None si no se descargó).
+    '''
+    # A. Insertar datos en CSV
+    csv_path = os.path.join(tenant_actual().carpetas_descarga["CSV_ENEL"],"facturas_enel.csv")
+    if csv_path:
+        log.debug(f"Insertando factura {factura.numero_factura} en CSV")
+        insertar_factura_en_csv(factura, csv_path)
     
-    # C. Descarga de archivo PDF 
-        pdf_path = await _descargar_archivo_fila(page, row, factura)
-           
-    # D. Procesado del archivo PDF descargado, extracción de datos adicionales y actualizacion de objeto Factura
-        if pdf_path:
-            log.info(f"\t\t[PDF OCR]")
-            exito_pdf = procesar_pdf_local_enel(factura, pdf_path)
-
-            if not exito_pdf:
-                log.error(f"\t\t   -> [ERROR PDF] Fallo al extraer datos del PDF: {factura.numero_factura}")
-                factura.error_RPA = True
-                factura.msg_error_RPA += " ERROR_PARSEO: El archivo PDF no contenía datos válidos o estaba incompleto."
-                
-    # E. Insertar datos en CSV
-        csv_path = os.path.join(DOWNLOAD_FOLDERS["CSV_ENEL"],"facturas_enel.csv")
-        if csv_path:
-            log.debug(f"Insertando factura {factura.numero_factura} en CSV")
-            insertar_factura_en_csv(factura, csv_path)
-        
-    # F. Registrar datos en Google Sheets y subir PDF a Google Drive
-        log.info(f"\t\t[GOOGLE SHEETS/DRIVE]")
+    # B. Registrar datos en Google Sheets y subir PDF a Google Drive (en un hilo: el cliente de Google es síncrono)
+    log.info(f"\t\t[GOOGLE SHEETS/DRIVE] {factura.numero_factura}")
+    try:
+        factura.procesada = True
+        await asyncio.to_thread(registrar_factura_google_enel, factura, pdf_path)
+        log.info(f"\t\t   -> [OK] [GOOGLE] Registro y subida completados.")
+    except Exception as e_google:
+        factura.procesada = False
+        factura.error_RPA = True
+        factura.msg_error_RPA += f" ERROR_GOOGLE: Fallo al registrar en Google Sheets o subir a Google Drive. Detalles: {str(e_google)}"
+        log.error(f"\t\t   --> [ERROR GOOGLE] Fallo en sincronización: {str(e_google)}")
+
+
+# DATA.1.1.3 Registro de la factura como procesada
+async def _registrar_procesada_enel(factura: FacturaEnel, pdf_path: str | None) -> None:
+    '''
+    Añade la factura al registro de procesadas si ha pasado las etapas anteriores sin errores.
+    Va antes del email: una ejecución posterior ya no vuelve a descargarla aunque el envío esté en curso o falle
+    (el reintento del email lo gobierna el registro de enviadas).
+    Parametros:
+        - factura (FacturaEnel): Factura ya sincronizada.
+        - pdf_path (str): No se usa en esta etapa.
+    '''
+    if not factura.error_RPA and factura.cup and factura.numero_factura:
         try:
-            factura.procesada = True
-            registrar_factura_google_enel(factura, pdf_path)
-            log.info(f"\t\t   -> [OK] [GOOGLE] Registro y subida completados.")
-        except Exception as e_google:
+            factura
+            registrar_factura_procesada("enel", factura.cup, factura.numero_factura)
+            log.info(f"\t\t[REGISTRO] Factura {factura.numero_factura} marcada como procesada.")
+        except Exception:
             factura.procesada = False
-            factura.error_RPA = True
-            factura.msg_error_RPA += f" ERROR_GOOGLE: Fallo al registrar en Google Sheets o subir a Google Drive. Detalles: {str(e_google)}"
-            log.error(f"\t\t   --> [ERROR GOOGLE] Fallo en sincronización: {str(e_google)}")
+            pass
 
-    # G. Tras un procesamiento sin errores, añadimos al registro de procesadas
-        if not factura.error_RPA and factura.cup and factura.numero_factura:
-            try:
-                factura
-                registrar_factura_procesada("enel", factura.cup, factura.numero_factura)
-                log.info(f"\t\t[REGISTRO] Factura {factura.numero_factura} marcada como procesada.")
-            except Exception:
-                factura.procesada = False
-                pass
-
-    # H. Envio de Factura por correo.
-        log.info(f"\t\t[EMAIL SENDING]")
-        if pdf_path and not factura.error_RPA:
-            # Listado de correos definido en .env y leído por config.py
-            lista_distribucion = DESTINATARIOS_FACTURAS
-            
-            if not es_factura_enviada("enel", factura.cup, factura.numero_factura):
-                # Llamada asíncrona al envío
-                exito_mail = await enviar_factura_email(
-                    destinatarios=lista_distribucion,
-                    ruta_pdf=pdf_path,
-                    numero_factura=factura.numero_factura,
-                    cup=factura.cup
-                )
-            
-            else:
-                exito_mail = True
-                log.info(f"\t\t   [SKIP] Factura ya enviada previamente.")
-            
-            if exito_mail:
-                registrar_factura_enviada("enel", factura.cup, factura.numero_factura)
-                log.debug(f"Email enviado correctamente para factura {factura.numero_factura}")
-            else:
-                factura.msg_error_RPA += " | Error en envío de email."
-                log.error(f"\t\t   [ERROR] Error en el envío de email.")
-
-    # I. Devolvemos la factura con los datos extraidos y procesados.
-        return factura
-    
-    # J. Si no se ha podido procesar nada de la fila se informa y se devuelve None
+
+# DATA.1.1.4 Envío de la factura por correo
+async def _enviar_email_enel(factura: FacturaEnel, pdf_path: str | None) -> None:
+    '''
+    Envía el PDF de la factura a los destinatarios del tenant, salvo que ya conste como enviada o la esté
+    enviando otra tubería de este proceso (`reservar_envio`), y registra el envío.
+    Parametros:
+        - factura (FacturaEnel): Factura ya registrada.
+        - pdf_path (str): Ruta del PDF que se adjunta (sin PDF no se envía).
+    '''
+    log.info(f"\t\t[EMAIL SENDING] {factura.numero_factura}")
+    if not pdf_path or factura.error_RPA:
+        return
+
+    # A. Reserva del envío: si ya se envió (o se está enviando) no se repite
+    if not reservar_envio("enel", factura.cup, factura.numero_factura):
+        log.info(f"\t\t   [SKIP] Factura ya enviada previamente.")
+        return
+
+    # B. Envío a la lista de correos del tenant en curso (el principal la define en .env y la lee config.py) y registro
+    try:
+        exito_mail = await enviar_factura_email(
+            destinatarios=tenant_actual().destinatarios,
+            ruta_pdf=pdf_path,
+            numero_factura=factura.numero_factura,
+            cup=factura.cup
+        )
+        if exito_mail:
+            registrar_factura_enviada("enel", factura.cup, factura.numero_factura)
+            log.debug(f"Email enviado correctamente para factura {factura.numero_factura}")
+        else:
+            factura.msg_error_RPA += " | Error en envío de email."
+            log.error(f"\t\t   [ERROR] Error en el envío de email.")
+    finally:
+        liberar_envio("enel", factura.cup, factura.numero_factura)
+
+
+# Etapas del postproceso en orden, con sus trabajadores simultáneos (el registro de procesadas va de uno en uno
+# y antes del email, para que la factura conste como procesada aunque el envío tarde o falle)
+ETAPAS_ENEL = [
+    Etapa("ocr", _ocr_pdf_enel, POSTPROCESO_WORKERS_OCR),
+    Etapa("google", _sincronizar_google_enel, POSTPROCESO_WORKERS_GOOGLE),
+    Etapa("registro", _registrar_procesada_enel, 1),
+    Etapa("email", _enviar_email_enel, POSTPROCESO_WORKERS_EMAIL),
+]
+
+
+# DATA.1.2 Extraccion y procesado completo de una fila (sin tubería)
+async def _extraer_datos_fila_enel(page: Page, row: Locator, datos: dict | None = None, capturada: dict | None = None) -> FacturaEnel | None:
+    '''
+    Descarga la fila con `_descargar_fila_enel` y ejecuta sobre ella todas las etapas del postproceso antes de volver.
+    Retorna:
+        - FacturaEnel: Factura con todos los datos extraidos durante el procesado de la fila y los archivos
+        - None: Si la fila no se ha descargado o el postproceso ha fallado.
+    '''
+    descargada = await _descargar_fila_enel(page, row, datos, capturada)
+    if descargada is None:
+        return None
+    try:
+        return await procesar_etapas(ETAPAS_ENEL, *descargada)
     except Exception as e:
-        log.error(f"\t\t   -->[ERROR] Fallo al extraer datos: {str(e)}", exc_info=True)
+        log.error(f"\t\t   -->[ERROR] Fallo al procesar la factura {descargada[0].numero_factura}: {str(e)}", exc_info=True)
         return None
         
                 
 # DATA.2 Bucle de lectura para todas las filas de una página de la tabla de resultados
-async def _extraer_pagina_actual_enel(page: Page, contador: int) -> list[FacturaEnel]:
+async def _iterar_pagina_actual_enel(page: Page, contador: int, datos_filas: list[dict] | None = None, tuberia: TuberiaFacturas | None = None) -> AsyncIterator[FacturaEnel]:
     '''
     Realiza un bucle que recorre todas las filas de la página visible de la tabla de resultados, llamando en cada iteración a la funcion de procesado de dicha fila
     Parametros:
         - page (Page): Pagina web del navegador
+        - contador (int): Facturas procesadas en las páginas anteriores (para el log)
+        - datos_filas (list[dict]): Opcional. Filas ya leídas con `_leer_filas_tabla_enel`; si se omite se leen aquí
+        - tuberia (TuberiaFacturas): Opcional. Postproceso compartido por toda la tabla; si se omite cada fila se procesa completa
     Retorna:
-        - list[FacturaEnel]: Una lista de objetos del tipo factura donde se han registrado todos los datos de las filas que se han procesado
+        - AsyncIterator[FacturaEnel]: Las facturas que terminan su postproceso mientras se recorre la página
     '''
 
-    facturas: list[FacturaEnel] = []
+    anticipadas: list[str] = []
+    tuberia = tuberia or TuberiaFacturas(ETAPAS_ENEL, activa=False)
     try:
 
     # A. Identificación de los localizadores web de las distintas filas 
-        rows = page.locator('table[lwc-392cvb27u8q] tbody tr')
-        row_count = await rows.count()
+        rows = page.locator(FILAS_TABLA_ENEL)
+        if datos_filas is None:
+            datos_filas = await _leer_filas_tabla_enel(page)
+        row_count = len(datos_filas)
+        capturadas = {f["numero_factura"]: f for f in capturar(page).filas(ALIAS_ENEL)}
 
-        # A.1. Si no hay filas, devolvemos la lista vacía
+        # A.1. Si no hay filas, no hay nada que entregar
         if row_count == 0:
             log.debug("No se encontraron filas en la tabla de la página actual.")
-            return facturas
+            return
+
+        # A.2. Descarga anticipada de los PDF de la página (solo si ya se conoce su URL)
+        _precargar_documentos_enel(page, datos_filas, capturadas, anticipadas)
     
         log.info(f"    [INFO] Tabla detectada con {row_count} filas")
 
@@ -263,77 +465,164 @@ async def _extraer_pagina_actual_enel(page: Page, contador: int) -> list[Factura
             log.info(f"\n\t[ROW {(i+contador+1)}] {'='*40}")
             row = rows.nth(i)
             
-            # B.1 Procesado y extraccion de la fila iterada
-            factura = await _extraer_datos_fila_enel(page, row)
-        
-            # B.2 Si la fila se ha procesado correctamente, se añade la factura a la lista
-            if factura:
-                facturas.append(factura)
-
-    # C. Devolvemos el listado de facturas procesadas
-        return facturas
+            # B.1 Extraccion de la fila iterada y descarga de su archivo
+            numero = (datos_filas[i]["factura_fiscal"] or "").strip()
+            descargada = await _descargar_fila_enel(page, row, datos_filas[i], capturadas.get(numero))
         
-    # D. Si hay algún fallo se devuelve la lista en su estado actual y se informa del error
+            # B.2 La factura descargada pasa al postproceso (si falló en el navegador se guarda su traza)
+            if descargada:
+                factura = descargada[0]
+                paso = paso_error(factura.msg_error_RPA)
+                if paso:
+                    await guardar_traza(page, factura.cup, factura.numero_factura, paso)
+                await tuberia.enviar(*descargada)
+
+            # B.3 Se entregan las facturas que ya han terminado su postproceso
+            for factura in tuberia.terminadas():
+                yield factura
+
+    # C. Si hay algún fallo se detiene la página (las facturas ya entregadas se conservan) y se informa del error
     except Exception as e:
         log.error(f"    -->[ERROR] Fallo al extraer datos de la Tabla: {str(e)}")
-        return facturas
+        await guardar_traza(page, paso=type(e).__name__)
 
+    # D. Se cancelan las descargas anticipadas que no se han llegado a usar
+    finally:
+        gestor_descargas.cancelar_pendientes(anticipadas)
 
-# DATA 3. Bucle de lectura para todas las páginas de la tabla de resultados
-async def _extraer_tabla_facturas_enel(page: Page, contador_facturas: int = 0) -> list[FacturaEnel]:
+
+# DATA.2.1 Descarga anticipada de los PDF de la página visible
+def _precargar_documentos_enel(page: Page, datos_filas: list[dict], capturadas: dict[str, dict], anticipadas: list[str]) -> None:
+    '''
+    Lanza en segundo plano la descarga directa del PDF de las filas pendientes de procesar,
+    de forma que se solapen entre sí mientras se procesan las filas una a una.
+    Parametros:
+        - page (Page): Pagina web del navegador (se usa su contexto autenticado)
+        - datos_filas (list[dict]): Filas leídas en bloque con `_leer_filas_tabla_enel`
+        - capturadas (dict): Filas de la captura Aura por número de factura
+        - anticipadas (list[str]): Lista del llamador a la que se añaden las rutas anticipadas antes de lanzarlas
+          (para cancelar en su `finally` las que no se lleguen a usar, aunque el lanzamiento falle a medias)
+    '''
+    documentos = []
+    for datos in datos_filas:
+        try:
+            factura = _construir_factura_enel(datos, capturadas.get((datos["factura_fiscal"] or "").strip()))
+            if not factura.cup or not factura.numero_factura or es_factura_procesada("enel", factura.cup, factura.numero_factura):
+                continue
+            documentos.append(("PDF", _claves_descarga_enel(factura), _ruta_descarga_enel(factura)))
+        except Exception:
+            continue
+    anticipadas.extend(destino for _, _, destino in documentos)
+    gestor_descargas.precargar(page.context, "enel", documentos)
+
+
+# DATA.2.2 Resumen de una página para el corte por facturas ya procesadas
+def _resumen_pagina_enel(datos_filas: list[dict]) -> tuple[list[str], int]:
+    '''
+    Obtiene las fechas de emisión de la página y cuántas de sus filas quedan por procesar.
+    Parametros:
+        - datos_filas (list[dict]): Filas leídas con `_leer_filas_tabla_enel`
+    Retorna:
+        - tuple: (fechas de emisión, número de filas pendientes)
+    '''
+    fechas, pendientes = [], 0
+    for datos in datos_filas:
+        cup, numero = (datos["cups"] or "").strip(), (datos["factura_fiscal"] or "").strip()
+        fechas.append(datos["fecha"] or "")
+        if not cup or not numero or not es_factura_procesada("enel", cup, numero):
+            pendientes += 1
+    return fechas, pendientes
+
+
+# DATA 3. Lectura de la tabla con el postproceso de las facturas en tubería
+async def _iterar_tabla_facturas_enel(page: Page, contador_facturas: int = 0, marca_agua: MarcaAgua | None = None) -> AsyncIterator[FacturaEnel]:
     '''
     Realiza un bucle que recorre cada una de las páginas de la tabla de resultado llamando a la función que procesa dicha página.
+    Las facturas se entregan una a una según se terminan, sin acumular la tabla completa en memoria. El navegador sigue
+    paginando mientras las facturas ya descargadas pasan por el postproceso (OCR, Google, registro y email).
     Parametros:
         - page (Page): Pagina web del navegador
+        - contador_facturas (int): Facturas procesadas antes de esta tabla (para el log)
+        - marca_agua (MarcaAgua): Opcional. Estado del corte por páginas ya procesadas
     Retorna:
-        - list[FacturaEndesaCliente]: Listado de todas las facturas que se han procesado en el proceso
-        - int: Número total de facturas procesadas en todas las páginas
+        - AsyncIterator[FacturaEnel]: Cada factura procesada en cuanto está lista
+    '''
+    tuberia = TuberiaFacturas(ETAPAS_ENEL)
+    try:
+        async for factura in _recorrer_tabla_enel(page, tuberia, contador_facturas, marca_agua):
+            yield factura
+
+        # Al terminar la tabla se entregan las facturas que siguen en postproceso
+        async for factura in tuberia.vaciar():
+            yield factura
+    finally:
+        await tuberia.cancelar()
 
+
+# DATA 3.0 Bucle de lectura para todas las páginas de la tabla de resultados
+async def _recorrer_tabla_enel(page: Page, tuberia: TuberiaFacturas, contador_facturas: int = 0, marca_agua: MarcaAgua | None = None) -> AsyncIterator[FacturaEnel]:
     '''
-    todas_facturas: list[FacturaEnel] = []
-    
+    Recorre las páginas de la tabla entregando cada fila descargada a la tubería de postproceso.
+    Retorna:
+        - AsyncIterator[FacturaEnel]: Las facturas que terminan su postproceso mientras se recorre la tabla
+    '''
+    marca_agua = marca_agua or MarcaAgua("enel")
 
     try:
     # A. Esperar a que la tabla sea visible
         log.debug("Esperando visibilidad de la tabla LWC en Enel")
-        await page.wait_for_selector('table[lwc-392cvb27u8q]', timeout=60000)
-    
-    # B. Lectura de la página actual 
-        facturas_pagina = await _extraer_pagina_actual_enel(page, contador_facturas)
-        todas_facturas.extend(facturas_pagina)
-        contador_facturas += len(facturas_pagina)
+        with registro_latencias.medir("enel", "tabla_resultados", 60000) as medicion:
+            await page.wait_for_selector('table[lwc-392cvb27u8q]', timeout=medicion.timeout)
 
-    # C. Verificar si existe el botón "Siguiente" y si está habilitado
         next_button = page.locator('div.wp-pagination button').filter(has_text="Siguiente")
+        while True:
+    # B. Lectura de la página actual 
+            datos_filas = await _leer_filas_tabla_enel(page)
+            # aclosing: si la lectura se interrumpe, la página se cierra en el acto y cancela sus descargas anticipadas
+            async with aclosing(_iterar_pagina_actual_enel(page, contador_facturas, datos_filas, tuberia)) as facturas:
+                async for factura in facturas:
+                    contador_facturas += 1
+                    yield factura
+
+            # B.1 Corte de la paginación tras K páginas seguidas ya procesadas (resultados ordenados por fecha)
+            if marca_agua.registrar_pagina(*_resumen_pagina_enel(datos_filas)):
+                log.info(f"    [CORTE] {marca_agua.consecutivas} páginas seguidas ya procesadas; no se leen las páginas siguientes.")
+                return
+
+    # C. Si no hay botón "Siguiente" o está deshabilitado, no hay más páginas
+            if await next_button.count() == 0 or await next_button.is_disabled():
+                log.debug("No hay más páginas disponibles.")
+                return
     
-    # D, Si no hay botón o está deshabilitado, devolvemos los resultados actuales
-        if await next_button.count() == 0 or await next_button.is_disabled():
-            log.debug("No hay más páginas disponibles.")
-            return todas_facturas 
-    
-    # E. Si el botón "Siguiente" está habilitado, pulsamos y esperamos a que se cargue la siguiente página para continuar el proceso de extracción de datos
-        try:
-            log.debug("Pulsando botón 'Siguiente' para cargar más facturas...")
-            await next_button.click(timeout=10000)
-            await page.wait_for_load_state("networkidle")
-            await page.wait_for_timeout(2000) 
-        except TimeoutError:
-            log.error("    -->[ERROR] Tiempo excedido esperando la siguiente página de resultados.")
-            return todas_facturas
-            
-        
-    # F. Llamada recursiva para procesar la siguiente página, y acumulación de resultados
-        facturas_siguientes = await _extraer_tabla_facturas_enel(page, contador_facturas)
-        todas_facturas.extend(facturas_siguientes)
-        return todas_facturas
-        
+    # D. Si el botón "Siguiente" está habilitado, pulsamos y esperamos a que se cargue la siguiente página antes de volver a leer
+    #    (si la tabla no cambia ni tras un segundo click se deja de paginar: volver a leerla duplicaría la página)
+            try:
+                log.debug("Pulsando botón 'Siguiente' para cargar más facturas...")
+                with registro_latencias.medir("enel", "pagina_siguiente", 30000) as medicion:
+                    if not await pulsar_y_esperar_cambio_tabla(page, next_button, FILAS_TABLA_ENEL, medicion.timeout):
+                        medicion.fallo()
+                if medicion.fallida:
+                    log.error("    -->[ERROR] La tabla no pasó a la página siguiente tras reintentar. Se detiene la paginación.")
+                    return
+            except TimeoutError:
+                log.error("    -->[ERROR] Tiempo excedido esperando la siguiente página de resultados.")
+                return
     
     except TimeoutError:
         log.error("    -->[ERROR] Tiempo excedido esperando la tabla de resultados.")
 
     except Exception as e:
         log.error(f"    -->[ERROR] Fallo inesperado en la navegación de tabla: {str(e)}")
-        return todas_facturas 
+
+
+# DATA 3.1 Lectura completa de la tabla como lista (compatibilidad)
+async def _extraer_tabla_facturas_enel(page: Page, contador_facturas: int = 0, marca_agua: MarcaAgua | None = None) -> list[FacturaEnel]:
+    '''
+    Igual que `_iterar_tabla_facturas_enel`, pero devuelve todas las facturas de la tabla en una lista.
+    Retorna:
+        - list[FacturaEnel]: Listado de todas las facturas que se han procesado en el proceso
+    '''
+    return [factura async for factura in _iterar_tabla_facturas_enel(page, contador_facturas, marca_agua)]
 
 
 
@@ -359,12 +648,15 @@ async def _iniciar_sesion_enel(page: Page, username: str, password: str) -> bool
         await page.fill('input[name="username"]', username)
         await page.fill('input[name="password"]', password)
 
-    # C. Hace click en el botón de iniciar sesión
-        await page.click('button:has-text("ENTRAR")')
+    # C. Hace click en el botón de iniciar sesión y espera a salir del formulario de acceso
+        async def entrar():
+            await page.click('button:has-text("ENTRAR")')
+            log.debug("Enviando credenciales, esperando la redirección post-login...")
+            with registro_latencias.medir("enel", "login", 60000) as medicion:
+                await page.wait_for_url(lambda url: "/s/login" not in url, timeout=medicion.timeout)
 
-    # D. Esperar el indicador de éxito
-        log.debug("Enviando credenciales, esperando 'networkidle'...")
-        await page.wait_for_load_state("networkidle")
+    # D. Esperar a que terminen las llamadas Aura de la página de inicio (escuchando desde antes del click)
+        await esperar_aura_inactiva(page, accion=entrar)
 
         return True
     
@@ -378,6 +670,30 @@ async def _iniciar_sesion_enel(page: Page, username: str, password: str) -> bool
         return False
 
 
+# NAV.1.1 Verificación de una sesión restaurada
+async def _verificar_sesion_enel(page: Page) -> bool:
+    '''
+    Comprueba de forma barata si la sesión cargada desde disco sigue autenticada,
+    abriendo la página de facturas y verificando que aparece el selector de roles.
+    Parametros:
+        - page (Page): Pagina web del navegador con el storage_state restaurado
+    Retorna:
+        - bool: True si la sesión es válida, False si el portal exige un nuevo login
+    '''
+    try:
+    # A. Navegamos directamente a la página privada de facturas
+        log.debug("Verificando sesión restaurada en la página de facturas de Enel")
+        await page.goto(URL_FACTURAS_ENEL, wait_until="domcontentloaded")
+
+    # B. El botón de cambio de rol solo existe con la sesión iniciada
+        await page.locator('button[title="Cambio de rol"]').wait_for(state="visible", timeout=15000)
+        return "/login" not in page.url
+
+    except Exception as e:
+        log.debug(f"Sesión restaurada de Enel no válida: {e}")
+        return False
+
+
 # NAV.2 Obtención de roles
 async def _obtener_todos_los_roles(page: Page) -> list[str]:
     '''
@@ -454,9 +770,8 @@ async def _seleccionar_rol_especifico(page: Page, nombre_rol: str) -> bool:
             log.debug(f"El rol '{nombre_rol}' ya está seleccionado.")
             await page.locator('button[title="Cambio de rol"]').click()
         else:
-            await opcion.click()
             log.debug(f"Click en rol '{nombre_rol}', esperando carga...")
-            await page.wait_for_load_state("networkidle")
+            await esperar_aura_inactiva(page, accion=lambda: ejecutar_y_esperar_aura(page, opcion.click))
 
     
         return True
@@ -484,20 +799,19 @@ async def _aplicar_filtros_fechas(page: Page, f_desde, f_hasta) -> bool:
     try:
     
     # A. Navega a la página de facturas
+        capturar(page).reiniciar()
         log.debug(f"Navegando a facturas Enel: {URL_FACTURAS_ENEL}")
-        await page.goto(URL_FACTURAS_ENEL, wait_until="networkidle")
+        await page.goto(URL_FACTURAS_ENEL, wait_until="domcontentloaded")
         
-    # B. Activa la opcion de filtro por rango de fechas
+    # B. Activa la opcion de filtro por rango de fechas (el click espera a que el componente esté pintado)
         log.debug("Activando filtro por rango de fechas...")
-        await page.locator('span.slds-form-element__label:has-text("Rango de fechas")').click()
-        await page.wait_for_timeout(1000)
+        await page.locator('span.slds-form-element__label:has-text("Rango de fechas")').click(timeout=60000)
+        await page.locator('.filter-date-from input').wait_for(state="visible", timeout=10000)
         
     # C. Rellena los campos de fecha
         log.debug(f"Rellenando fechas: {f_desde} - {f_hasta}")
-        await page.fill('.filter-date-from input', "")
-        await page.type('.filter-date-from input', f_desde, delay=60)
-        await page.fill('.filter-date-to input', "")
-        await page.type('.filter-date-to input', f_hasta, delay=60)
+        await _escribir_fecha_enel(page, '.filter-date-from input', f_desde)
+        await _escribir_fecha_enel(page, '.filter-date-to input', f_hasta)
         
     # D. Aplica los filtros y espera a que se carguen los resultados
         log.debug("Pulsando botón 'Aplicar' filtros...")
@@ -511,7 +825,8 @@ async def _aplicar_filtros_fechas(page: Page, f_desde, f_hasta) -> bool:
         
         # E.1. Esperamos a que se muestre alguno de los dos indicadores (tabla de resultados o mensaje de sin resultados)
         try:
-            await page.locator(f"{selector_exito}, {selector_vacio}").first.wait_for(state="visible", timeout=90000)
+            with registro_latencias.medir("enel", "resultados_filtro", 90000) as medicion:
+                await page.locator(f"{selector_exito}, {selector_vacio}").first.wait_for(state="visible", timeout=medicion.timeout)
         except TimeoutError:
             log.error("    --> [ERROR] La página no respondió tras aplicar filtros.")
             return False
@@ -6,7 +6,8 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from utils.modelos_datos import FacturaEndesa, FacturaEnel
 from logic.logs_logic import log, mail_handler
-from config import ID_SHEET_ENDESA, ID_FOLDER_ENDESA_PDF, ID_SHEET_ENEL, ID_FOLDER_ENEL_PDF, SERVICE_ACCOUNT_FILE, SCOPES
+from config import SERVICE_ACCOUNT_FILE, SCOPES
+from utils.tenants import tenant_actual
 
 # === 1. GESTIÓN DE SERVICIOS DE GOOGLE (DRIVE & SHEETS) === 
 
@@ -353,7 +354,8 @@ def registrar_factura_google_endesa(factura: FacturaEndesa, ruta_pdf: str = None
     '''
     # A. Inicialización del gestor y preparación de fila
     log.info(f"\t[GOOGLE] Iniciando sincronización para factura Endesa: {factura.numero_factura}")
-    mgr = GoogleServiceManager(ID_SHEET_ENDESA)
+    tenant = tenant_actual()
+    mgr = GoogleServiceManager(tenant.id_sheet_endesa)
     f = [None] * len(mgr.cabecera_fija)
     
     # B. Mapeo exhaustivo de campos de FacturaEndesa a la cabecera fija de Sheets
@@ -369,7 +371,7 @@ def registrar_factura_google_endesa(factura: FacturaEndesa, ruta_pdf: str = None
     # C. Ejecución de guardado de datos y subida de archivo
     mgr.upsert_factura(factura.cup, factura.numero_factura, f, "ENDESA")
     if ruta_pdf: 
-        mgr.subir_pdf(ID_FOLDER_ENDESA_PDF, ruta_pdf)
+        mgr.subir_pdf(tenant.id_folder_endesa_pdf, ruta_pdf)
 
 
 # PUB.2 Registro de facturas para portal Enel
@@ -382,7 +384,8 @@ def registrar_factura_google_enel(factura: FacturaEnel, ruta_pdf: str = None):
     '''
     # A. Inicialización y preparación
     log.info(f"\t[GOOGLE] Iniciando sincronización para factura Enel: {factura.numero_factura}")
-    mgr = GoogleServiceManager(ID_SHEET_ENEL)
+    tenant = tenant_actual()
+    mgr = GoogleServiceManager(tenant.id_sheet_enel)
     f = [None] * len(mgr.cabecera_fija)
     
     # B. Mapeo específico de campos de FacturaEnel (Distribución) a Sheets
@@ -395,4 +398,4 @@ def registrar_factura_google_enel(factura: FacturaEnel, ruta_pdf: str = None):
     # C. Ejecución de guardado y subida
     mgr.upsert_factura(factura.cup, factura.numero_factura, f, "ENEL")
     if ruta_pdf: 
-        mgr.subir_pdf(ID_FOLDER_ENEL_PDF, ruta_pdf)
\ No newline at end of file
+        mgr.subir_pdf(tenant.id_folder_enel_pdf, ruta_pdf)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import os
 import mailchimp_transactional as MailchimpTransactional
@@ -58,7 +59,8 @@ async def enviar_factura_email(destinatarios: list, ruta_pdf: str, numero_factur
 
         # E. Ejecución del envío mediante la API
         log.debug(f"Enviando petición de correo a Mailchimp para {len(destinatarios)} destinatarios")
-        response = client.messages.send({"message": message})
+        # El cliente de Mailchimp es síncrono: se ejecuta en un hilo para no bloquear el navegador
+        response = await asyncio.to_thread(client.messages.send, {"message": message})
         
         # F. Evaluación del resultado de la operación
         # F.1. Comprobación de estados válidos (Enviado o En cola)
@@ -4,30 +4,31 @@ from logic.logs_logic import log, mail_handler
 
 # === 1. REGISTRO DE FACTURAS PROCESADAS === 
     
-    # A. Caché de facturas procesadas para optimizar lecturas
+    # A. Caché de facturas procesadas para optimizar lecturas (por ruta del registro: cada tenant tiene el suyo)
 _registros_cache_procesadas: dict[str, dict[tuple[str,str], str]] = {}
 
 
 # PROC.1 Obtención de rutas por distribuidora
 def _get_path_procesados(distribuidora: str) -> str:
     '''
-    Devuelve la ruta del CSV de procesados para una distribuidora concreta.
+    Devuelve la ruta del CSV de procesados para una distribuidora concreta en el tenant en curso.
     Parametros:
         - distribuidora (str): Identificador de la distribuidora ("endesa" o "enel")
     Retorna:
         - str: Ruta completa del archivo CSV de registros de proceso
     '''
     # A. Importación local para evitar dependencias circulares
-    from config import REGISTRO_FOLDERS_PROCESADAS
+    from utils.tenants import tenant_actual
+    carpetas = tenant_actual().registro_procesadas
     key = distribuidora.lower()
     
     # B. Validación de la existencia de la distribuidora en configuración
-    if key not in REGISTRO_FOLDERS_PROCESADAS:
+    if key not in carpetas:
         log.error(f"Se intentó acceder a una distribuidora desconocida: {distribuidora}")
         raise ValueError(f"Distribuidora desconocida: {distribuidora}")
     
     # C. Construcción de la ruta del archivo de registro
-    return os.path.join(REGISTRO_FOLDERS_PROCESADAS[key], f"procesados_{key}.csv")
+    return os.path.join(carpetas[key], f"procesados_{key}.csv")
 
 
 # PROC.2 Carga de registros con sistema de caché
@@ -41,12 +42,12 @@ def cargar_registro_procesados(distribuidora: str) -> dict[tuple[str,str], str]:
     '''
     # A. Verificación de existencia en caché para evitar E/S innecesaria
     key = distribuidora.lower()
-    if key in _registros_cache_procesadas:
+    path = _get_path_procesados(key)
+    if path in _registros_cache_procesadas:
         log.debug(f"Cargando registros procesados de '{key}' desde caché")
-        return _registros_cache_procesadas[key]
+        return _registros_cache_procesadas[path]
 
     # B. Inicialización y carga desde el archivo físico si no está en caché
-    path = _get_path_procesados(key)
     registros: dict[tuple[str,str], str] = {}
     
     if os.path.isfile(path):
@@ -68,7 +69,7 @@ def cargar_registro_procesados(distribuidora: str) -> dict[tuple[str,str], str]:
         log.debug(f"No existe archivo de registros previo para '{key}' en {path}")
 
     # C. Actualización de caché y retorno
-    _registros_cache_procesadas[key] = registros
+    _registros_cache_procesadas[path] = registros
     return registros
 
 
@@ -177,8 +178,8 @@ def _actualizar_registro_procesados(distribuidora_key: str, cup: str, numero: st
                 writer.writerows(registros_modificados)
         
         # D. Invalidación de caché para asegurar consistencia en futuras lecturas
-        if distribuidora_key in _registros_cache_procesadas:
-            del _registros_cache_procesadas[distribuidora_key]
+        if path in _registros_cache_procesadas:
+            del _registros_cache_procesadas[path]
     except Exception as e:
         log.error(f"Fallo crítico actualizando registro físico {path}: {e}")
         pass
@@ -186,9 +187,12 @@ def _actualizar_registro_procesados(distribuidora_key: str, cup: str, numero: st
 
 # === 2. REGISTRO DE ENVÍOS POR EMAIL === 
 
-    # A. Caché de facturas enviadas
+    # A. Caché de facturas enviadas (por ruta del registro)
 _registros_cache_enviadas: dict[str, dict[tuple[str,str], str]] = {}
 
+    # B. Envíos en curso en este proceso (por ruta del registro), para que dos tuberías no manden la misma factura a la vez
+_envios_en_curso: dict[str, set[tuple[str,str]]] = {}
+
 
 # MAIL.1 Obtención de rutas de envío por distribuidora
 def _get_path_enviadas(distribuidora: str) -> str:
@@ -199,12 +203,13 @@ def _get_path_enviadas(distribuidora: str) -> str:
     Retorna:
         - str: Ruta al archivo de registros de envío
     """
-    from config import REGISTRO_FOLDERS_ENVIADAS
+    from utils.tenants import tenant_actual
+    carpetas = tenant_actual().registro_enviadas
     key = distribuidora.lower()
-    if key not in REGISTRO_FOLDERS_ENVIADAS:
+    if key not in carpetas:
         log.error(f"Ruta de envíos no configurada para: {distribuidora}")
         raise ValueError(f"Distribuidora desconocida: {distribuidora}")
-    return os.path.join(REGISTRO_FOLDERS_ENVIADAS[key], f"enviadas_{key}.csv")
+    return os.path.join(carpetas[key], f"enviadas_{key}.csv")
 
 
 # MAIL.2 Carga de registros de envío en caché
@@ -218,12 +223,12 @@ def cargar_registro_enviadas(distribuidora: str) -> dict[tuple[str,str], str]:
     """
     # A. Gestión de caché para optimización
     key = distribuidora.lower()
-    if key in _registros_cache_enviadas:
+    path = _get_path_enviadas(key)
+    if path in _registros_cache_enviadas:
         log.debug(f"Cargando historial de envíos '{key}' desde caché")
-        return _registros_cache_enviadas[key]
+        return _registros_cache_enviadas[path]
 
     # B. Carga desde archivo físico
-    path = _get_path_enviadas(key)
     registros: dict[tuple[str,str], str] = {}
     
     if os.path.isfile(path):
@@ -242,7 +247,7 @@ def cargar_registro_enviadas(distribuidora: str) -> dict[tuple[str,str], str]:
             pass
 
     # C. Persistencia en caché y retorno
-    _registros_cache_enviadas[key] = registros
+    _registros_cache_enviadas[path] = registros
     return registros
 
 
@@ -301,6 +306,33 @@ def registrar_factura_enviada(distribuidora: str, cup: str, numero: str) -> None
     registros[(cup, numero)] = fecha_hora
 
 
+# MAIL.5 Reserva de un envío frente a otras tuberías del mismo proceso
+def reservar_envio(distribuidora: str, cup: str, numero: str) -> bool:
+    """
+    Reserva el envío de una factura mientras se manda el email: entre la comprobación de `es_factura_enviada` y el
+    registro del envío hay un `await`, y otra tubería en curso (CUPS, ventanas, roles) podría enviarla a la vez.
+    La reserva solo cubre el proceso actual; dos ejecuciones en procesos distintos no se ven entre sí.
+    Parametros:
+        - distribuidora (str): Distribuidora origen
+        - cup (str): CUP asociado
+        - numero (str): Número de factura
+    Retorna:
+        - bool: True si se ha reservado; False si ya está enviada o la envía otra tubería
+    """
+    en_curso = _envios_en_curso.setdefault(_get_path_enviadas(distribuidora.lower()), set())
+    if (cup, numero) in en_curso or es_factura_enviada(distribuidora, cup, numero):
+        return False
+    en_curso.add((cup, numero))
+    return True
+
+
+def liberar_envio(distribuidora: str, cup: str, numero: str) -> None:
+    """
+    Libera la reserva de `reservar_envio` al terminar el envío (con éxito o sin él).
+    """
+    _envios_en_curso.get(_get_path_enviadas(distribuidora.lower()), set()).discard((cup, numero))
+
+
 # === 3. UTILIDADES DE LIMPIEZA DE REGISTROS === 
 
 
@@ -1,43 +1,172 @@
 ### IMPORTACIÓN DE DEPENDENCIAS
 import asyncio
+import functools
+import json
+import random
+from typing import AsyncIterator
 
     # Navegador Asíncrono
 from utils.navegador import NavegadorAsync
+from playwright.async_api import Page
+from utils.sesiones import almacen_sesiones
+from utils.reciclaje import ControlReciclaje
+from utils.circuito import circuito_portales
+from utils.latencias import registro_latencias
+from utils.captura_aura import capturar, decodificar_filas, ALIAS_ENDESA, ALIAS_ENEL
+from utils.cliente_aura import ClienteAura
+from utils.planificador import planificador_busquedas, FiltroCups, GLOBAL, dividir_ventana, clave_cup
+from utils.flujo import fusionar
+from utils.roles import catalogo_roles
+from utils.marca_agua import MarcaAgua
+from utils.tenants import Tenant, cargar_tenants, tenant_actual, usar_tenant
+from utils.ciclos import predictor_ciclos
+from utils.perfilador import perfilador_acciones
+from utils.trazas import guardar_traza
     # Clases Facturas
 from utils.modelos_datos import FacturaEndesa, FacturaEnel
     # Logs
 from logic.logs_logic import log, mail_handler
     # utilidades CSV/registro
-from parsers.exportar_datos import cargar_registro_procesados
+from parsers.exportar_datos import cargar_registro_procesados, es_factura_procesada
     # Logics
-from logic.endesa_logic import _iniciar_sesion_endesa, _aceptar_cookies_endesa, _realizar_busqueda_facturas_endesa, _extraer_tabla_facturas_endesa
-from logic.enel_logic import _iniciar_sesion_enel, _obtener_todos_los_roles, _seleccionar_rol_especifico, _aplicar_filtros_fechas, _extraer_tabla_facturas_enel
+from logic.endesa_logic import _iniciar_sesion_endesa, _verificar_sesion_endesa, _aceptar_cookies_endesa, _realizar_busqueda_facturas_endesa, _iterar_tabla_facturas_endesa, _buscar_facturas_endesa_http, _resultados_saturados_endesa
+from logic.enel_logic import _iniciar_sesion_enel, _verificar_sesion_enel, _obtener_todos_los_roles, _seleccionar_rol_especifico, _aplicar_filtros_fechas, _iterar_tabla_facturas_enel
     # CONSTANTES DE CONFIGURACION
-from config import MAX_LOGIN_ATTEMPTS,URL_LOGIN_ENDESA,USER_ENDESA,PASSWORD_ENDESA, MAX_LOGIN_ATTEMPTS, URL_LOGIN_ENEL, USER_ENEL, PASSWORD_ENEL
+from config import MAX_LOGIN_ATTEMPTS,URL_LOGIN_ENDESA, URL_LOGIN_ENEL, URL_FACTURAS_ENEL, TENANTS_CONCURRENCIA, LOGIN_ESPERA_BASE_S, LOGIN_ESPERA_MAX_S, CLIENTE_AURA_ACTIVO, DIVISION_VENTANAS
+
+
+# === 0. GESTIÓN COMÚN DE LA SESIÓN EN LOS PORTALES === 
+
+# SES.1 Apertura de sesión reutilizando el storage_state guardado o con login completo
+async def _establecer_sesion(robot: NavegadorAsync, portal: str, url_login: str, usuario: str, password: str, funcion_login, funcion_verificar) -> bool:
+    '''
+    Deja el navegador con una sesión autenticada en el portal indicado.
+    Primero intenta restaurar la sesión guardada (dentro de su TTL) y la valida con una sonda barata;
+    si no es válida, realiza el login completo con reintentos y guarda la nueva sesión.
+    Los reintentos abren un contexto limpio sin relanzar Chromium y esperan con backoff exponencial;
+    si el portal acumula ejecuciones fallidas, el circuito del portal hace fallar la ejecución de inmediato.
+    Parametros:
+        - robot (NavegadorAsync): Navegador sin iniciar.
+        - portal (str): Identificador del portal ("endesa" o "enel"), con el sufijo del tenant si no es el principal.
+        - url_login (str): URL del formulario de acceso.
+        - usuario (str): Usuario de acceso.
+        - password (str): Contraseña de acceso.
+        - funcion_login: Corrutina de login del portal (page, usuario, password) -> bool.
+        - funcion_verificar: Corrutina de sonda de sesión del portal (page) -> bool.
+    Retorna
+        - bool: True si la sesión se restauró desde disco, False si se hizo login completo.
+    '''
+    # A. Cortocircuito: si el portal lleva varias ejecuciones sin acceso se falla de inmediato
+    if not circuito_portales.permitir(portal):
+        raise Exception(f"Fallo crítico: acceso a {portal} en enfriamiento tras logins fallidos consecutivos.")
+
+    # B. Reutilización de la sesión guardada si sigue vigente
+    ruta_sesion = almacen_sesiones.cargar(portal, usuario)
+    if ruta_sesion:
+        log.info("\t[LOGIN] Sesión guardada encontrada. Verificando validez...")
+        await robot.iniciar(storage_state=ruta_sesion)
+        if await funcion_verificar(robot.get_page()):
+            log.info("\t\t[LOGIN] Sesión restaurada correctamente, se omite el login.")
+            await almacen_sesiones.guardar(portal, usuario, robot.context)
+            circuito_portales.registrar_exito(portal)
+            return True
+
+        log.info("\t\t[LOGIN] La sesión guardada ya no es válida. Se realizará login completo.")
+        almacen_sesiones.invalidar(portal, usuario)
+
+    # C. Login completo con reintentos sobre el mismo navegador
+    for attempt in range(1, MAX_LOGIN_ATTEMPTS + 1):
+        log.info(f"\t[LOGIN] Intento {attempt}/{MAX_LOGIN_ATTEMPTS}...")
+        
+        # C.1. Contexto limpio (sin relanzar Chromium si ya está abierto) y navegación a la URL de acceso
+        try:
+            if robot.context:
+                log.debug("Abriendo contexto limpio sobre el navegador existente...")
+                await robot.reiniciar_contexto()
+            else:
+                log.debug("Iniciando instancia de navegador...")
+                await robot.iniciar()
+            log.debug(f"Navegando a URL de Login: {url_login}")
+            await robot.goto_url(url_login)
+            
+            # C.2. Intento de validación de credenciales en el portal de Salesforce
+            login_successful = await funcion_login(robot.get_page(), usuario, password)
+        except Exception as e:
+            log.warning(f"\t\t[ADVERTENCIA] Error durante el intento de login: {e}")
+            login_successful = False
+        
+        # C.3. Control de flujo según éxito de sesión y guardado para próximas ejecuciones
+        if login_successful:
+            log.info("\t\t[LOGIN] Sesión establecida correctamente.")
+            await almacen_sesiones.guardar(portal, usuario, robot.context)
+            circuito_portales.registrar_exito(portal)
+            return False
+        
+        log.warning(f"\t\t[ADVERTENCIA] Intento de login {attempt} fallido.")
+        
+        # C.4. Espera con backoff exponencial y jitter, o fallo crítico (y registro en el circuito) tras agotar intentos
+        if attempt < MAX_LOGIN_ATTEMPTS:
+            espera = _espera_reintento(attempt)
+            log.debug(f"Reintentando login en {espera:.1f} s...")
+            await asyncio.sleep(espera)
+        else:
+            circuito_portales.registrar_fallo(portal)
+            log.critical(f"No se pudo acceder al portal {portal} tras {MAX_LOGIN_ATTEMPTS} intentos.")
+            raise Exception(f"Fallo crítico: No se pudo acceder al portal tras {MAX_LOGIN_ATTEMPTS} intentos.")
+
+
+# SES.1.1 Espera entre reintentos de login
+def _espera_reintento(intento: int) -> float:
+    '''
+    Calcula la espera tras el intento indicado: backoff exponencial acotado con jitter
+    (la mitad fija y la otra mitad aleatoria) para no sincronizar reintentos de ejecuciones simultáneas.
+    Parametros:
+        - intento (int): Número del intento fallido (1..N).
+    Retorna
+        - float: Segundos de espera.
+    '''
+    techo = min(LOGIN_ESPERA_MAX_S, LOGIN_ESPERA_BASE_S * 2 ** (intento - 1))
+    return techo / 2 + random.uniform(0, techo / 2)
+
+
+# SES.2 Resumen de los reciclajes de contexto de la ejecución
+def _informar_reciclajes(robot: NavegadorAsync) -> None:
+    '''
+    Vuelca en el log las lecturas de memoria de cada reciclaje para poder ajustar los umbrales.
+    '''
+    if not robot.lecturas_reciclaje:
+        return
+    log.info(f"[RECICLAJE] {len(robot.lecturas_reciclaje)} reciclaje(s) de contexto en la ejecución:")
+    for lectura in robot.lecturas_reciclaje:
+        log.info(f"\t{lectura}")
 
 
 # === 1. LÓGICA PRINCIPAL DEL ROBOT ENDESA (CLIENTES) === 
 
-# END.1 Ejecución del flujo de extracción para portal Endesa
-async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups: list = None) -> list[FacturaEndesa]:
+# END.1 Ejecución del flujo de extracción para portal Endesa (flujo de facturas)
+async def iterar_robot_endesa(fecha_desde: str, fecha_hasta: str, lista_cups: list = None) -> AsyncIterator[FacturaEndesa]:
     '''
-    Coordina el proceso completo de login, búsqueda y extracción de facturas en el portal de Endesa Clientes.
+    Coordina el proceso completo de login, búsqueda y extracción de facturas en el portal de Endesa Clientes,
+    entregando cada factura en cuanto termina de procesarse (sin acumular la ejecución completa en memoria).
+    Con varios trabajadores, las facturas salen en orden de finalización.
     Parametros:
         - fecha_desde (str): Límite inicial del rango de búsqueda.
         - fecha_hasta (str): Límite final del rango de búsqueda.
         - lista_cups (list): Opcionalmente, una lista de CUPS específicos para filtrar.
     Retorna
-        - list[FacturaEndesa]: Lista de objetos factura con los datos extraídos y procesados.
+        - AsyncIterator[FacturaEndesa]: Objetos factura con los datos extraídos y procesados.
     '''
-    robot = NavegadorAsync()
-    facturas_totales = []
-    login_successful = False
+    tenant = tenant_actual()
+    robot = NavegadorAsync(tenant.clave("endesa"))
+    lista_cups = lista_cups or tenant.cups_endesa
+    total_facturas = 0
     total_cups_log = len(lista_cups) if lista_cups else "TODOS LOS"
 
     try:
         # A. Preparación de registros y configuración previa
         # A.1. Precargar fichero de procesados para optimizar verificaciones de duplicados
         cargar_registro_procesados('endesa')
+        perfilador_acciones.instalar()
         from config import REPROCESADO
         if REPROCESADO:
             log.info("[CONFIG] REPROCESADO=True -> se ignorarán marcas anteriores.")
@@ -45,33 +174,7 @@ async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups:
         # B. Inicio del proceso y gestión de autenticación (Login)
         log.info(f"\n    [INICIO] Iniciando proceso RPA-ENDESA para {total_cups_log} CUPS. \n\n{'='*40}")
         
-        for attempt in range(1, MAX_LOGIN_ATTEMPTS + 1):
-            log.info(f"\t[LOGIN] Intento {attempt}/{MAX_LOGIN_ATTEMPTS}...")
-            
-            # B.1. Lanzamiento del navegador y navegación a la URL de acceso
-            log.debug("Iniciando instancia de navegador...")
-            await robot.iniciar()
-            log.debug(f"Navegando a URL de Login: {URL_LOGIN_ENDESA}")
-            await robot.goto_url(URL_LOGIN_ENDESA)
-            
-            # B.2. Intento de validación de credenciales en el portal de Salesforce
-            login_successful = await _iniciar_sesion_endesa(robot.get_page(), USER_ENDESA, PASSWORD_ENDESA)
-            
-            # B.3. Control de flujo según éxito de sesión
-            if login_successful:
-                log.info("\t\t[LOGIN] Sesión establecida correctamente.")
-                break
-            
-            # B.4. Cierre de contexto en caso de fallo para reintentar limpiamente
-            log.warning(f"\t\t[ADVERTENCIA] Intento de login {attempt} fallido.")
-            await robot.cerrar()
-            
-            # B.5. Espera entre reintentos o lanzamiento de excepción crítica tras agotar intentos
-            if attempt < MAX_LOGIN_ATTEMPTS:
-                await asyncio.sleep(5)
-            else:
-                log.critical(f"No se pudo acceder al portal tras {MAX_LOGIN_ATTEMPTS} intentos.")
-                raise Exception(f"Fallo crítico: No se pudo acceder al portal tras {MAX_LOGIN_ATTEMPTS} intentos.")
+        await _establecer_sesion(robot, tenant.clave("endesa"), URL_LOGIN_ENDESA, tenant.usuario_endesa, tenant.password_endesa, _iniciar_sesion_endesa, _verificar_sesion_endesa)
 
         # C. Gestión de elementos post-login
         page = robot.get_page()
@@ -84,39 +187,34 @@ async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups:
         if lista_cups and len(lista_cups) > 0:
             log.info(f"    [MODO] Procesando lista de {len(lista_cups)} CUPS.")
 
-            # D.1.1 Iteración sobre la lista de suministros
-            for index, cup_actual in enumerate(lista_cups, start=1):
-                log.info(f"\n{'='*80}\nPROCESANDO [{index}/{len(lista_cups)}]: CUP {cup_actual}\n{'='*80}")
-                
-                try:
-                    # D.1.1.1. Ejecución de búsqueda filtrada por CUP y rango temporal
-                    log.info("\t[BUSQUEDA]")
-                    await _realizar_busqueda_facturas_endesa(page, fecha_desde, fecha_hasta, cup_actual)
-                    
-                    # D.1.1.2. Extracción recursiva de todas las páginas de la tabla de resultados
-                    log.info("\t[EXTRACCIÓN]")
-                    facturas_cup = await _extraer_tabla_facturas_endesa(page)
-                    
-                    # D.1.1.3. Consolidación de resultados y registro de éxito
-                    if facturas_cup:
-                        facturas_totales.extend(facturas_cup)
-                        log.info(f"\n{'='*80}\n\t[OK] {len(facturas_cup)} facturas procesadas para {cup_actual}.\n{'='*80}")
-                    else:
-                        log.info(f"\n{'='*80}\n\t[INFO] No se encontraron facturas para {cup_actual}.\n{'='*80}")
-                        
-                except Exception as e:
-                    # D.1.1.4. Control de errores por CUP: registro del fallo y salto al siguiente elemento
-                    error_detalle = str(e)
-                    log.error(f"\n{'='*80}\n\t[ERROR] Fallo en CUP {cup_actual}: {error_detalle}\n{'='*80}")
-                    
-                    registro_error = FacturaEndesa(cup=cup_actual, error_RPA=True, msg_error_RPA=f"ERROR: {error_detalle[:1000]}")
-                    facturas_totales.append(registro_error)
-                    log.info("Continuando con el siguiente CUP...")
-                    continue
+            # D.1.0 Orden por ciclo de facturación previsto (y descarte opcional de los CUPS que aún no tienen factura,
+            #       que reciben su propio registro para distinguirlos de los CUPS buscados sin resultados)
+            lista_cups, omitidos = predictor_ciclos.priorizar(tenant.clave("endesa"), "endesa", lista_cups, fecha_desde, fecha_hasta)
+            for cup in omitidos:
+                yield _factura_no_prevista(cup)
+
+            # D.1.1 Descarte por HTTP (sin navegador) de los CUPS sin facturas nuevas
+            #       (los CUPS sin ninguna factura reciben su registro SIN_FACTURAS, como si se hubieran buscado en la tabla)
+            if CLIENTE_AURA_ACTIVO and len(lista_cups) > 1:
+                lista_cups, sin_facturas = await _prefiltrar_cups_http(robot, lista_cups, fecha_desde, fecha_hasta)
+                for cup in sin_facturas:
+                    yield _factura_no_encontrada(cup)
+
+            # D.1.2 Elección entre una búsqueda por CUP o una búsqueda global filtrada localmente
+            #       (si la búsqueda global falla, se reparte la lista entre trabajadores concurrentes)
+            if planificador_busquedas.planificar(tenant.clave("endesa"), lista_cups, tenant.workers_cups) == GLOBAL and await _buscar_cups_global(robot, lista_cups, fecha_desde, fecha_hasta):
+                facturas_lista = _iterar_cups_global(robot, lista_cups, fecha_desde, fecha_hasta)
+            else:
+                facturas_lista = _iterar_cups_concurrente(robot, lista_cups, fecha_desde, fecha_hasta)
+            async for factura in facturas_lista:
+                total_facturas += 1
+                yield factura
+            predictor_ciclos.completar(tenant.clave("endesa"))
         
         # D.2 MODO B: Búsqueda Global (Sin lista de CUPS)
         else:
             log.info(f"\n{'='*80}\nPROCESANDO BÚSQUEDA GLOBAL: Todos los CUPS disponibles\n{'='*80}")
+            facturas_globales = 0
             
             try:
                 # D.2.1. Aplicación de filtros temporales sin restricción de identificador
@@ -125,24 +223,27 @@ async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups:
                 
                 # D.2.2. Procesamiento masivo de la tabla de resultados
                 log.info("\t[EXTRACCIÓN]")
-                facturas_globales = await _extraer_tabla_facturas_endesa(page)
+                reciclaje = ControlReciclaje(robot, "global")
+                async for factura in _iterar_con_division_endesa(robot, page, reciclaje, fecha_desde, fecha_hasta, None, None, tenant.workers_cups):
+                    facturas_globales += 1
+                    yield factura
                 
                 # D.2.3. Evaluación de resultados globales
                 if facturas_globales:
-                    facturas_totales.extend(facturas_globales)
-                    log.info(f"\n{'='*80}\n\t[OK] Búsqueda global finalizada: {len(facturas_globales)} facturas.\n{'='*80}")
+                    log.info(f"\n{'='*80}\n\t[OK] Búsqueda global finalizada: {facturas_globales} facturas.\n{'='*80}")
                 else:
                     log.info(f"\n{'='*80}\n\t[INFO] Sin resultados en búsqueda global.\n{'='*80}")
 
             except Exception as e:
                 # D.2.4. Gestión de errores en modo global
-                registro_vacio = FacturaEndesa(cup="GLOBAL", error_RPA=False, msg_error_RPA=f"Error en búsqueda global: {str(e)[:1000]}")
-                facturas_totales.append(registro_vacio)
                 log.error(f"Fallo crítico en búsqueda global: {str(e)}", exc_info=True)
+                yield FacturaEndesa(cup="GLOBAL", error_RPA=False, msg_error_RPA=f"Error en búsqueda global: {str(e)[:1000]}")
+                facturas_globales += 1
+            total_facturas += facturas_globales
 
-        # E. Finalización y retorno de datos consolidados
-        log.info(f"\n\n{'='*80}\n[OK][FIN] Proceso RPA completado.\n\tTotal facturas extraídas: {len(facturas_totales)}\n{'='*80}")
-        return facturas_totales
+        # E. Finalización
+        _informar_reciclajes(robot)
+        log.info(f"\n\n{'='*80}\n[OK][FIN] Proceso RPA completado.\n\tTotal facturas extraídas: {total_facturas}\n{'='*80}")
 
     except Exception as e:
         # F. Captura de fallos críticos a nivel de script
@@ -151,33 +252,443 @@ async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups:
 
     finally:
         # G. Liberación garantizada de recursos del navegador y envío de correo de logs
-        if hasattr(robot, 'browser') and robot.browser:
+        if robot.context:
             await robot.cerrar()
             log.info("[SISTEMA] Navegador cerrado y recursos liberados.\n")
         
+        # Informe de deriva de latencias y actualización del histórico de timeouts
+        registro_latencias.informe_deriva("endesa")
+        registro_latencias.guardar("endesa")
+        perfilador_acciones.informe(tenant.clave("endesa"))
+        planificador_busquedas.guardar(tenant.clave("endesa"))
+
         # Envío consolidado de alertas de error
         mail_handler.flush_to_email()
 
 
+# END.1.1 Ejecución completa devolviendo la lista de facturas (compatibilidad)
+async def ejecutar_robot_endesa( fecha_desde: str, fecha_hasta:str, lista_cups: list = None) -> list[FacturaEndesa]:
+    '''
+    Igual que `iterar_robot_endesa`, pero devuelve todas las facturas en una lista. Con lista de CUPS,
+    las facturas se agrupan en el orden de la lista (las que no son de ningún CUP solicitado, al final).
+    Parametros:
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+        - lista_cups (list): Opcionalmente, una lista de CUPS específicos para filtrar.
+    Retorna
+        - list[FacturaEndesa]: Lista de objetos factura con los datos extraídos y procesados.
+    '''
+    facturas_totales = [factura async for factura in iterar_robot_endesa(fecha_desde, fecha_hasta, lista_cups)]
+    if lista_cups:
+        posiciones = {}
+        for posicion, cup in enumerate(lista_cups):
+            posiciones.setdefault(clave_cup(cup), posicion)
+        facturas_totales.sort(key=lambda f: posiciones.get(clave_cup(f.cup), len(lista_cups)))
+    return facturas_totales
+
+
+# END.2 Búsqueda y extracción de las facturas de un único CUP
+async def _iterar_cup_endesa(page: Page, cup_actual: str, fecha_desde: str, fecha_hasta: str, index: int, total: int, worker: int = 0, reciclaje: ControlReciclaje | None = None) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Busca y procesa las facturas de un CUP en la página indicada, aislando cualquier error en un registro de fallo.
+    Parametros:
+        - page (Page): Página del trabajador que procesa el CUP.
+        - cup_actual (str): CUP a procesar.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+        - index (int): Posición del CUP en la lista original (para el log).
+        - total (int): Tamaño de la lista de CUPS (para el log).
+        - worker (int): Identificador del trabajador (para el log).
+        - reciclaje (ControlReciclaje): Opcional. Control de reciclaje del contexto del trabajador.
+    Retorna
+        - AsyncIterator[FacturaEndesa]: Facturas procesadas del CUP, terminando con un registro de error si falla.
+    '''
+    log.info(f"\n{'='*80}\nPROCESANDO [{index}/{total}] [W{worker}]: CUP {cup_actual}\n{'='*80}")
+    facturas_cup = 0
+    
+    try:
+        # A. Ejecución de búsqueda filtrada por CUP y rango temporal
+        log.info("\t[BUSQUEDA]")
+        if not await _realizar_busqueda_facturas_endesa(page, fecha_desde, fecha_hasta, cup_actual):
+            raise Exception("No se pudo realizar la búsqueda del CUP.")
+        
+        # B. Extracción de todas las páginas de la tabla de resultados
+        log.info("\t[EXTRACCIÓN]")
+        filtro = FiltroCups([cup_actual], descartar=False)
+        async for factura in _iterar_con_division_endesa(None, page, reciclaje, fecha_desde, fecha_hasta, cup_actual, filtro):
+            facturas_cup += 1
+            yield factura
+        # B.1. El recuento de filas solo vale para el planificador si la tabla se ha recorrido entera
+        if filtro.completa:
+            planificador_busquedas.registrar_cup(tenant_actual().clave("endesa"), cup_actual, len(filtro.facturas_de(cup_actual)))
+        
+        # C. Registro de éxito (una tabla sin filas solo confirma "sin facturas" si se ha recorrido entera)
+        if facturas_cup:
+            log.info(f"\n{'='*80}\n\t[OK] {facturas_cup} facturas procesadas para {cup_actual}.\n{'='*80}")
+        elif not filtro.facturas_de(cup_actual) and not filtro.completa:
+            log.error(f"\n{'='*80}\n\t[ERROR] La tabla de {cup_actual} no se pudo recorrer entera.\n{'='*80}")
+            yield _tabla_incompleta(cup_actual)
+        elif not filtro.facturas_de(cup_actual):
+            log.info(f"\n{'='*80}\n\t[INFO] No se encontraron facturas para {cup_actual}.\n{'='*80}")
+            yield _factura_no_encontrada(cup_actual)
+        else:
+            log.info(f"\n{'='*80}\n\t[INFO] Sin facturas nuevas para {cup_actual}.\n{'='*80}")
+            
+    except Exception as e:
+        # D. Control de errores por CUP: registro del fallo sin afectar al resto
+        error_detalle = str(e)
+        log.error(f"\n{'='*80}\n\t[ERROR] Fallo en CUP {cup_actual}: {error_detalle}\n{'='*80}")
+        await guardar_traza(page, cup_actual, paso=type(e).__name__)
+        yield FacturaEndesa(cup=cup_actual, error_RPA=True, msg_error_RPA=f"ERROR: {error_detalle[:1000]}")
+
+
+# END.3 Reparto de la lista de CUPS entre trabajadores concurrentes
+async def _iterar_cups_concurrente(robot: NavegadorAsync, lista_cups: list, fecha_desde: str, fecha_hasta: str) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Procesa la lista de CUPS con un conjunto acotado de trabajadores que comparten la sesión autenticada.
+    Cada trabajador toma CUPS de una cola común en su propia página; las facturas se entregan según terminan.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la sesión iniciada.
+        - lista_cups (list): CUPS a procesar.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+    Retorna
+        - AsyncIterator[FacturaEndesa]: Facturas de todos los CUPS, en orden de finalización.
+    '''
+    # A. Cola de trabajo con la posición original de cada CUP (para el log)
+    total = len(lista_cups)
+    num_workers = min(tenant_actual().workers_cups, total)
+    cola: asyncio.Queue = asyncio.Queue()
+    for index, cup in enumerate(lista_cups):
+        cola.put_nowait((index, cup))
+    log.info(f"    [MODO] {num_workers} trabajador(es) concurrente(s) para {total} CUPS.")
+
+    # B. Definición del trabajador: el 0 usa la página principal, el resto abren la suya
+    async def trabajador(worker: int, emitir):
+        page = None
+        reciclaje = ControlReciclaje(robot, f"W{worker}")
+        try:
+            page = robot.get_page() if worker == 0 else await robot.abrir_pagina_trabajo()
+            while True:
+                try:
+                    index, cup = cola.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # B.1. Si la página del trabajador se ha cerrado o caído se abre otra
+                if page.is_closed():
+                    page = await robot.abrir_pagina_trabajo()
+                async for factura in _iterar_cup_endesa(page, cup, fecha_desde, fecha_hasta, index + 1, total, worker, reciclaje):
+                    await emitir(factura)
+
+                # B.2. La página puede haberse reciclado dentro de la tabla; si no, se evalúa entre CUPS
+                page = reciclaje.adoptar(page)
+                motivo = await reciclaje.debe_reciclar(page)
+                if motivo and not cola.empty():
+                    page = await reciclaje.reciclar(page, motivo)
+        except Exception as e:
+            # B.3. El fallo de un trabajador no detiene al resto: los CUPS pendientes los toman los demás
+            log.error(f"\t[ERROR] Trabajador W{worker} detenido: {e}")
+        finally:
+            if page is not None and page is not robot.page:
+                await robot.cerrar_pagina_trabajo(page)
+
+    # C. Ejecución concurrente, entregando las facturas según las emiten los trabajadores
+    async for factura in fusionar([functools.partial(trabajador, w) for w in range(num_workers)]):
+        yield factura
+
+    # D. CUPS que quedaron en cola porque todos los trabajadores se detuvieron
+    while not cola.empty():
+        index, cup = cola.get_nowait()
+        yield FacturaEndesa(cup=cup, error_RPA=True, msg_error_RPA="ERROR: CUP no procesado, todos los trabajadores se detuvieron.")
+
+
+# END.4 Descarte previo por HTTP de los CUPS sin facturas nuevas
+async def _prefiltrar_cups_http(robot: NavegadorAsync, lista_cups: list, fecha_desde: str, fecha_hasta: str) -> tuple[list, list]:
+    '''
+    Hace la búsqueda del primer CUP en el navegador para capturar la acción Aura de búsqueda y la repite por HTTP
+    para el resto de CUPS. Los CUPS sin facturas, o con todas ya procesadas, se descartan sin abrir la tabla.
+    Si la captura o el cliente HTTP fallan, se devuelven todos los CUPS para procesarlos con el navegador.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la sesión iniciada.
+        - lista_cups (list): CUPS a procesar.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+    Retorna
+        - list: CUPS que hay que procesar en el navegador, en el orden original.
+        - list: CUPS descartados porque la consulta HTTP no devolvió ninguna factura (necesitan su registro SIN_FACTURAS).
+    '''
+    page = robot.get_page()
+    cup_muestra = lista_cups[0]
+
+    # A. Búsqueda de muestra en el navegador para capturar la acción y el token
+    if not await _realizar_busqueda_facturas_endesa(page, fecha_desde, fecha_hasta, cup_muestra):
+        return lista_cups, []
+    captura = capturar(page)
+    accion = captura.accion_con_filas(ALIAS_ENDESA)
+    # A.1. La acción solo es reutilizable si el CUP viaja en sus parámetros (si no, todas las respuestas serían iguales)
+    if accion and cup_muestra not in json.dumps(accion["params"]):
+        accion = None
+    cliente = await ClienteAura.desde_captura(robot, captura) if accion else None
+    if cliente is None:
+        log.info("\t[AURA] No se pudo capturar la acción de búsqueda; se procesan todos los CUPS en el navegador.")
+        return lista_cups, []
+
+    # B. Consultas HTTP concurrentes del resto de CUPS
+    try:
+        resultados = await asyncio.gather(*(_buscar_facturas_endesa_http(cliente, accion, cup_muestra, cup) for cup in lista_cups[1:]))
+    finally:
+        await cliente.cerrar()
+
+    # C. Se conservan los CUPS con alguna factura pendiente o cuya consulta HTTP falló; los que no tienen ninguna se anotan aparte
+    pendientes, sin_facturas = [cup_muestra], []
+    for cup, filas in zip(lista_cups[1:], resultados):
+        if filas is None or any(f.get("cup", cup) != cup or not es_factura_procesada("endesa", cup, f["numero_factura"]) for f in filas):
+            pendientes.append(cup)
+        elif not filas:
+            sin_facturas.append(cup)
+    log.info(f"\t[AURA] {len(lista_cups) - len(pendientes)} de {len(lista_cups)} CUPS sin facturas nuevas descartados por HTTP ({len(sin_facturas)} sin ninguna factura).")
+    return pendientes, sin_facturas
+
+
+# END.5 Búsqueda global única filtrada localmente por la lista de CUPS
+async def _buscar_cups_global(robot: NavegadorAsync, lista_cups: list, fecha_desde: str, fecha_hasta: str) -> bool:
+    '''
+    Hace una sola búsqueda sin filtro de CUP en la página principal para procesar después la lista de CUPS
+    con `_iterar_cups_global`.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la sesión iniciada.
+        - lista_cups (list): CUPS solicitados.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+    Retorna
+        - bool: True si la búsqueda se ha cargado, False si falla y hay que buscar CUP a CUP.
+    '''
+    log.info(f"\n{'='*80}\nPROCESANDO BÚSQUEDA GLOBAL FILTRADA: {len(lista_cups)} CUPS\n{'='*80}")
+    log.info("\t[BUSQUEDA]")
+    if not await _realizar_busqueda_facturas_endesa(robot.get_page(), fecha_desde, fecha_hasta, None):
+        log.warning("\t[PLAN] La búsqueda global ha fallado; se busca CUP a CUP.")
+        return False
+    return True
+
+
+# END.5.1 Extracción de la búsqueda global cargada, procesando solo las filas de la lista de CUPS
+async def _iterar_cups_global(robot: NavegadorAsync, lista_cups: list, fecha_desde: str, fecha_hasta: str) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Procesa únicamente las filas de los CUPS de la lista en la búsqueda global cargada por `_buscar_cups_global`.
+    Registra qué facturas se han encontrado para cada CUP y, al terminar la tabla, entrega un registro de
+    "no encontrado" para los CUPS sin ninguna fila.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la búsqueda global cargada en la página principal.
+        - lista_cups (list): CUPS solicitados.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+    Retorna
+        - AsyncIterator[FacturaEndesa]: Facturas de los CUPS de la lista según se procesan.
+    '''
+    # A. Extracción de la tabla descartando las filas de CUPS no solicitados
+    log.info("\t[EXTRACCIÓN]")
+    filtro = FiltroCups(lista_cups)
+    reciclaje = ControlReciclaje(robot, "global")
+    procesadas: dict[str, int] = {}
+    async for factura in _iterar_con_division_endesa(robot, robot.get_page(), reciclaje, fecha_desde, fecha_hasta, None, filtro, tenant_actual().workers_cups):
+        procesadas[clave_cup(factura.cup)] = procesadas.get(clave_cup(factura.cup), 0) + 1
+        yield factura
+    if filtro.completa:
+        planificador_busquedas.registrar_global(tenant_actual().clave("endesa"), filtro)
+    else:
+        log.error("\t[PLAN] La tabla global no se ha recorrido entera; los CUPS sin filas quedan con error y no se registran recuentos.")
+
+    # B. Resumen por CUP solicitado y registro de los CUPS sin ninguna fila en la tabla (con error si la tabla quedó incompleta)
+    for cup in lista_cups:
+        encontradas = filtro.facturas_de(cup)
+        log.info(f"\t[PLAN] {cup}: {len(encontradas)} factura(s) en la tabla ({', '.join(encontradas) or '-'}), {procesadas.get(clave_cup(cup), 0)} procesada(s).")
+        if not encontradas:
+            yield _factura_no_encontrada(cup) if filtro.completa else _tabla_incompleta(cup)
+
+    log.info(f"\n{'='*80}\n\t[OK] Búsqueda global filtrada finalizada: {filtro.filas_leidas} filas leídas, {sum(procesadas.values())} facturas procesadas.\n{'='*80}")
+
+
+# END.6 Registro de un CUP sin facturas en el periodo
+def _factura_no_encontrada(cup: str) -> FacturaEndesa:
+    return FacturaEndesa(cup=cup, error_RPA=False, msg_error_RPA="SIN_FACTURAS: No se encontraron facturas para este CUP en el periodo indicado.")
+
+
+# END.6.0 Registro de un CUP sin filas en una tabla que no se ha podido recorrer entera
+def _tabla_incompleta(cup: str) -> FacturaEndesa:
+    return FacturaEndesa(cup=cup, error_RPA=True, msg_error_RPA="ERROR: La tabla de resultados no se recorrió entera; no se puede confirmar que el CUP no tenga facturas.")
+
+
+# END.6.1 Registro de un CUP omitido por su ciclo de facturación (no se ha buscado)
+def _factura_no_prevista(cup: str) -> FacturaEndesa:
+    return FacturaEndesa(cup=cup, error_RPA=False, msg_error_RPA="NO_PREVISTA: CUP no consultado, su ciclo de facturación no prevé factura en el periodo indicado.")
+
+
+# END.7 Extracción de una búsqueda ya cargada, dividiendo el rango de fechas si llega a TABLE_LIMIT
+async def _iterar_con_division_endesa(robot: NavegadorAsync | None, page: Page, reciclaje: ControlReciclaje | None, fecha_desde: str, fecha_hasta: str,
+                                      cup: str | None, filtro: FiltroCups | None, num_workers: int = 1) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Extrae la tabla de la búsqueda cargada en la página. Si la tabla ha alcanzado TABLE_LIMIT (el portal puede haber
+    omitido facturas), el rango se divide en mitades que se buscan y extraen por separado, volviendo a dividir las
+    que sigan en el límite.
+    Parametros:
+        - robot (NavegadorAsync): Opcional. Navegador para abrir páginas de trabajadores adicionales (sin él se usa solo `page`).
+        - page (Page): Página con la búsqueda del rango completo ya realizada.
+        - reciclaje (ControlReciclaje): Opcional. Control de reciclaje del contexto de `page`.
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+        - cup (str): CUP de la búsqueda, o None si es global.
+        - filtro (FiltroCups): Opcional. Filtro local de CUPS que se comparte entre todas las ventanas.
+        - num_workers (int): Máximo de páginas que buscan ventanas a la vez.
+    Retorna
+        - AsyncIterator[FacturaEndesa]: Facturas de todas las ventanas según se procesan.
+    '''
+    mitades = await _dividir_si_saturada_endesa(page, fecha_desde, fecha_hasta)
+    if not mitades:
+        reanudar = lambda p: _realizar_busqueda_facturas_endesa(p, fecha_desde, fecha_hasta, cup)
+        facturas = _iterar_tabla_facturas_endesa(page, reciclaje, reanudar, filtro)
+    else:
+        facturas = _iterar_ventanas_endesa(robot if num_workers > 1 else None, page, reciclaje, list(mitades), cup, filtro, num_workers)
+    async for factura in facturas:
+        yield factura
+
+
+# END.8 Decisión de división de una búsqueda que ha alcanzado el límite de filas
+async def _dividir_si_saturada_endesa(page: Page, fecha_desde: str, fecha_hasta: str) -> tuple[tuple[str, str], tuple[str, str]] | None:
+    '''
+    Parametros:
+        - page (Page): Página con la búsqueda del rango ya realizada.
+        - fecha_desde (str): Límite inicial del rango buscado.
+        - fecha_hasta (str): Límite final del rango buscado.
+    Retorna
+        - tuple: Las dos mitades del rango si la tabla está en el límite y se puede dividir.
+        - None: Si la tabla se puede extraer tal cual.
+    '''
+    if not DIVISION_VENTANAS or not await _resultados_saturados_endesa(page):
+        return None
+    mitades = dividir_ventana(fecha_desde, fecha_hasta)
+    if mitades is None:
+        log.warning(f"\t[VENTANA] La búsqueda {fecha_desde} - {fecha_hasta} llega al límite de filas y no se puede dividir más; pueden faltar facturas.")
+    else:
+        log.info(f"\t[VENTANA] La búsqueda {fecha_desde} - {fecha_hasta} llega al límite de filas; se divide en {mitades[0][0]} - {mitades[0][1]} y {mitades[1][0]} - {mitades[1][1]}.")
+    return mitades
+
+
+
+# END.9 Búsqueda y extracción de ventanas de fechas con trabajadores concurrentes
+async def _iterar_ventanas_endesa(robot: NavegadorAsync | None, page: Page, reciclaje: ControlReciclaje | None, ventanas: list[tuple[str, str]],
+                                  cup: str | None, filtro: FiltroCups | None, num_workers: int = 1) -> AsyncIterator[FacturaEndesa]:
+    '''
+    Reparte las ventanas de fechas de una cola común entre trabajadores. Cada trabajador repite la búsqueda con su
+    ventana y, si vuelve a llegar al límite, devuelve sus dos mitades a la cola en lugar de extraer la tabla.
+    El trabajador 0 usa la página recibida y su control de reciclaje; el resto abren la suya al recibir la primera ventana.
+    Parametros:
+        - robot (NavegadorAsync): Opcional. Navegador para abrir las páginas de los trabajadores adicionales.
+        - page (Page): Página del trabajador 0.
+        - reciclaje (ControlReciclaje): Opcional. Control de reciclaje de `page`.
+        - ventanas (list): Ventanas (desde, hasta) iniciales.
+        - cup (str): CUP de la búsqueda, o None si es global.
+        - filtro (FiltroCups): Opcional. Filtro local de CUPS compartido.
+        - num_workers (int): Trabajadores concurrentes (1 si no hay robot).
+    Retorna
+        - AsyncIterator[FacturaEndesa]: Facturas de todas las ventanas en orden de finalización.
+    '''
+    # A. Cola de ventanas pendientes (None indica a un trabajador que ya no quedan)
+    cola: asyncio.Queue = asyncio.Queue()
+    for ventana in ventanas:
+        cola.put_nowait(ventana)
+    num_workers = max(1, num_workers if robot else 1)
+    etiqueta = reciclaje.etiqueta if reciclaje else "ventanas"
+    extraidas = 0
+
+    # B. Definición del trabajador: busca su ventana y la extrae o la divide
+    async def trabajador(worker: int, emitir):
+        nonlocal extraidas
+        pagina = page if worker == 0 else None
+        control = reciclaje if worker == 0 else ControlReciclaje(robot, f"{etiqueta}-V{worker}")
+        try:
+            while (ventana := await cola.get()) is not None:
+                desde, hasta = ventana
+                try:
+                    # B.1. Página propia del trabajador (abierta al recibir trabajo, o de nuevo si se ha caído)
+                    if pagina is None or (pagina.is_closed() and robot):
+                        pagina = await robot.abrir_pagina_trabajo()
+                    log.info(f"\n\t[VENTANA] [W{worker}] {desde} - {hasta}{f' (CUP {cup})' if cup else ''}")
+                    # B.1.1. Si la búsqueda falla, la tabla cargada sería la de otra ventana: se registra el error y no se extrae
+                    if not await _realizar_busqueda_facturas_endesa(pagina, desde, hasta, cup):
+                        log.error(f"\t[ERROR] Búsqueda fallida en la ventana {desde} - {hasta} [W{worker}]; no se extrae su tabla.")
+                        await guardar_traza(pagina, cup, paso="ventana-busqueda")
+                        if filtro:
+                            filtro.completa = False
+                        await emitir(FacturaEndesa(cup=cup or "GLOBAL", error_RPA=True, msg_error_RPA=f"ERROR en ventana {desde} - {hasta}: no se pudo realizar la búsqueda."))
+                        continue
+
+                    # B.2. Si la ventana sigue en el límite se devuelven sus mitades a la cola
+                    mitades = await _dividir_si_saturada_endesa(pagina, desde, hasta)
+                    if mitades:
+                        for mitad in mitades:
+                            cola.put_nowait(mitad)
+                        continue
+
+                    # B.3. Extracción de la tabla de la ventana (con reanudación sobre la misma ventana tras reciclar)
+                    reanudar = lambda p, d=desde, h=hasta: _realizar_busqueda_facturas_endesa(p, d, h, cup)
+                    async for factura in _iterar_tabla_facturas_endesa(pagina, control, reanudar, filtro):
+                        await emitir(factura)
+                    extraidas += 1
+                except Exception as e:
+                    # B.4. El fallo de una ventana queda registrado sin detener el resto
+                    log.error(f"\t[ERROR] Fallo en la ventana {desde} - {hasta} [W{worker}]: {e}")
+                    if control:
+                        pagina = control.adoptar(pagina)
+                    if filtro:
+                        filtro.completa = False
+                    await guardar_traza(pagina, cup, paso=f"ventana-{type(e).__name__}")
+                    await emitir(FacturaEndesa(cup=cup or "GLOBAL", error_RPA=True, msg_error_RPA=f"ERROR en ventana {desde} - {hasta}: {str(e)[:1000]}"))
+                else:
+                    if control:
+                        pagina = control.adoptar(pagina)
+                finally:
+                    cola.task_done()
+        finally:
+            if pagina is not None and worker != 0:
+                await robot.cerrar_pagina_trabajo(pagina)
+            # B.5. La página del trabajador 0 es la del llamador: si ha cambiado, se le devuelve por su control de reciclaje
+            elif worker == 0 and reciclaje and pagina is not page:
+                reciclaje.pagina = pagina
+
+    # C. Cuando no quedan ventanas (las divisiones añaden ventanas mientras se trabaja) se despide a los trabajadores
+    async def supervisor(emitir):
+        await cola.join()
+        for _ in range(num_workers):
+            cola.put_nowait(None)
+
+    # D. Ejecución concurrente, entregando las facturas según se extraen
+    log.info(f"\t[VENTANA] {num_workers} trabajador(es) para las ventanas de fechas.")
+    async for factura in fusionar([functools.partial(trabajador, w) for w in range(num_workers)] + [supervisor]):
+        yield factura
+    log.info(f"\t[VENTANA] Rango procesado en {extraidas} ventana(s).")
+
+
 # === 2. LÓGICA PRINCIPAL DEL ROBOT ENEL (DISTRIBUCIÓN) === 
 
-# ENEL.1 Ejecución del flujo de extracción para portal Enel
-async def ejecutar_robot_enel(fecha_desde: str, fecha_hasta: str) -> list[FacturaEnel]:
+# ENEL.1 Ejecución del flujo de extracción para portal Enel (flujo de facturas)
+async def iterar_robot_enel(fecha_desde: str, fecha_hasta: str) -> AsyncIterator[FacturaEnel]:
     '''
-    Coordina el proceso de login multi-rol y extracción de facturas del portal e-distribución (Enel).
+    Coordina el proceso de login multi-rol y extracción de facturas del portal e-distribución (Enel),
+    entregando cada factura en cuanto termina de procesarse (en el orden de la lista de roles).
     Parametros:
         - fecha_desde (str): Límite inicial temporal.
         - fecha_hasta (str): Límite final temporal.
     Retorna
-        - list[FacturaEnel]: Lista de facturas de distribución procesadas.
+        - AsyncIterator[FacturaEnel]: Facturas de distribución procesadas.
     '''
-    robot = NavegadorAsync()
-    facturas_totales = []
-    login_successful = False
+    tenant = tenant_actual()
+    robot = NavegadorAsync(tenant.clave("enel"))
+    total_facturas = 0
     
     try:
         # A. Configuración y carga de registros
         cargar_registro_procesados('enel')
+        perfilador_acciones.instalar()
         from config import REPROCESADO
         if REPROCESADO:
             log.info("[CONFIG] REPROCESADO=True -> se ignorarán marcas anteriores.")
@@ -185,82 +696,57 @@ async def ejecutar_robot_enel(fecha_desde: str, fecha_hasta: str) -> list[Factur
         # B. Autenticación en el portal de distribución
         log.info(f"\n    [INICIO] Iniciando proceso RPA-ENEL. \n\n{'='*40}")
         
-        for attempt in range(1, MAX_LOGIN_ATTEMPTS + 1):
-            log.info(f"\t[LOGIN] Intento {attempt}/{MAX_LOGIN_ATTEMPTS}...")
-
-            # B.1. Inicialización y navegación al login de Enel
-            log.debug("Iniciando navegador...")
-            await robot.iniciar()
-            log.debug(f"Navegando a Login Enel: {URL_LOGIN_ENEL}")
-            await robot.goto_url(URL_LOGIN_ENEL)
-            
-            # B.2. Validación de acceso con credenciales de distribución
-            login_successful = await _iniciar_sesion_enel(robot.get_page(), USER_ENEL, PASSWORD_ENEL)
-
-            if login_successful:
-                log.info("\t\t[LOGIN] Sesión establecida correctamente.")
-                break
-            
-            log.warning(f"\t\t[ADVERTENCIA] Intento de login {attempt} fallido.")
-            await robot.cerrar()
-
-            if attempt < MAX_LOGIN_ATTEMPTS:
-                await asyncio.sleep(5)
-            else:
-                log.critical(f"No se pudo acceder al portal Enel tras {MAX_LOGIN_ATTEMPTS} intentos.")
-                raise Exception(f"Fallo crítico: No se pudo acceder al portal tras {MAX_LOGIN_ATTEMPTS} intentos.")
+        await _establecer_sesion(robot, tenant.clave("enel"), URL_LOGIN_ENEL, tenant.usuario_enel, tenant.password_enel, _iniciar_sesion_enel, _verificar_sesion_enel)
 
-        # C. Identificación de perfiles (Roles)
+        # C. Identificación de perfiles (Roles), desde el catálogo guardado mientras siga vigente
         page = robot.get_page()
         log.info("\t[ROLES]")
-        roles = await _obtener_todos_los_roles(page)
+        roles = catalogo_roles.roles(tenant.usuario_enel)
+        if roles:
+            log.info(f"    -> [OK] {len(roles)} roles desde el catálogo guardado (sin abrir el menú).")
+        else:
+            roles = await _obtener_todos_los_roles(page)
+            if roles:
+                catalogo_roles.guardar_roles(tenant.usuario_enel, roles)
 
         # C.1. Verificación de disponibilidad de perfiles de empresa
         if not roles:
             log.error("No se pudieron obtener los roles disponibles.")
             raise Exception("No se pudieron obtener los roles disponibles para el usuario.")
+
+        # C.2. Descarte por HTTP de los roles que llevan varias ejecuciones sin facturas y siguen sin tenerlas
+        if CLIENTE_AURA_ACTIVO and len(roles) > 1:
+            roles = await _sondear_roles_http(robot, page, roles, fecha_desde, fecha_hasta)
         
         # D. Procesamiento iterativo por cada Rol de empresa
         log.info(f"\n{'='*80}\nPROCESANDO BUSQUEDA GLOBAL: Todos los roles disponibles\n{'='*80}")
         
-        for irol, rol in enumerate(roles):
-            log.info(f"\n\n[ROL {irol+1} / {len(roles)}]  ({rol.upper()})\n\t\t{'='*40}")
-            
-            try:
-                # D.1. Cambio de contexto de representación de empresa
-                log.debug(f"Cambiando al rol: {rol}")
-                await _seleccionar_rol_especifico(page, rol)
-                
-                # D.2. Aplicación de filtros de fecha y validación de respuesta
-                log.info("\t[BUSQUEDA]")
-                exito_busqueda = await _aplicar_filtros_fechas(page, fecha_desde, fecha_hasta)
-                if not exito_busqueda:
-                    log.info(f"\t[SKIP] Sin resultados para el rol {rol}")
-                    continue
+        # D.1. Modo paralelo: un contexto con su propio login por cada rol (no disponible con perfil persistente)
+        if tenant.workers_roles > 1 and len(roles) > 1 and not robot.persistente:
+            async for factura in _iterar_roles_concurrente(robot, roles, fecha_desde, fecha_hasta):
+                total_facturas += 1
+                yield factura
 
-                # D.3. Extracción de metadata de la tabla de distribución
-                log.info("\t[EXTRACCIÓN]")
-                facturas_rol = await _extraer_tabla_facturas_enel(page, len(facturas_totales))
-                
-                # D.4. Consolidación de resultados del rol actual
-                if facturas_rol and len(facturas_rol) > 0:
-                    facturas_totales.extend(facturas_rol)
-                    log.info(f"\n{'='*40}\n\t[OK] Búsqueda para rol {rol}: {len(facturas_rol)} facturas.\n{'='*40}")
-                else:
-                    log.info(f"\t[INFO] No hay facturas para el rol '{rol}'.")
-                    continue
+        # D.2. Modo secuencial: cambio de rol mediante el menú sobre la página principal
+        else:
+            reciclaje = ControlReciclaje(robot, "roles")
+            for irol, rol in enumerate(roles):
+                facturas_rol = 0
+                async for factura in _iterar_rol_enel(page, rol, irol + 1, len(roles), fecha_desde, fecha_hasta, total_facturas):
+                    facturas_rol += 1
+                    yield factura
+                total_facturas += facturas_rol
 
-            except Exception as e:
-                # D.5. Gestión de errores por Rol: registro y continuidad
-                error_detalle = str(e)
-                registro_error = FacturaEnel(cup="N/A", error_RPA=True, msg_error_RPA=f"ERROR en rol {rol}: {error_detalle[:1000]}")
-                facturas_totales.append(registro_error)
-                log.error(f"\t[ERROR] Fallo al procesar rol {rol}: {error_detalle}")
-                continue
+                # D.2.1. Reciclaje del contexto entre roles y reanudación en la página de facturas
+                reciclaje.contar_filas(facturas_rol)
+                motivo = await reciclaje.debe_reciclar(page)
+                if motivo and irol + 1 < len(roles):
+                    page = await reciclaje.reciclar(page, motivo)
+                    await page.goto(URL_FACTURAS_ENEL, wait_until="domcontentloaded")
         
         # E. Cierre de ejecución y reporte final
-        log.info(f"\n\n{'='*80}\n[OK][FIN] Proceso RPA completado.\n\tTotal facturas extraídas: {len(facturas_totales)}\n{'='*80}")
-        return facturas_totales
+        _informar_reciclajes(robot)
+        log.info(f"\n\n{'='*80}\n[OK][FIN] Proceso RPA completado.\n\tTotal facturas extraídas: {total_facturas}\n{'='*80}")
 
     except Exception as e:
         log.critical(f"FALLO CRÍTICO EN EL ROBOT ENEL: {e}", exc_info=True)
@@ -269,11 +755,246 @@ async def ejecutar_robot_enel(fecha_desde: str, fecha_hasta: str) -> list[Factur
     finally:
         await robot.cerrar()
         log.info("[SISTEMA] Navegador cerrado.\n")
+        # Informe de deriva de latencias y actualización del histórico de timeouts
+        registro_latencias.informe_deriva("enel")
+        registro_latencias.guardar("enel")
+        perfilador_acciones.informe(tenant.clave("enel"))
+        catalogo_roles.guardar(tenant.usuario_enel)
         # Envío consolidado de alertas de error
         mail_handler.flush_to_email()
 
 
-# === 3. PUNTO DE ENTRADA PARA PRUEBAS (DEBUGGING) === 
+# ENEL.1.1 Ejecución completa devolviendo la lista de facturas (compatibilidad)
+async def ejecutar_robot_enel(fecha_desde: str, fecha_hasta: str) -> list[FacturaEnel]:
+    '''
+    Igual que `iterar_robot_enel`, pero devuelve todas las facturas en una lista.
+    Parametros:
+        - fecha_desde (str): Límite inicial temporal.
+        - fecha_hasta (str): Límite final temporal.
+    Retorna
+        - list[FacturaEnel]: Lista de facturas de distribución procesadas.
+    '''
+    return [factura async for factura in iterar_robot_enel(fecha_desde, fecha_hasta)]
+
+
+# ENEL.2 Búsqueda y extracción de las facturas de un rol
+async def _iterar_rol_enel(page: Page, rol: str, index: int, total: int, fecha_desde: str, fecha_hasta: str, contador: int = 0) -> AsyncIterator[FacturaEnel]:
+    '''
+    Selecciona el rol en la página indicada, aplica el filtro de fechas y extrae sus facturas,
+    aislando cualquier error en un registro de fallo.
+    Parametros:
+        - page (Page): Página sobre la que se trabaja el rol.
+        - rol (str): Nombre del rol de empresa.
+        - index (int): Posición del rol (para el log).
+        - total (int): Número total de roles (para el log).
+        - fecha_desde (str): Límite inicial temporal.
+        - fecha_hasta (str): Límite final temporal.
+        - contador (int): Número de facturas previas (numeración de filas en el log).
+    Retorna
+        - AsyncIterator[FacturaEnel]: Facturas del rol, terminando con un registro de error si falla.
+    '''
+    log.info(f"\n\n[ROL {index} / {total}]  ({rol.upper()})\n\t\t{'='*40}")
+    facturas_rol = 0
+    
+    try:
+        # A. Cambio de contexto de representación de empresa
+        log.debug(f"Cambiando al rol: {rol}")
+        if not await _seleccionar_rol_especifico(page, rol):
+            # A.1. El rol puede venir de un catálogo guardado que ya no coincide con el menú
+            catalogo_roles.invalidar(tenant_actual().usuario_enel)
+            raise Exception(f"No se pudo seleccionar el rol '{rol}'.")
+        
+        # B. Aplicación de filtros de fecha y validación de respuesta
+        log.info("\t[BUSQUEDA]")
+        exito_busqueda = await _aplicar_filtros_fechas(page, fecha_desde, fecha_hasta)
+        if not exito_busqueda:
+            log.info(f"\t[SKIP] Sin resultados para el rol {rol}")
+            return
+
+        # C. Extracción de metadata de la tabla de distribución
+        log.info("\t[EXTRACCIÓN]")
+        marca_agua = MarcaAgua("enel")
+        async for factura in _iterar_tabla_facturas_enel(page, contador, marca_agua):
+            facturas_rol += 1
+            yield factura
+        catalogo_roles.registrar(tenant_actual().usuario_enel, rol, marca_agua.filas)
+        
+        # D. Registro del resultado del rol
+        if facturas_rol:
+            log.info(f"\n{'='*40}\n\t[OK] Búsqueda para rol {rol}: {facturas_rol} facturas.\n{'='*40}")
+        else:
+            log.info(f"\t[INFO] No hay facturas para el rol '{rol}'.")
+
+    except Exception as e:
+        # E. Gestión de errores por Rol: registro y continuidad
+        error_detalle = str(e)
+        log.error(f"\t[ERROR] Fallo al procesar rol {rol}: {error_detalle}")
+        await guardar_traza(page, rol, paso=type(e).__name__)
+        yield FacturaEnel(cup="N/A", error_RPA=True, msg_error_RPA=f"ERROR en rol {rol}: {error_detalle[:1000]}")
+
+
+# ENEL.3 Procesamiento paralelo de roles en contextos independientes
+async def _iterar_roles_concurrente(robot: NavegadorAsync, roles: list[str], fecha_desde: str, fecha_hasta: str) -> AsyncIterator[FacturaEnel]:
+    '''
+    Procesa varios roles a la vez, cada uno en su propio contexto limpio con un login propio.
+    El rol activo es estado de la sesión del servidor, así que los contextos clonados de la sesión iniciada
+    se cambiarían el rol entre sí; con un login por contexto cada trabajador tiene su sesión y su rol.
+    Las facturas se entregan en el orden de la lista de roles; un rol que termina antes que los anteriores
+    espera con una cola acotada de facturas pendientes.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la sesión iniciada.
+        - roles (list[str]): Roles a procesar.
+        - fecha_desde (str): Límite inicial temporal.
+        - fecha_hasta (str): Límite final temporal.
+    Retorna
+        - AsyncIterator[FacturaEnel]: Facturas de todos los roles en el orden de la lista.
+    '''
+    # A. Límite de contextos simultáneos
+    tenant = tenant_actual()
+    num_workers = min(tenant.workers_roles, len(roles))
+    semaforo = asyncio.Semaphore(num_workers)
+    log.info(f"    [MODO] {num_workers} contexto(s) en paralelo para {len(roles)} roles.")
+
+    # B. Procesado de un rol en un contexto limpio, con su propio login, que se cierra al terminar
+    async def procesar(index: int, rol: str, emitir):
+        async with semaforo:
+            page = None
+            try:
+                page = await robot.abrir_pagina_trabajo(clonar_sesion=False)
+                await page.goto(URL_LOGIN_ENEL, wait_until="domcontentloaded")
+                if not await _iniciar_sesion_enel(page, tenant.usuario_enel, tenant.password_enel):
+                    raise Exception("No se pudo iniciar la sesión propia del contexto.")
+                await page.goto(URL_FACTURAS_ENEL, wait_until="domcontentloaded")
+            except Exception as e:
+                log.error(f"\t[ERROR] No se pudo abrir el contexto para el rol {rol}: {e}")
+                await emitir(FacturaEnel(cup="N/A", error_RPA=True, msg_error_RPA=f"ERROR en rol {rol}: {str(e)[:1000]}"))
+                return
+            try:
+                async for factura in _iterar_rol_enel(page, rol, index + 1, len(roles), fecha_desde, fecha_hasta):
+                    await emitir(factura)
+            finally:
+                if page is not None:
+                    await robot.cerrar_pagina_trabajo(page)
+
+    # C. Ejecución y combinación determinista (una cola por rol, consumidas en el orden de los roles)
+    async for factura in fusionar([functools.partial(procesar, i, rol) for i, rol in enumerate(roles)], ordenado=True):
+        yield factura
+
+
+# ENEL.4 Sondeo por HTTP de los roles sin facturas en las últimas ejecuciones
+async def _sondear_roles_http(robot: NavegadorAsync, page: Page, roles: list[str], fecha_desde: str, fecha_hasta: str) -> list[str]:
+    '''
+    Para los roles que llevan varias ejecuciones sin facturas, repite por HTTP la búsqueda capturada en el navegador
+    para un rol con facturas recientes y descarta los que siguen sin resultados, sin seleccionarlos ni filtrar en la página.
+    La búsqueda solo es reutilizable si el rol viaja en sus parámetros; si no, se procesan todos los roles en el navegador.
+    Parametros:
+        - robot (NavegadorAsync): Navegador con la sesión iniciada.
+        - page (Page): Página principal (se usa para la búsqueda de muestra).
+        - roles (list[str]): Roles a procesar.
+        - fecha_desde (str): Límite inicial temporal.
+        - fecha_hasta (str): Límite final temporal.
+    Retorna
+        - list[str]: Roles que hay que procesar en el navegador, en el orden original.
+    '''
+    inactivos = [rol for rol in roles if catalogo_roles.inactivo(tenant_actual().usuario_enel, rol)]
+    activos = [rol for rol in roles if rol not in inactivos]
+    if not inactivos or not activos:
+        return roles
+    log.info(f"\t[ROLES] {len(inactivos)} rol(es) sin facturas en las últimas ejecuciones; se sondean por HTTP.")
+
+    # A. Búsqueda de muestra en el navegador con un rol activo, para capturar la acción y el token
+    rol_muestra = activos[0]
+    if not await _seleccionar_rol_especifico(page, rol_muestra) or not await _aplicar_filtros_fechas(page, fecha_desde, fecha_hasta):
+        return roles
+    captura = capturar(page)
+    accion = captura.accion_con_filas(ALIAS_ENEL)
+    # A.1. La acción solo es reutilizable si el rol viaja en sus parámetros (si no, todas las respuestas serían iguales)
+    if accion and rol_muestra not in json.dumps(accion["params"], ensure_ascii=False):
+        accion = None
+    cliente = await ClienteAura.desde_captura(robot, captura) if accion else None
+    if cliente is None:
+        log.info("\t[AURA] No se pudo capturar una búsqueda reutilizable por rol; se procesan todos los roles en el navegador.")
+        return roles
+
+    # B. Consultas HTTP concurrentes de los roles inactivos
+    try:
+        resultados = await asyncio.gather(*(cliente.repetir(accion, {rol_muestra: rol}) for rol in inactivos))
+    finally:
+        await cliente.cerrar()
+
+    # C. Se descartan los roles cuya consulta respondió sin filas (los fallos se procesan en el navegador)
+    vacios = set()
+    for rol, valor in zip(inactivos, resultados):
+        if valor is not None and not decodificar_filas(valor, ALIAS_ENEL):
+            vacios.add(rol)
+            catalogo_roles.registrar(tenant_actual().usuario_enel, rol, 0)
+    log.info(f"\t[AURA] {len(vacios)} de {len(inactivos)} roles inactivos siguen sin facturas y se omiten.")
+    return [rol for rol in roles if rol not in vacios]
+
+
+# === 3. EJECUCIÓN CONCURRENTE DE VARIOS TENANTS (GRUPOS EMPRESARIALES O CUENTAS) === 
+
+# TEN.1 Flujo de facturas de varios tenants a la vez
+async def iterar_robot_tenants(portal: str, fecha_desde: str, fecha_hasta: str, lista_cups: list = None,
+                               nombres: list[str] = None) -> AsyncIterator[tuple[str, FacturaEndesa | FacturaEnel]]:
+    '''
+    Ejecuta el robot del portal para cada tenant configurado, con hasta TENANTS_CONCURRENCIA tenants a la vez.
+    Cada tenant corre en su propia tarea con su navegador, sesión, registros, carpetas y límites de trabajadores;
+    el fallo de uno no detiene al resto. El tiempo total lo marca el tenant más lento, no la suma de todos.
+    Parametros:
+        - portal (str): "endesa" o "enel".
+        - fecha_desde (str): Límite inicial del rango de búsqueda.
+        - fecha_hasta (str): Límite final del rango de búsqueda.
+        - lista_cups (list): Opcional (solo Endesa). CUPS para todos los tenants; si no se indica, cada tenant usa los suyos.
+        - nombres (list): Opcional. Tenants a ejecutar (por defecto, todos los configurados).
+    Retorna
+        - AsyncIterator[tuple]: Pares (nombre del tenant, factura) en orden de finalización.
+    '''
+    # A. Selección de los tenants con credenciales para el portal
+    tenants = [t for t in cargar_tenants() if not nombres or t.nombre in nombres]
+    sin_credenciales = [t.nombre for t in tenants if not all(t.credenciales(portal))]
+    if sin_credenciales:
+        log.warning(f"[TENANTS] Sin credenciales de {portal}, se omiten: {', '.join(sin_credenciales)}")
+    tenants = [t for t in tenants if t.nombre not in sin_credenciales]
+    log.info(f"[TENANTS] {len(tenants)} tenant(s) para {portal}, hasta {TENANTS_CONCURRENCIA} a la vez.")
+    semaforo = asyncio.Semaphore(TENANTS_CONCURRENCIA)
+
+    # B. Trabajo de un tenant: el tenant queda fijado en el contexto de su tarea (y de las que cree)
+    def trabajo_tenant(tenant: Tenant):
+        async def trabajo(emitir):
+            async with semaforo:
+                with usar_tenant(tenant):
+                    log.info(f"[TENANTS] Inicio de {portal} para el tenant '{tenant.nombre}'.")
+                    if portal == "endesa":
+                        facturas = iterar_robot_endesa(fecha_desde, fecha_hasta, lista_cups)
+                    else:
+                        facturas = iterar_robot_enel(fecha_desde, fecha_hasta)
+                    try:
+                        async for factura in facturas:
+                            await emitir((tenant.nombre, factura))
+                    finally:
+                        await facturas.aclose()
+        return trabajo
+
+    async for resultado in fusionar([trabajo_tenant(t) for t in tenants]):
+        yield resultado
+
+
+# TEN.1.1 Ejecución completa devolviendo las facturas agrupadas por tenant
+async def ejecutar_robot_tenants(portal: str, fecha_desde: str, fecha_hasta: str, lista_cups: list = None,
+                                 nombres: list[str] = None) -> dict[str, list[FacturaEndesa | FacturaEnel]]:
+    '''
+    Igual que `iterar_robot_tenants`, pero devuelve las facturas agrupadas por tenant.
+    Retorna
+        - dict[str, list]: {nombre del tenant: facturas}.
+    '''
+    resultado: dict[str, list] = {}
+    async for nombre, factura in iterar_robot_tenants(portal, fecha_desde, fecha_hasta, lista_cups, nombres):
+        resultado.setdefault(nombre, []).append(factura)
+    return resultado
+
+
+# === 4. PUNTO DE ENTRADA PARA PRUEBAS (DEBUGGING) === 
 
 if __name__ == "__main__":
     # A. Configuración de parámetros de prueba local
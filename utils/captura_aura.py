@@ -0,0 +1,275 @@
+import json
+import re
+import time
+from urllib.parse import parse_qs
+from playwright.async_api import Page, Response
+from logic.logs_logic import log
+from utils.esperas import RUTA_AURA
+
+
+# === 0. ALIAS DE CAMPOS DE LAS RESPUESTAS APEX ===
+
+# Nombres con los que los controladores Apex devuelven cada campo de factura, por portal.
+# Se comparan normalizados (minúsculas, sin guiones bajos ni sufijo __c). El nombre canónico es el del modelo.
+ALIAS_ENDESA = {
+    "numero_factura": ["numerofactura", "numfactura", "nfactura", "invoicenumber"],
+    "fecha_emision": ["fechaemision", "fechafactura", "issuedate", "invoicedate"],
+    "fecha_inicio_periodo": ["fechainicio", "fechainicioperiodo", "fechadesde", "periodstart", "startdate"],
+    "fecha_fin_periodo": ["fechafin", "fechafinperiodo", "fechahasta", "periodend", "enddate"],
+    "importe_total": ["importe", "importetotal", "totalamount"],
+    "contrato": ["contrato", "numerocontrato", "contract", "contractnumber"],
+    "cup": ["cups", "cup", "cups20", "cups22", "puntosuministro"],
+    "secuencial": ["secuencial", "sequential", "numsecuencial"],
+    "estado_factura": ["estado", "estadofactura", "status"],
+    "fraccionamiento": ["fraccionamiento", "fraccionada", "installments"],
+    "tipo_factura": ["tipofactura", "invoicetype"],
+}
+
+ALIAS_ENEL = {
+    "numero_factura": ["facturafiscal", "numerofactura", "numfactura", "invoicenumber"],
+    "fecha_emision": ["fechaemision", "fechafactura", "issuedate"],
+    "importe_total": ["importe", "importetotal", "totalpdte"],
+    "cup": ["cups", "cup", "cups20", "cups22"],
+    "estado_factura": ["estado", "status"],
+    "tipo_factura": ["tipofactura", "invoicetype"],
+}
+# Los nombres genéricos (total, amount, tipo, type, fecha, factura, invoice) no se usan como alias: los controladores
+# los emplean para otros datos (totales de la consulta, tipo de registro de Salesforce, fecha de la consulta, Id del
+# registro de factura) y se colarían en la factura.
+
+# Formato que tiene en la tabla cada campo: un valor capturado solo rellena la celda si lo cumple
+FORMATOS_CAMPOS = {
+    "fecha_emision": re.compile(r"\d{2}/\d{2}/\d{4}"),
+    "fecha_inicio_periodo": re.compile(r"\d{2}/\d{2}/\d{4}"),
+    "fecha_fin_periodo": re.compile(r"\d{2}/\d{2}/\d{4}"),
+    "importe_total": re.compile(r"-?\d[\d.,]*\s*€?(\s*/\s*-?\d[\d.,]*\s*€?)?"),
+    "cup": re.compile(r"ES\d{16}[A-Z]{2}(\d[A-Z])?", re.IGNORECASE),
+    # Textos de la tabla ("Sí", "No", "N/A", "Pendiente de pago"...): solo palabras sin cifras, así que un número o un Id no pasan
+    "estado_factura": re.compile(r"[^\W\d_]+([\s./-]+[^\W\d_]+)*"),
+    "fraccionamiento": re.compile(r"[^\W\d_]+([\s./-]+[^\W\d_]+)*"),
+}
+
+# Campos mínimos que debe tener un objeto para considerarse una fila de factura
+_CAMPOS_OBLIGATORIOS = {"numero_factura"}
+_MIN_CAMPOS_RECONOCIDOS = 3
+
+
+def _normalizar_clave(clave: str) -> str:
+    clave = clave.lower()
+    if clave.endswith("__c"):
+        clave = clave[:-3]
+    return re.sub(r"[^a-z0-9]", "", clave)
+
+
+def _normalizar_valor(valor):
+    # Las fechas ISO (AAAA-MM-DD) se convierten al formato de la tabla (DD/MM/AAAA)
+    if isinstance(valor, str):
+        iso = re.match(r"^(\d{4})-(\d{2})-(\d{2})", valor)
+        if iso:
+            return f"{iso.group(3)}/{iso.group(2)}/{iso.group(1)}"
+        return valor.strip()
+    return valor
+
+
+def valor_valido(campo: str, valor) -> bool:
+    # Un valor capturado es aprovechable si es texto con el formato de la celda (FORMATOS_CAMPOS)
+    if not isinstance(valor, str) or not valor.strip():
+        return False
+    formato = FORMATOS_CAMPOS.get(campo)
+    return formato is None or bool(formato.fullmatch(valor.strip()))
+
+
+# === 1. DECODIFICACION DE FILAS DE FACTURA ===
+
+def _indice_alias(alias: dict[str, list[str]]) -> dict[str, str]:
+    return {_normalizar_clave(a): campo for campo, nombres in alias.items() for a in nombres}
+
+
+def _objetos(valor, profundidad: int = 0):
+    # Recorre el JSON (los returnValue de Apex suelen venir anidados o como JSON serializado en texto)
+    if profundidad > 6:
+        return
+    if isinstance(valor, str) and valor[:1] in "[{":
+        try:
+            valor = json.loads(valor)
+        except ValueError:
+            return
+    if isinstance(valor, list):
+        for elemento in valor:
+            if isinstance(elemento, dict):
+                yield elemento
+            yield from _objetos(elemento, profundidad + 1)
+    elif isinstance(valor, dict):
+        for elemento in valor.values():
+            yield from _objetos(elemento, profundidad + 1)
+
+
+def _decodificar(objeto: dict, indice: dict[str, str]) -> dict | None:
+    fila = {}
+    for clave, valor in objeto.items():
+        campo = indice.get(_normalizar_clave(clave))
+        if campo and campo not in fila and not isinstance(valor, (dict, list)) and valor not in (None, ""):
+            fila[campo] = _normalizar_valor(valor)
+    if not _CAMPOS_OBLIGATORIOS <= fila.keys() or len(fila) < _MIN_CAMPOS_RECONOCIDOS:
+        return None
+    fila["numero_factura"] = str(fila["numero_factura"])
+    return fila
+
+
+# CAP.0 Decodificación de un returnValue en filas de factura
+def decodificar_filas(valor, alias: dict[str, list[str]]) -> list[dict]:
+    '''
+    Busca en un `returnValue` Aura las listas de objetos que parecen filas de factura y las devuelve con los
+    nombres de campo del modelo, sin duplicados por número de factura.
+    Parametros:
+        - valor: Valor devuelto por una acción Aura (capturado en la página u obtenido por HTTP)
+        - alias (dict): Alias de campos del portal (ALIAS_ENDESA o ALIAS_ENEL)
+    Retorna:
+        - list[dict]: Filas decodificadas
+    '''
+    indice = _indice_alias(alias)
+    filas = {}
+    for objeto in _objetos(valor):
+        fila = _decodificar(objeto, indice)
+        if fila:
+            filas[fila["numero_factura"]] = fila
+    return list(filas.values())
+
+
+### CAPTURA DE RESPUESTAS AURA
+class CapturaAura:
+    """
+    Clase que escucha las respuestas `/s/sfsites/aura` de una página y guarda el `returnValue` de
+    cada acción Apex, junto con su descriptor y parámetros. Permite decodificar esos JSON en filas de
+    factura mediante alias de campos, evitando depender del DOM (y de sus "Cargando...") cuando
+    el portal ya entrega los datos estructurados.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, page: Page):
+        self.page = page
+        # Respuestas registradas: {"accion", "params", "valor", "instante"}
+        self.respuestas: list[dict] = []
+        # Cuerpos de las peticiones Aura capturadas (los reutiliza el cliente Aura sin navegador)
+        self.peticiones: list[dict] = []
+        page.on("response", self._al_responder)
+
+
+    # === 1. REGISTRO DE RESPUESTAS ===
+    def reiniciar(self) -> None:
+        '''
+        Descarta lo capturado hasta ahora (al comenzar una búsqueda nueva).
+        '''
+        self.respuestas.clear()
+        self.peticiones.clear()
+
+    async def _al_responder(self, response: Response):
+        if RUTA_AURA not in response.url or response.request.method != "POST":
+            return
+        try:
+            # Algunas respuestas Aura llevan el prefijo anti-JSON-hijacking "while(1);"
+            texto = (await response.text()).strip()
+            cuerpo = json.loads(texto[len("while(1);"):] if texto.startswith("while(1);") else texto)
+        except Exception:
+            return
+
+        # A. Acciones enviadas (descriptor y parámetros) en el campo "message" del formulario
+        acciones_enviadas = {}
+        try:
+            formulario = parse_qs(response.request.post_data or "")
+            mensaje = json.loads(formulario.get("message", ["{}"])[0])
+            acciones_enviadas = {a.get("id"): a for a in mensaje.get("actions", [])}
+            self.peticiones.append({"url": response.url, "formulario": {k: v[0] for k, v in formulario.items()}, "instante": time.time()})
+        except Exception:
+            pass
+
+        # B. Valor devuelto por cada acción completada con éxito
+        for accion in cuerpo.get("actions", []) if isinstance(cuerpo, dict) else []:
+            if accion.get("state") != "SUCCESS":
+                continue
+            enviada = acciones_enviadas.get(accion.get("id"), {})
+            self.respuestas.append({
+                "accion": enviada.get("descriptor", ""),
+                "params": enviada.get("params", {}),
+                "valor": accion.get("returnValue"),
+                "instante": time.time(),
+            })
+
+
+    # === 2. FILAS DE FACTURA CAPTURADAS ===
+    def filas(self, alias: dict[str, list[str]], desde: float = 0) -> list[dict]:
+        '''
+        Busca en los valores capturados las listas de objetos que parecen filas de factura y las devuelve
+        con los nombres de campo del modelo. Sin duplicados por número de factura (gana la respuesta más reciente).
+        Parametros:
+            - alias (dict): Alias de campos del portal (ALIAS_ENDESA o ALIAS_ENEL)
+            - desde (float): Solo respuestas recibidas a partir de este instante (time.time())
+        Retorna:
+            - list[dict]: Filas decodificadas en el orden en que el portal las devolvió
+        '''
+        filas: dict[str, dict] = {}
+        for respuesta in self.respuestas:
+            if respuesta["instante"] >= desde:
+                filas.update((f["numero_factura"], f) for f in decodificar_filas(respuesta["valor"], alias))
+        return list(filas.values())
+
+    def accion_con_filas(self, alias: dict[str, list[str]]) -> dict | None:
+        '''
+        Devuelve la última acción capturada cuyo valor contiene filas de factura (la acción de búsqueda),
+        para poder repetirla por HTTP con otros parámetros.
+        Parametros:
+            - alias (dict): Alias de campos del portal
+        Retorna:
+            - dict: Respuesta capturada ("accion", "params", "valor") o None si no hay ninguna
+        '''
+        indice = _indice_alias(alias)
+        for respuesta in reversed(self.respuestas):
+            if respuesta["accion"] and any(_decodificar(o, indice) for o in _objetos(respuesta["valor"])):
+                return respuesta
+        return None
+
+
+# === 2. REGISTRO DE CAPTURAS POR PAGINA ===
+
+# CAP.1 Captura asociada a una página (se instala una sola vez por página)
+def capturar(page: Page) -> CapturaAura:
+    '''
+    Devuelve la captura Aura de la página, instalándola la primera vez.
+    Parametros:
+        - page (Page): Pagina web del navegador
+    Retorna:
+        - CapturaAura: Captura asociada a la página
+    '''
+    captura = getattr(page, "_captura_aura", None)
+    if captura is None:
+        captura = CapturaAura(page)
+        setattr(page, "_captura_aura", captura)
+        log.debug("[AURA] Captura de respuestas instalada en la página.")
+    return captura
+
+
+# CAP.2 Combinación de los datos del DOM con los capturados
+def completar_fila(datos: dict, capturada: dict | None, marcadores: tuple[str, ...] = ("Cargando", "...")) -> dict:
+    '''
+    Completa los campos de una fila leída del DOM que están vacíos o con un marcador de carga
+    usando el valor capturado del JSON. Los valores ya pintados en la tabla tienen prioridad.
+    Solo se usan valores de texto con el mismo formato que la celda (FORMATOS_CAMPOS): un número o un texto
+    con otro formato indica que el alias ha recogido otro dato y la celda se deja como está.
+    Parametros:
+        - datos (dict): Campos de la fila leídos del DOM (nombre de campo del modelo -> texto)
+        - capturada (dict): Fila decodificada de la captura Aura (o None)
+        - marcadores (tuple): Textos que indican que la celda aún no tiene datos
+    Retorna:
+        - dict: Fila combinada
+    '''
+    if not capturada:
+        return datos
+    combinada = dict(datos)
+    for campo, valor in capturada.items():
+        if not valor_valido(campo, valor):
+            log.debug(f"[AURA] Valor capturado de '{campo}' descartado por formato: {valor!r}")
+            continue
+        actual = str(combinada.get(campo) or "")
+        if not actual or any(m.lower() in actual.lower() for m in marcadores):
+            combinada[campo] = valor
+    return combinada
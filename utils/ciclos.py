@@ -0,0 +1,200 @@
+import csv
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from logic.logs_logic import log
+from utils.planificador import clave_cup, FORMATO_FECHA
+from utils.tenants import tenant_actual
+from parsers.exportar_datos import cargar_registro_procesados
+from config import CICLOS_PATH, CICLOS_OMITIR, CICLOS_MIN_FACTURAS, CICLOS_MARGEN_DIAS, CICLOS_BARRIDO_DIAS
+
+# Ciclos más recientes que se tienen en cuenta (un CUP puede cambiar de periodicidad)
+CICLOS_RECIENTES = 6
+
+
+def _fecha(valor: str | None, formato: str = FORMATO_FECHA) -> datetime | None:
+    try:
+        return datetime.strptime((valor or "").strip(), formato)
+    except ValueError:
+        return None
+
+
+### PREDICTOR DEL CICLO DE FACTURACION POR CUP
+class PredictorCiclos:
+    """
+    Clase que estima, con las facturas ya procesadas de cada CUP, su periodicidad de facturación y la fecha
+    de emisión de su próxima factura. Con esa previsión ordena la lista de CUPS (primero los que ya deberían
+    tener factura nueva) y, si se activa, omite los que aún no la pueden tener. Cada cierto número de días
+    una ejecución recorre todos los CUPS sin omitir ninguno, por si la previsión falla.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = CICLOS_PATH, omitir: bool = CICLOS_OMITIR, min_facturas: int = CICLOS_MIN_FACTURAS,
+                 margen_dias: int = CICLOS_MARGEN_DIAS, barrido_dias: int = CICLOS_BARRIDO_DIAS):
+        '''
+        Parametros:
+            - ruta (str): Fichero JSON con la fecha del último barrido completo por portal.
+            - omitir (bool): Si es False la previsión solo ordena la lista.
+            - min_facturas (int): Facturas conocidas necesarias para estimar el ciclo de un CUP.
+            - margen_dias (int): Holgura sobre la fecha prevista y desviación máxima entre ciclos.
+            - barrido_dias (int): Días entre barridos completos (0 = todas las ejecuciones son barrido).
+        '''
+        self.ruta = ruta
+        self.omitir = omitir
+        self.min_facturas = max(2, min_facturas)
+        self.margen_dias = margen_dias
+        self.barrido_segundos = barrido_dias * 86400
+        # Portales cuya ejecución en curso es un barrido completo
+        self._barridos: set[str] = set()
+
+
+    # === 1. PERSISTENCIA DE LOS BARRIDOS ===
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _toca_barrido(self, portal: str) -> bool:
+        ultimo = self._leer().get(portal, {}).get("barrido", 0)
+        return time.time() - ultimo >= self.barrido_segundos
+
+    def completar(self, portal: str) -> None:
+        '''
+        Anota el final de una ejecución completa del portal; si era un barrido, guarda su fecha.
+        Parametros:
+            - portal (str): Identificador del portal (con el sufijo del tenant si no es el principal).
+        '''
+        if portal not in self._barridos:
+            return
+        self._barridos.discard(portal)
+        estado = self._leer()
+        estado.setdefault(portal, {})["barrido"] = time.time()
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(estado, f, indent=2)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.warning(f"[CICLOS] No se pudo guardar la fecha del barrido completo: {e}")
+
+
+    # === 2. HISTORIAL DE EMISIONES POR CUP ===
+    def historial(self, distribuidora: str) -> dict[str, list[datetime]]:
+        '''
+        Reúne las fechas de emisión de las facturas procesadas de cada CUP del tenant en curso.
+        La fecha sale del CSV histórico de facturas (`fecha_emision`, o `fecha_fin_periodo` más el retraso habitual
+        de emisión del CUP). Las facturas del registro de procesadas que no están en el CSV no cuentan: la fecha en
+        que se procesaron no es su emisión (una recuperación de meses atrás falsearía el ciclo).
+        Parametros:
+            - distribuidora (str): "endesa" o "enel".
+        Retorna
+            - dict[str, list[datetime]]: {clave del CUP: fechas de emisión ordenadas sin repetir}.
+        '''
+        procesadas = cargar_registro_procesados(distribuidora)
+        ruta_csv = os.path.join(tenant_actual().carpetas_descarga[f"CSV_{distribuidora.upper()}"], f"facturas_{distribuidora}.csv")
+
+        # A. Fechas del CSV histórico (solo facturas que constan como procesadas)
+        emisiones: dict[str, dict[str, datetime]] = {}
+        fines: dict[str, dict[str, datetime]] = {}
+        retrasos: dict[str, list[int]] = {}
+        try:
+            with open(ruta_csv, newline="", encoding="utf-8") as f:
+                for fila in csv.DictReader(f, delimiter=";"):
+                    cup, numero = (fila.get("cup") or "").strip(), (fila.get("numero_factura") or "").strip()
+                    if (cup, numero) not in procesadas:
+                        continue
+                    emision, fin = _fecha(fila.get("fecha_emision")), _fecha(fila.get("fecha_fin_periodo"))
+                    if emision:
+                        emisiones.setdefault(clave_cup(cup), {})[numero] = emision
+                        if fin:
+                            retrasos.setdefault(clave_cup(cup), []).append((emision - fin).days)
+                    elif fin:
+                        fines.setdefault(clave_cup(cup), {})[numero] = fin
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"[CICLOS] No se pudo leer el histórico de facturas {ruta_csv}: {e}")
+
+        # B. Facturas con solo fin de periodo: se desplazan con el retraso mediano de emisión del CUP
+        for clave, facturas in fines.items():
+            retraso = timedelta(days=statistics.median(retrasos[clave])) if clave in retrasos else timedelta(0)
+            for numero, fin in facturas.items():
+                emisiones.setdefault(clave, {}).setdefault(numero, fin + retraso)
+
+        return {clave: sorted(set(fechas.values())) for clave, fechas in emisiones.items()}
+
+
+    # === 3. PREVISION DE LA PROXIMA EMISION ===
+    def prevision(self, fechas: list[datetime]) -> datetime | None:
+        '''
+        Estima la fecha de emisión de la siguiente factura a partir de las anteriores.
+        Parametros:
+            - fechas (list[datetime]): Emisiones conocidas, ordenadas.
+        Retorna
+            - datetime: Fecha prevista.
+            - None: Si no hay facturas suficientes o el ciclo no es estable.
+        '''
+        if len(fechas) < self.min_facturas:
+            return None
+        ciclos = [(b - a).days for a, b in zip(fechas, fechas[1:])][-CICLOS_RECIENTES:]
+        ciclo = statistics.median(ciclos)
+        if ciclo <= 0 or max(abs(c - ciclo) for c in ciclos) > self.margen_dias:
+            return None
+        return fechas[-1] + timedelta(days=ciclo)
+
+    def priorizar(self, portal: str, distribuidora: str, cups: list[str], fecha_desde: str, fecha_hasta: str) -> tuple[list[str], list[str]]:
+        '''
+        Ordena la lista de CUPS por probabilidad de tener una factura nueva en el rango y, si está activado y no toca
+        barrido completo, quita los que aún no pueden tenerla. Solo se omite un CUP si el rango empieza después de su
+        última emisión conocida y su próxima emisión prevista, menos la holgura, cae después del fin del rango.
+        Un rango que se solapa con el historial (por ejemplo, para recuperar una factura pasada) nunca omite el CUP.
+        Parametros:
+            - portal (str): Identificador del portal (con el sufijo del tenant si no es el principal).
+            - distribuidora (str): "endesa" o "enel".
+            - cups (list): CUPS solicitados.
+            - fecha_desde (str): Inicio del rango de búsqueda (DD/MM/YYYY).
+            - fecha_hasta (str): Fin del rango de búsqueda (DD/MM/YYYY).
+        Retorna
+            - list: CUPS a procesar, primero los que ya deberían tener factura nueva.
+            - list: CUPS omitidos (sin factura prevista en el rango), para que el llamador deje constancia de cada uno.
+        '''
+        desde, hasta = _fecha(fecha_desde), _fecha(fecha_hasta)
+        if not desde or not hasta:
+            return cups, []
+
+        # A. Un barrido completo no omite ningún CUP (se registra al terminar la ejecución)
+        omitir = self.omitir
+        if omitir and self._toca_barrido(portal):
+            log.info(f"\t[CICLOS] Barrido completo de {portal}: no se omite ningún CUP en esta ejecución.")
+            self._barridos.add(portal)
+            omitir = False
+
+        # B. Días que faltan para la próxima emisión prevista de cada CUP (negativo = ya debería haberse emitido)
+        corte = min(hasta, datetime.now())
+        historial = self.historial(distribuidora)
+        dias: dict[str, int] = {}
+        omitidos: set[str] = set()
+        for cup in cups:
+            fechas = historial.get(clave_cup(cup), [])
+            prevista = self.prevision(fechas)
+            if prevista is None:
+                continue
+            dias[cup] = (prevista - corte).days
+            if omitir and fechas[-1] < desde and prevista - timedelta(days=self.margen_dias) > hasta:
+                omitidos.add(cup)
+
+        # C. Orden: primero los CUPS con emisión vencida; los que no tienen previsión cuentan como "toca hoy"
+        pendientes = sorted((c for c in cups if c not in omitidos), key=lambda c: dias.get(c, 0))
+        log.info(f"\t[CICLOS] {len(dias)} de {len(cups)} CUPS con ciclo estimado; {len(omitidos)} sin factura prevista en el rango se omiten.")
+        if omitidos:
+            log.debug(f"CUPS omitidos por ciclo de facturación: {', '.join(sorted(omitidos))}")
+        return pendientes, [c for c in cups if c in omitidos]
+
+
+# Instancia compartida del predictor de ciclos
+predictor_ciclos = PredictorCiclos()
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from logic.logs_logic import log
+from config import CIRCUITOS_PATH, CIRCUITO_FALLOS_MAX, CIRCUITO_ENFRIAMIENTO_MINUTOS
+
+
+### CORTOCIRCUITO DE ACCESO A LOS PORTALES
+class CircuitoPortales:
+    """
+    Clase que recuerda entre ejecuciones los logins fallidos de cada portal.
+    Tras K ejecuciones consecutivas sin poder acceder, el circuito se abre y las siguientes
+    ejecuciones fallan de inmediato durante el periodo de enfriamiento. Pasado ese periodo se
+    permite una ejecución de prueba: si accede se cierra el circuito, si falla se vuelve a abrir.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = CIRCUITOS_PATH, fallos_max: int = CIRCUITO_FALLOS_MAX, enfriamiento_minutos: int = CIRCUITO_ENFRIAMIENTO_MINUTOS):
+        self.ruta = ruta
+        self.fallos_max = fallos_max
+        self.enfriamiento_segundos = enfriamiento_minutos * 60
+
+
+    # === 1. PERSISTENCIA DEL ESTADO ===
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _escribir(self, estado: dict) -> None:
+        # Escritura atómica: un fichero a medias no debe bloquear ni desbloquear un portal
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(estado, f, indent=2)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.warning(f"[CIRCUITO] No se pudo guardar el estado del circuito: {e}")
+
+
+    # === 2. CONSULTA ANTES DE EJECUTAR ===
+    def permitir(self, portal: str) -> bool:
+        '''
+        Indica si se puede intentar el acceso al portal.
+        Parametros:
+            - portal (str): Identificador del portal ("endesa" o "enel").
+        Retorna
+            - bool: False si el circuito está abierto y el enfriamiento no ha terminado.
+        '''
+        if self.fallos_max <= 0:
+            return True
+        datos = self._leer().get(portal.lower(), {})
+        restante = datos.get("abierto_hasta", 0) - time.time()
+        if restante > 0:
+            log.critical(f"[CIRCUITO] Acceso a {portal} bloqueado tras {datos.get('fallos', 0)} ejecuciones fallidas. "
+                         f"Se reintentará en {int(restante / 60) + 1} min.")
+            return False
+        if datos.get("fallos", 0) >= self.fallos_max:
+            log.info(f"[CIRCUITO] Enfriamiento de {portal} terminado. Ejecución de prueba.")
+        return True
+
+
+    # === 3. REGISTRO DEL RESULTADO DEL ACCESO ===
+    def registrar_exito(self, portal: str) -> None:
+        '''
+        Cierra el circuito del portal tras un acceso correcto.
+        '''
+        estado = self._leer()
+        if estado.pop(portal.lower(), None):
+            self._escribir(estado)
+
+
+    def registrar_fallo(self, portal: str) -> None:
+        '''
+        Suma una ejecución fallida y abre el circuito al alcanzar el umbral.
+        Durante la ejecución de prueba (fallos ya >= umbral) un nuevo fallo lo reabre directamente.
+        '''
+        estado = self._leer()
+        datos = estado.setdefault(portal.lower(), {"fallos": 0, "abierto_hasta": 0})
+        datos["fallos"] += 1
+        datos["ultimo_fallo"] = time.time()
+        if self.fallos_max > 0 and datos["fallos"] >= self.fallos_max:
+            datos["abierto_hasta"] = time.time() + self.enfriamiento_segundos
+            log.critical(f"[CIRCUITO] Circuito de {portal} abierto durante {self.enfriamiento_segundos // 60} min "
+                         f"({datos['fallos']} ejecuciones consecutivas sin acceso).")
+        self._escribir(estado)
+
+
+# Instancia compartida del circuito de portales
+circuito_portales = CircuitoPortales()
@@ -0,0 +1,172 @@
+import asyncio
+import copy
+import json
+from urllib.parse import urlencode
+from playwright.async_api import APIRequestContext
+from logic.logs_logic import log
+from utils.captura_aura import CapturaAura
+from config import CLIENTE_AURA_CONCURRENCIA
+
+
+### CLIENTE HTTP AURA SIN NAVEGADOR
+class ClienteAura:
+    """
+    Clase que repite por HTTP las acciones Aura/Apex de un portal Salesforce con la sesión obtenida
+    en el navegador (cookies del storage_state, `aura.token` y `aura.context` de una petición capturada).
+    Usa un APIRequestContext de Playwright, sin renderizado, con un límite de peticiones simultáneas.
+    Chromium solo es necesario para el login y para capturar una vez cada acción que se quiere repetir.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, http: APIRequestContext, url_aura: str, formulario: dict, concurrencia: int = CLIENTE_AURA_CONCURRENCIA):
+        '''
+        Parametros:
+            - http (APIRequestContext): Cliente HTTP con las cookies de la sesión autenticada.
+            - url_aura (str): URL del endpoint /s/sfsites/aura de una petición capturada.
+            - formulario (dict): Campos del formulario capturado (aura.context, aura.token, aura.pageURI...).
+            - concurrencia (int): Peticiones simultáneas máximas.
+        '''
+        self.http = http
+        self.url_aura = url_aura.split("?")[0]
+        self.formulario_base = {k: v for k, v in formulario.items() if k != "message"}
+        self._semaforo = asyncio.Semaphore(max(1, concurrencia))
+        self._contador = 0
+        self.sesion_valida = True
+
+
+    # === 1. CREACION DESDE UNA CAPTURA ===
+    @classmethod
+    async def desde_captura(cls, robot, captura: CapturaAura) -> "ClienteAura | None":
+        '''
+        Crea el cliente a partir de la sesión del navegador y de la última petición Aura capturada.
+        Parametros:
+            - robot (NavegadorAsync): Navegador con la sesión iniciada.
+            - captura (CapturaAura): Captura con al menos una petición Aura del portal.
+        Retorna
+            - ClienteAura: Cliente listo para repetir acciones.
+            - None: Si no hay ninguna petición capturada con token.
+        '''
+        peticion = next((p for p in reversed(captura.peticiones) if p["formulario"].get("aura.token")), None)
+        if peticion is None:
+            log.warning("[AURA] No hay peticiones Aura capturadas con token; no se puede crear el cliente HTTP.")
+            return None
+        http = await robot.nuevo_cliente_http()
+        return cls(http, peticion["url"], peticion["formulario"])
+
+
+    # === 2. EJECUCION DE ACCIONES ===
+    async def ejecutar(self, descriptor: str, params: dict, timeout_ms: int = 60000):
+        '''
+        Ejecuta una acción Aura y devuelve su `returnValue`.
+        Parametros:
+            - descriptor (str): Descriptor de la acción (ej: "aura://ApexActionController/ACTION$execute").
+            - params (dict): Parámetros de la acción.
+            - timeout_ms (int): Timeout de la petición.
+        Retorna
+            - Valor devuelto por la acción, o None si la acción falla o la sesión ha caducado.
+        '''
+        async with self._semaforo:
+            self._contador += 1
+            mensaje = {"actions": [{"id": f"{self._contador};a", "descriptor": descriptor, "callingDescriptor": "UNKNOWN", "params": params}]}
+            formulario = dict(self.formulario_base, message=json.dumps(mensaje))
+            try:
+                respuesta = await self.http.post(
+                    f"{self.url_aura}?r={self._contador}",
+                    data=urlencode(formulario),
+                    headers={"Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"},
+                    timeout=timeout_ms,
+                )
+                texto = (await respuesta.text()).strip()
+            except Exception as e:
+                log.warning(f"[AURA] Error HTTP en la acción {descriptor}: {e}")
+                return None
+
+        # A. Respuestas no JSON o con sesión caducada (Salesforce redirige al login o devuelve aura:invalidSession)
+        if texto.startswith("while(1);"):
+            texto = texto[len("while(1);"):]
+        try:
+            cuerpo = json.loads(texto)
+        except ValueError:
+            self.sesion_valida = False
+            log.warning(f"[AURA] Respuesta no válida (HTTP {respuesta.status}); sesión probablemente caducada.")
+            return None
+        if "invalidSession" in json.dumps(cuerpo.get("exceptionEvent") or cuerpo.get("event") or ""):
+            self.sesion_valida = False
+            log.warning("[AURA] La sesión del cliente HTTP ha caducado.")
+            return None
+
+        # B. Valor de la acción
+        accion = (cuerpo.get("actions") or [{}])[0]
+        if accion.get("state") != "SUCCESS":
+            log.warning(f"[AURA] La acción {descriptor} terminó en estado {accion.get('state')}: {accion.get('error')}")
+            return None
+        return accion.get("returnValue")
+
+
+    async def repetir(self, accion: dict, reemplazos: dict[str, str]):
+        '''
+        Repite una acción capturada sustituyendo valores en sus parámetros (CUP, fechas, página...).
+        Se reemplazan las cadenas que contienen el valor original, incluidas las de JSON serializado.
+        Parametros:
+            - accion (dict): Respuesta capturada con "accion" (descriptor) y "params".
+            - reemplazos (dict): {valor_original: valor_nuevo}.
+        Retorna
+            - Valor devuelto por la acción, o None si falla.
+        '''
+        params = _sustituir(copy.deepcopy(accion["params"]), reemplazos)
+        return await self.ejecutar(accion["accion"], params)
+
+
+    # === 3. DESCARGA DE DOCUMENTOS ===
+    async def descargar(self, url: str, destino: str, timeout_ms: int = 60000) -> bool:
+        '''
+        Descarga un documento (PDF/XML) con las cookies de la sesión.
+        Parametros:
+            - url (str): URL absoluta del documento.
+            - destino (str): Ruta local donde guardarlo.
+        Retorna
+            - bool: True si se ha guardado un fichero no vacío.
+        '''
+        async with self._semaforo:
+            try:
+                respuesta = await self.http.get(url, timeout=timeout_ms)
+                if not respuesta.ok:
+                    log.warning(f"[AURA] Descarga fallida (HTTP {respuesta.status}): {url}")
+                    return False
+                contenido = await respuesta.body()
+            except Exception as e:
+                log.warning(f"[AURA] Error en la descarga {url}: {e}")
+                return False
+
+        # Una descarga que devuelve HTML es la página de login: la sesión ha caducado
+        if not contenido or contenido.lstrip()[:15].lower().startswith((b"<!doctype html", b"<html")):
+            self.sesion_valida = False
+            log.warning(f"[AURA] La descarga no devolvió un documento: {url}")
+            return False
+        with open(destino, "wb") as f:
+            f.write(contenido)
+        return True
+
+
+    # === 4. CIERRE ===
+    async def cerrar(self):
+        try:
+            await self.http.dispose()
+        except Exception:
+            pass
+
+
+# === AUXILIARES === #
+
+def _sustituir(valor, reemplazos: dict[str, str]):
+    # Sustitución recursiva de valores en los parámetros de una acción
+    if isinstance(valor, str):
+        for original, nuevo in reemplazos.items():
+            if original and original in valor:
+                valor = valor.replace(original, nuevo)
+        return valor
+    if isinstance(valor, list):
+        return [_sustituir(v, reemplazos) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _sustituir(v, reemplazos) for k, v in valor.items()}
+    return valor
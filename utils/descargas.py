@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+from playwright.async_api import BrowserContext
+from logic.logs_logic import log
+from config import DESCARGAS_PATH, DESCARGAS_CONCURRENCIA
+
+
+# === 0. VALIDACION DEL CONTENIDO ===
+
+# Datos de la fila que identifican un único documento: solo con ellos se aprende la URL (el CUP, por ejemplo,
+# es común a todas las facturas del suministro y una plantilla por CUP descargaría siempre el mismo PDF)
+CAMPOS_UNICOS = ("descarga_selector", "numero_factura")
+
+def _es_documento(tipo: str, contenido: bytes) -> bool:
+    # Una página HTML en lugar del documento indica sesión caducada, error o URL que ya no vale
+    inicio = contenido.lstrip()[:15].lower()
+    if not inicio or inicio.startswith((b"<!doctype html", b"<html")):
+        return False
+    if tipo == "PDF":
+        return inicio.startswith(b"%pdf")
+    return inicio.startswith(b"<")
+
+
+### GESTOR DE DESCARGAS DIRECTAS
+class GestorDescargas:
+    """
+    Clase que aprende, a partir de las descargas hechas con click, la URL de cada tipo de documento
+    en función de un dato de la fila (valor del botón o número de factura) y descarga los siguientes
+    directamente con `context.request` (cookies de la sesión), varios a la vez y sin pasar por la página.
+    La plantilla deducida de una descarga no se usa hasta que reproduce la URL de una segunda descarga por click
+    de otra factura (si la URL lleva otro identificador del documento, la plantilla no lo reproduciría).
+    Si no hay plantilla o la descarga directa falla, el llamador recurre a la descarga por click, que a su vez
+    vuelve a aprender la URL si el portal la ha cambiado.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = DESCARGAS_PATH, concurrencia: int = DESCARGAS_CONCURRENCIA):
+        self.ruta = ruta
+        self._semaforo = asyncio.Semaphore(max(1, concurrencia))
+        # {"portal:TIPO": {"plantilla": url con {clave}, "campo": nombre del dato de la fila, "verificada": bool}}
+        self.plantillas: dict[str, dict] = self._leer()
+        # Descargas anticipadas en curso por ruta de destino
+        self._pendientes: dict[str, asyncio.Task] = {}
+
+
+    # === 1. PERSISTENCIA DE PLANTILLAS ===
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _escribir(self) -> None:
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(self.plantillas, f, indent=2)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.debug(f"[DESCARGA] No se pudieron guardar las plantillas de descarga: {e}")
+
+
+    # === 2. APRENDIZAJE DE LA URL ===
+    def aprender(self, portal: str, tipo: str, url: str, claves: dict[str, str]) -> None:
+        '''
+        Deduce la plantilla de URL de un tipo de documento a partir de una descarga hecha con click.
+        La primera descarga propone la plantilla; la siguiente la verifica si su URL coincide con la generada,
+        o la sustituye por una nueva propuesta si no.
+        Parametros:
+            - portal (str): Identificador del portal.
+            - tipo (str): Tipo de documento ("PDF" o "XML").
+            - url (str): URL real de la descarga (`download.url`).
+            - claves (dict): Datos de la fila que pueden aparecer en la URL ({campo: valor}).
+        '''
+        # Las descargas servidas como blob:/data: no tienen URL reutilizable
+        if not url.startswith("http"):
+            return
+        clave = f"{portal}:{tipo}"
+        plantilla = self.plantillas.get(clave)
+
+        # A. Una descarga de otra factura que coincide con la plantilla propuesta la verifica
+        if plantilla and _generar(plantilla, claves) == url:
+            if not plantilla.get("verificada") and plantilla.get("origen") != claves.get(plantilla["campo"]):
+                plantilla["verificada"] = True
+                log.info(f"[DESCARGA] URL de {tipo} de {portal} verificada (por {plantilla['campo']}); las siguientes descargas serán directas.")
+                self._escribir()
+            return
+
+        # B. Nueva propuesta (sin verificar) a partir de un dato único de la factura
+        for campo in CAMPOS_UNICOS:
+            valor = claves.get(campo)
+            if valor and len(valor) >= 4 and url.count(valor) == 1:
+                self.plantillas[clave] = {"plantilla": url.replace(valor, "{clave}"), "campo": campo, "origen": valor, "verificada": False}
+                log.debug(f"[DESCARGA] Plantilla de {tipo} de {portal} propuesta (por {campo}); se verificará con la siguiente descarga.")
+                self._escribir()
+                return
+        self.plantillas.pop(clave, None)
+        log.debug(f"[DESCARGA] La URL de {tipo} de {portal} no contiene datos únicos de la factura: {url}")
+
+    def url(self, portal: str, tipo: str, claves: dict[str, str]) -> str | None:
+        # Solo las plantillas verificadas se usan para descargar
+        plantilla = self.plantillas.get(f"{portal}:{tipo}")
+        if not plantilla or not plantilla.get("verificada"):
+            return None
+        return _generar(plantilla, claves)
+
+
+    # === 3. DESCARGA DIRECTA ===
+    async def descargar(self, context: BrowserContext, portal: str, tipo: str, claves: dict[str, str], destino: str) -> bool:
+        '''
+        Descarga el documento por la URL aprendida con las cookies del contexto.
+        Si había una descarga anticipada del mismo destino, espera a esa en lugar de repetirla.
+        Parametros:
+            - context (BrowserContext): Contexto autenticado (se usa su `request`).
+            - portal (str): Identificador del portal.
+            - tipo (str): Tipo de documento ("PDF" o "XML").
+            - claves (dict): Datos de la fila ({campo: valor}).
+            - destino (str): Ruta local del fichero.
+        Retorna
+            - bool: True si el fichero se ha guardado y tiene la firma del tipo esperado.
+        '''
+        pendiente = self._pendientes.pop(destino, None)
+        if pendiente is not None:
+            try:
+                return await pendiente
+            except asyncio.CancelledError:
+                return False
+        return await self._descargar_directa(context, portal, tipo, claves, destino)
+
+    async def _descargar_directa(self, context: BrowserContext, portal: str, tipo: str, claves: dict[str, str], destino: str) -> bool:
+        url = self.url(portal, tipo, claves)
+        if url is None:
+            return False
+
+        async with self._semaforo:
+            try:
+                respuesta = await context.request.get(url, timeout=60000)
+                contenido = await respuesta.body() if respuesta.ok else b""
+            except Exception as e:
+                log.debug(f"[DESCARGA] Fallo en la descarga directa {url}: {e}")
+                return False
+
+        # Un fallo no descarta la plantilla (la fila puede no tener ese documento): el llamador hace click
+        # y, si la URL real ha cambiado, `aprender` la sustituye
+        if not _es_documento(tipo, contenido):
+            log.debug(f"[DESCARGA] La descarga directa no devolvió un {tipo}: {url}")
+            return False
+
+        with open(destino, "wb") as f:
+            f.write(contenido)
+        return True
+
+
+    # === 4. DESCARGA ANTICIPADA DE UNA PAGINA ===
+    def precargar(self, context: BrowserContext, portal: str, documentos: list[tuple[str, dict[str, str], str]]) -> int:
+        '''
+        Lanza en segundo plano las descargas directas de los documentos de una página de resultados,
+        para que se solapen mientras se procesa cada fila. Solo para tipos con plantilla aprendida.
+        Parametros:
+            - context (BrowserContext): Contexto autenticado.
+            - portal (str): Identificador del portal.
+            - documentos (list): Tuplas (tipo, claves, destino).
+        Retorna
+            - int: Número de descargas lanzadas.
+        '''
+        lanzadas = 0
+        for tipo, claves, destino in documentos:
+            if destino in self._pendientes or self.url(portal, tipo, claves) is None:
+                continue
+            self._pendientes[destino] = asyncio.create_task(self._descargar_directa(context, portal, tipo, claves, destino))
+            lanzadas += 1
+        if lanzadas:
+            log.debug(f"[DESCARGA] {lanzadas} descargas directas anticipadas.")
+        return lanzadas
+
+    def cancelar_pendientes(self, destinos: list[str]) -> None:
+        # Descargas anticipadas que ya no se van a consumir (filas ya procesadas, fallo de la página...)
+        for destino in destinos:
+            tarea = self._pendientes.pop(destino, None)
+            if tarea is not None:
+                tarea.cancel()
+
+
+def _generar(plantilla: dict, claves: dict[str, str]) -> str | None:
+    valor = claves.get(plantilla["campo"])
+    if plantilla["campo"] not in CAMPOS_UNICOS or not valor:
+        return None
+    return plantilla["plantilla"].replace("{clave}", valor)
+
+
+# Instancia compartida del gestor de descargas
+gestor_descargas = GestorDescargas()
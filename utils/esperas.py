@@ -0,0 +1,202 @@
+import asyncio
+import time
+from playwright.async_api import Page, Locator, Request, Response, TimeoutError
+from logic.logs_logic import log
+
+
+# === 0. CONSTANTES DE LAS ESPERAS ===
+
+# Endpoint por el que los portales Salesforce (Lightning/Aura) cargan todos sus datos
+RUTA_AURA = "/s/sfsites/aura"
+
+# Firma de una tabla: número de filas y texto de la primera y la última (cambia cuando llega la nueva página)
+_JS_FIRMA_TABLA = """
+(selector) => {
+    const filas = document.querySelectorAll(selector);
+    if (!filas.length) return "0|";
+    const texto = (f) => (f.innerText || f.textContent || "").trim();
+    return filas.length + "|" + texto(filas[0]) + "|" + texto(filas[filas.length - 1]);
+}
+"""
+
+# Espera con MutationObserver hasta que la firma de la tabla sea distinta de la anterior
+_JS_ESPERAR_CAMBIO = """
+([selector, anterior, timeout]) => new Promise((resolve) => {
+    const firma = () => {
+        const filas = document.querySelectorAll(selector);
+        if (!filas.length) return "0|";
+        const texto = (f) => (f.innerText || f.textContent || "").trim();
+        return filas.length + "|" + texto(filas[0]) + "|" + texto(filas[filas.length - 1]);
+    };
+    if (firma() !== anterior) return resolve(true);
+    const observador = new MutationObserver(() => {
+        if (firma() !== anterior) { observador.disconnect(); clearTimeout(reloj); resolve(true); }
+    });
+    observador.observe(document.body, { childList: true, subtree: true, characterData: true });
+    const reloj = setTimeout(() => { observador.disconnect(); resolve(false); }, timeout);
+})
+"""
+
+
+# === 1. ESPERAS SOBRE EL DOM ===
+
+# ESP.1 Firma del contenido actual de una tabla
+async def firma_tabla(page: Page, selector_filas: str) -> str:
+    '''
+    Obtiene una firma ligera de las filas visibles de una tabla para detectar después el cambio de página.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - selector_filas (str): Selector CSS de las filas de la tabla (ej: 'table#example1 tbody tr')
+    Retorna:
+        - str: Firma "n_filas|primera|última" (cadena vacía si no se puede calcular)
+    '''
+    try:
+        return await page.evaluate(_JS_FIRMA_TABLA, selector_filas)
+    except Exception:
+        return ""
+
+
+# ESP.2 Espera a que cambie el contenido de una tabla
+async def esperar_cambio_tabla(page: Page, selector_filas: str, firma_anterior: str, timeout: int = 30000) -> bool:
+    '''
+    Espera, escuchando mutaciones del DOM, a que las filas de la tabla sean distintas de la firma indicada.
+    Sustituye a las pausas fijas tras pulsar "Siguiente": vuelve en cuanto se pintan los datos nuevos.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - selector_filas (str): Selector CSS de las filas de la tabla
+        - firma_anterior (str): Firma tomada con `firma_tabla` antes de la acción
+        - timeout (int): Tiempo máximo de espera en milisegundos
+    Retorna:
+        - bool: True si la tabla ha cambiado, False si se agota el tiempo
+    '''
+    try:
+        cambiada = await page.evaluate(_JS_ESPERAR_CAMBIO, [selector_filas, firma_anterior, timeout])
+    except Exception as e:
+        # Una navegación durante la espera destruye el contexto de ejecución: se comprueba de nuevo
+        log.debug(f"[ESPERA] Espera de mutaciones interrumpida: {e}")
+        cambiada = (await firma_tabla(page, selector_filas)) not in ("", firma_anterior)
+    if not cambiada:
+        log.debug(f"[ESPERA] La tabla '{selector_filas}' no cambió en {timeout} ms.")
+    return cambiada
+
+
+# ESP.2.1 Paso a la página siguiente de una tabla con un reintento
+async def pulsar_y_esperar_cambio_tabla(page: Page, boton: Locator, selector_filas: str, timeout: int = 30000, reintentos: int = 1) -> bool:
+    '''
+    Pulsa el botón de paginación y espera a que cambien las filas; si no cambian, repite el click.
+    En el reintento solo se vuelve a pulsar si la tabla sigue igual, para que un cambio tardío no salte una página.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - boton (Locator): Botón "Siguiente" de la tabla
+        - selector_filas (str): Selector CSS de las filas de la tabla
+        - timeout (int): Tiempo máximo de espera de cada intento en milisegundos
+        - reintentos (int): Clicks adicionales si la tabla no cambia
+    Retorna:
+        - bool: True si se ha cargado la página siguiente, False si la tabla no ha cambiado tras todos los intentos
+    '''
+    firma = await firma_tabla(page, selector_filas)
+    for intento in range(reintentos + 1):
+        if intento == 0 or await firma_tabla(page, selector_filas) == firma:
+            await boton.click(timeout=10000)
+        if await esperar_cambio_tabla(page, selector_filas, firma, timeout):
+            return True
+        if intento < reintentos:
+            log.warning("[ESPERA] La tabla no cambió tras pulsar 'Siguiente'. Reintentando...")
+    return False
+
+
+# ESP.3 Espera a que un elemento desaparezca (modales, banners, calendarios)
+async def esperar_oculto(elemento: Locator, timeout: int = 3000) -> bool:
+    '''
+    Espera a que un elemento se oculte tras interactuar con él, sin lanzar excepción si no lo hace.
+    Parametros:
+        - elemento (Locator): Elemento que debe desaparecer
+        - timeout (int): Tiempo máximo de espera en milisegundos
+    Retorna:
+        - bool: True si el elemento se ha ocultado, False si sigue visible
+    '''
+    try:
+        await elemento.wait_for(state="hidden", timeout=timeout)
+        return True
+    except TimeoutError:
+        return False
+
+
+# === 2. ESPERAS SOBRE LAS LLAMADAS AURA ===
+
+# ESP.4 Ejecución de una acción esperando la respuesta Aura que provoca
+async def ejecutar_y_esperar_aura(page: Page, accion, filtro: str | None = None, timeout: int = 30000) -> bool:
+    '''
+    Ejecuta una acción (click, selección...) y espera la respuesta Aura que desencadena.
+    La escucha se registra antes de la acción para no perder respuestas rápidas.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - accion: Corrutina sin argumentos que dispara la petición (ej: `lambda: boton.click()`)
+        - filtro (str): Opcional. Texto que debe contener la URL de la llamada (ej: nombre del controlador Apex)
+        - timeout (int): Tiempo máximo de espera en milisegundos
+    Retorna:
+        - bool: True si llegó la respuesta, False si se agotó el tiempo (la acción sí se ha ejecutado)
+    '''
+    def es_aura(response: Response) -> bool:
+        return RUTA_AURA in response.url and (filtro is None or filtro in response.url)
+
+    try:
+        async with page.expect_response(es_aura, timeout=timeout):
+            await accion()
+        return True
+    except TimeoutError:
+        log.debug(f"[ESPERA] Sin respuesta Aura{f' ({filtro})' if filtro else ''} en {timeout} ms.")
+        return False
+
+
+# ESP.5 Espera a que no queden llamadas Aura en curso
+async def esperar_aura_inactiva(page: Page, accion=None, quietud_ms: int = 500, timeout: int = 30000) -> bool:
+    '''
+    Alternativa a `networkidle` para Salesforce: solo cuenta las llamadas Aura, ignorando el long-polling
+    (CometD/streaming) y las balizas de terceros que impiden que la red quede inactiva.
+    Vuelve cuando no hay llamadas Aura pendientes durante `quietud_ms`.
+    La acción que dispara la carga se pasa aquí para ejecutarla con la escucha ya registrada: si se lanzara antes,
+    las peticiones que salen durante el click no se contarían y la espera podría volver con llamadas aún en curso.
+    Parametros:
+        - page (Page): Pagina web del navegador
+        - accion: Opcional. Corrutina sin argumentos que provoca las llamadas Aura (ej: `lambda: boton.click()`)
+        - quietud_ms (int): Milisegundos sin llamadas Aura en curso para considerar la carga terminada
+        - timeout (int): Tiempo máximo de espera en milisegundos
+    Retorna:
+        - bool: True si las llamadas Aura se han completado, False si se agota el tiempo
+    '''
+    pendientes: set[Request] = set()
+    ultima_actividad = time.monotonic()
+
+    # A. Seguimiento de las peticiones Aura en curso
+    def al_iniciar(request: Request):
+        nonlocal ultima_actividad
+        if RUTA_AURA in request.url:
+            pendientes.add(request)
+            ultima_actividad = time.monotonic()
+
+    def al_terminar(request: Request):
+        nonlocal ultima_actividad
+        if request in pendientes:
+            pendientes.discard(request)
+            ultima_actividad = time.monotonic()
+
+    page.on("request", al_iniciar)
+    page.on("requestfinished", al_terminar)
+    page.on("requestfailed", al_terminar)
+
+    # B. Acción que dispara la carga y sondeo ligero del estado de los contadores (no consulta el navegador)
+    try:
+        if accion is not None:
+            await accion()
+        limite = time.monotonic() + timeout / 1000
+        while time.monotonic() < limite:
+            if not pendientes and (time.monotonic() - ultima_actividad) * 1000 >= quietud_ms:
+                return True
+            await asyncio.sleep(0.05)
+        log.debug(f"[ESPERA] Llamadas Aura aún en curso tras {timeout} ms ({len(pendientes)} pendientes).")
+        return False
+    finally:
+        page.remove_listener("request", al_iniciar)
+        page.remove_listener("requestfinished", al_terminar)
+        page.remove_listener("requestfailed", al_terminar)
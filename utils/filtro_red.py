@@ -0,0 +1,170 @@
+import re
+from playwright.async_api import BrowserContext, Page, Route, Request
+from logic.logs_logic import log
+
+
+# === 0. PERFIL DE FILTRADO POR DEFECTO ===
+
+# Tipos de recurso que los flujos de extracción nunca necesitan
+TIPOS_BLOQUEADOS = {
+    "image": "imagenes",
+    "font": "fuentes",
+    "media": "media",
+}
+
+# Dominios y rutas de terceros agrupados por categoría
+PATRONES_BLOQUEADOS = {
+    "analitica": [
+        r"google-analytics\.com", r"googletagmanager\.com", r"doubleclick\.net", r"facebook\.(net|com)/tr",
+        r"hotjar\.com", r"clarity\.ms", r"adobedtm\.com", r"omtrdc\.net", r"demdex\.net",
+        r"nr-data\.net", r"newrelic\.com", r"/rum\?", r"instrumentation\.",
+    ],
+    "consentimiento": [
+        r"truste-svc\.net", r"trustarc\.com/.*(log|beacon)", r"consent\.trustarc\.com/.*/log",
+    ],
+    "chat": [
+        r"salesforceliveagent\.com", r"embeddedservice", r"/liveagent/", r"zendesk\.com", r"intercom\.io",
+        r"livechatinc\.com", r"tawk\.to", r"drift\.com",
+    ],
+}
+
+# Patrones que nunca se bloquean: llamadas Aura, descargas de documentos y el script del banner de cookies
+# (el login de Endesa detecta el éxito por la aparición de #truste-consent-button).
+# La ruta de descarga se exige como segmento completo: un "download" suelto dejaría pasar píxeles y scripts de terceros
+PATRONES_PERMITIDOS = [
+    r"/s/sfsites/aura", r"/sfc/servlet\.shepherd", r"\.pdf(\?|$)", r"\.xml(\?|$)", r"/download(/|\?|$)",
+    r"consent\.trustarc\.com/notice", r"consent\.truste\.com/notice",
+]
+
+# Equivalentes con comodines para Network.setBlockedURLs (modo perfil persistente)
+URLS_BLOQUEADAS_CDP = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.ico*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*", "*.mp4*", "*.webm*", "*.mp3*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+    "*clarity.ms*", "*adobedtm.com*", "*omtrdc.net*", "*demdex.net*", "*nr-data.net*",
+    "*truste-svc.net*", "*salesforceliveagent.com*", "*embeddedservice*",
+]
+
+
+### FILTRO DE PETICIONES DE RED
+class FiltroRed:
+    """
+    Clase que aborta las peticiones innecesarias para la extracción (imágenes, fuentes, media,
+    analítica, balizas de consentimiento y chats de terceros) y contabiliza peticiones y bytes
+    por categoría, bloqueadas o permitidas, para medir el ahorro.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, patrones_permitidos_extra: list[str] | None = None):
+        self._bloqueados = {categoria: re.compile("|".join(patrones), re.IGNORECASE)
+                            for categoria, patrones in PATRONES_BLOQUEADOS.items()}
+        self._permitidos = re.compile("|".join(PATRONES_PERMITIDOS + (patrones_permitidos_extra or [])), re.IGNORECASE)
+        # {categoria: {"bloqueadas": n, "permitidas": n, "bytes": n}}
+        self.estadisticas: dict[str, dict[str, int]] = {}
+
+
+    # === 1. INSTALACION SOBRE UN CONTEXTO ===
+    async def instalar(self, context: BrowserContext, persistente: bool = False):
+        '''
+        Activa el filtrado en todas las páginas del contexto.
+        Con `context.route` Playwright desactiva la caché HTTP, por lo que en el modo de perfil persistente
+        el bloqueo se hace con `Network.setBlockedURLs` (CDP) por página, conservando la caché en disco.
+        Parametros:
+            - context (BrowserContext): Contexto sobre el que filtrar.
+            - persistente (bool): True si el contexto usa un perfil persistente con caché HTTP.
+        '''
+        # A. Contabilidad de peticiones completadas
+        context.on("requestfinished", self._al_finalizar)
+
+        # B. Bloqueo por CDP (mantiene la caché) o por enrutado de Playwright
+        #    (solo en CDP se cuentan las bloqueadas como fallidas: con enrutado ya las cuenta `_enrutar` y el
+        #    `route.abort` las volvería a contar al emitir su requestfailed)
+        if persistente:
+            context.on("requestfailed", self._al_fallar)
+            for page in context.pages:
+                await self._bloquear_por_cdp(context, page)
+            context.on("page", lambda page: self._bloquear_por_cdp(context, page))
+        else:
+            await context.route("**/*", self._enrutar)
+
+
+    # === 2. CLASIFICACION DE PETICIONES ===
+    def clasificar(self, request: Request) -> tuple[str, bool]:
+        '''
+        Determina la categoría de una petición y si debe bloquearse.
+        Parametros:
+            - request (Request): Petición interceptada.
+        Retorna
+            - tuple[str, bool]: (categoría, bloquear)
+        '''
+        url = request.url
+
+        # A. Las rutas permitidas se dejan pasar siempre
+        if self._permitidos.search(url):
+            return request.resource_type, False
+
+        # B. Terceros por patrón de URL
+        for categoria, patron in self._bloqueados.items():
+            if patron.search(url):
+                return categoria, True
+
+        # C. Tipos de recurso prescindibles
+        if request.resource_type in TIPOS_BLOQUEADOS:
+            return TIPOS_BLOQUEADOS[request.resource_type], True
+
+        return request.resource_type, False
+
+
+    # === 3. MANEJADORES DE EVENTOS ===
+    async def _enrutar(self, route: Route):
+        categoria, bloquear = self.clasificar(route.request)
+        if bloquear:
+            self._contar(categoria, "bloqueadas")
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    async def _al_finalizar(self, request: Request):
+        categoria, _ = self.clasificar(request)
+        self._contar(categoria, "permitidas")
+        try:
+            tamanos = await request.sizes()
+            self._contar(categoria, "bytes", tamanos["responseBodySize"] + tamanos["responseHeadersSize"])
+        except Exception:
+            pass
+
+    def _al_fallar(self, request: Request):
+        # En modo CDP las peticiones bloqueadas llegan como fallidas con ERR_BLOCKED_BY_CLIENT
+        if "BLOCKED_BY_CLIENT" in (request.failure or "").upper():
+            categoria, bloquear = self.clasificar(request)
+            if not bloquear:
+                return
+            self._contar(categoria, "bloqueadas")
+
+    async def _bloquear_por_cdp(self, context: BrowserContext, page: Page):
+        try:
+            cdp = await context.new_cdp_session(page)
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setBlockedURLs", {"urls": URLS_BLOQUEADAS_CDP})
+        except Exception as e:
+            log.debug(f"[RED] No se pudo aplicar el bloqueo CDP en la página: {e}")
+
+    def _contar(self, categoria: str, campo: str, cantidad: int = 1):
+        contadores = self.estadisticas.setdefault(categoria, {"bloqueadas": 0, "permitidas": 0, "bytes": 0})
+        contadores[campo] += cantidad
+
+
+    # === 4. INFORME DE AHORRO ===
+    def resumen(self) -> str:
+        '''
+        Devuelve un resumen legible de peticiones y bytes por categoría.
+        '''
+        if not self.estadisticas:
+            return "[RED] Sin peticiones registradas."
+        total_bloqueadas = sum(c["bloqueadas"] for c in self.estadisticas.values())
+        total_permitidas = sum(c["permitidas"] for c in self.estadisticas.values())
+        total_bytes = sum(c["bytes"] for c in self.estadisticas.values())
+        lineas = [f"[RED] Peticiones permitidas: {total_permitidas} ({total_bytes / 1024:.0f} KB) | bloqueadas: {total_bloqueadas}"]
+        for categoria, c in sorted(self.estadisticas.items(), key=lambda kv: -kv[1]["bytes"]):
+            lineas.append(f"\t{categoria:<16} permitidas={c['permitidas']:<5} bloqueadas={c['bloqueadas']:<5} {c['bytes'] / 1024:.0f} KB")
+        return "\n".join(lineas)
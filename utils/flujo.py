@@ -0,0 +1,57 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+from logic.logs_logic import log
+
+
+# === 0. CONSTANTES DEL FLUJO ===
+
+# Facturas terminadas que pueden esperar en la cola antes de frenar a los productores
+CAPACIDAD_FLUJO = 50
+
+# Marca de fin de un productor en la cola común
+_FIN = object()
+
+
+# === 1. COMBINACION DE PRODUCTORES CONCURRENTES ===
+
+# FLU.1 Flujo único con los resultados de varios trabajos concurrentes
+async def fusionar(trabajos: list[Callable[[Callable[[object], Awaitable[None]]], Awaitable[None]]], capacidad: int = CAPACIDAD_FLUJO,
+                   ordenado: bool = False) -> AsyncIterator:
+    '''
+    Ejecuta los trabajos a la vez y entrega sus resultados según se emiten. Cada trabajo recibe una corrutina
+    `emitir(resultado)` sobre una cola acotada: si el consumidor va más lento, los trabajos se detienen en `emitir`
+    en lugar de acumular resultados en memoria. Si el consumidor deja de iterar, los trabajos pendientes se cancelan.
+    Parametros:
+        - trabajos (list): Corrutinas (emitir) -> None.
+        - capacidad (int): Resultados que pueden esperar en cada cola.
+        - ordenado (bool): Si es True cada trabajo tiene su propia cola y los resultados salen en el orden de la lista
+          de trabajos (un trabajo adelantado se detiene al llenar su cola); si es False salen en orden de emisión.
+    Retorna:
+        - AsyncIterator: Resultados emitidos por todos los trabajos.
+    '''
+    colas = [asyncio.Queue(maxsize=max(1, capacidad)) for _ in (trabajos if ordenado else [None])]
+
+    # A. Cada trabajo avisa de su fin aunque falle (un fallo no detiene al resto)
+    async def ejecutar(trabajo, cola: asyncio.Queue):
+        try:
+            await trabajo(cola.put)
+        except Exception as e:
+            log.error(f"\t[ERROR] Trabajo concurrente detenido: {e}")
+        await cola.put(_FIN)
+
+    tareas = [asyncio.create_task(ejecutar(trabajo, colas[i] if ordenado else colas[0])) for i, trabajo in enumerate(trabajos)]
+
+    # B. Entrega de resultados hasta que terminen todos los trabajos
+    try:
+        for cola in colas:
+            activos = 1 if ordenado else len(tareas)
+            while activos:
+                resultado = await cola.get()
+                if resultado is _FIN:
+                    activos -= 1
+                    continue
+                yield resultado
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
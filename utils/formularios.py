@@ -0,0 +1,75 @@
+from playwright.async_api import Locator
+from logic.logs_logic import log
+
+
+# === 0. SCRIPTS DE ASIGNACION DIRECTA ===
+
+# Fija la fecha a través de la instancia flatpickr del input (o del input original si usa altInput)
+# y devuelve la fecha seleccionada formateada para verificarla
+_JS_FLATPICKR_SET_DATE = """
+(el, [fecha, formato]) => {
+    const fp = el._flatpickr || (el.previousElementSibling && el.previousElementSibling._flatpickr);
+    if (!fp) return null;
+    fp.setDate(fecha, true, formato);
+    fp.close();
+    return fp.selectedDates.length ? fp.formatDate(fp.selectedDates[0], formato) : "";
+}
+"""
+
+# Asigna el valor con el setter nativo (el que vigilan los frameworks) y emite los eventos que
+# escuchan los componentes LWC/Aura, incluido el blur que dispara su validación y reformateo
+_JS_FIJAR_VALOR = """
+(el, valor) => {
+    const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set;
+    el.focus();
+    setter.call(el, valor);
+    for (const tipo of ["input", "change"]) {
+        el.dispatchEvent(new Event(tipo, { bubbles: true, composed: true }));
+    }
+    el.dispatchEvent(new FocusEvent("blur", { composed: true }));
+    el.dispatchEvent(new FocusEvent("focusout", { bubbles: true, composed: true }));
+    el.blur();
+}
+"""
+
+
+# === 1. ASIGNACION PROGRAMATICA DE CAMPOS ===
+
+# FRM.1 Fecha en un calendario flatpickr
+async def fijar_fecha_flatpickr(campo: Locator, fecha: str, formato: str = "d/m/Y") -> bool:
+    '''
+    Selecciona la fecha con `setDate` de la instancia flatpickr asociada al input, sin abrir el calendario.
+    Parametros:
+        - campo (Locator): Input del calendario (clase flatpickr-input)
+        - fecha (str): Fecha en el formato indicado (por defecto DD/MM/YYYY)
+        - formato (str): Formato flatpickr de la fecha
+    Retorna:
+        - bool: True si el calendario ha quedado con la fecha indicada, False si hay que usar la interfaz
+    '''
+    try:
+        aplicada = await campo.evaluate(_JS_FLATPICKR_SET_DATE, [fecha, formato])
+    except Exception as e:
+        log.debug(f"[FORMULARIO] setDate de flatpickr no disponible: {e}")
+        return False
+    if aplicada != fecha:
+        log.debug(f"[FORMULARIO] flatpickr no aplicó la fecha {fecha} (valor: {aplicada}).")
+        return False
+    return True
+
+
+# FRM.2 Valor de un input de componente LWC/Aura
+async def fijar_valor_input(campo: Locator, valor: str) -> bool:
+    '''
+    Asigna el valor de un input de componente mediante eventos sintéticos, sin teclear carácter a carácter.
+    Parametros:
+        - campo (Locator): Input a rellenar
+        - valor (str): Valor a asignar
+    Retorna:
+        - bool: True si tras la validación del componente (blur) el input conserva el valor, False en otro caso
+    '''
+    try:
+        await campo.evaluate(_JS_FIJAR_VALOR, valor)
+        return await campo.input_value() == valor
+    except Exception as e:
+        log.debug(f"[FORMULARIO] No se pudo asignar el valor por eventos: {e}")
+        return False
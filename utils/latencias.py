@@ -0,0 +1,181 @@
+import json
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from playwright.async_api import TimeoutError
+from logic.logs_logic import log
+from utils.tenants import tenant_actual
+from config import (LATENCIAS_PATH, LATENCIAS_ADAPTATIVAS, LATENCIA_MIN_MUESTRAS, LATENCIA_MAX_MUESTRAS,
+                    LATENCIA_MARGEN, LATENCIA_TIMEOUT_MIN_MS, LATENCIA_FACTOR_DERIVA)
+
+
+### MEDICION DE UN PASO
+class Medicion:
+    """
+    Resultado de una medición en curso: expone el timeout a aplicar y permite marcarla como fallida
+    cuando la espera no lanza excepción (funciones que devuelven False al agotar el tiempo).
+    """
+    def __init__(self, timeout: int):
+        self.timeout = timeout
+        self.fallida = False
+
+    def fallo(self) -> None:
+        self.fallida = True
+
+
+### REGISTRO DE LATENCIAS POR PORTAL Y PASO
+class RegistroLatencias:
+    """
+    Clase que guarda entre ejecuciones la duración de cada paso de espera (carga de tabla, descarga,
+    login...) por portal y deriva de ella el timeout: p99 observado con margen, acotado entre un
+    suelo y el valor fijo original. Así un portal caído se detecta en segundos y no al cabo del peor caso.
+    También informa de los pasos cuya latencia en la ejecución actual se desvía de la histórica.
+    El histórico es del portal (lo comparten los tenants); la ejecución en curso se lleva por tenant, para que
+    dos tenants simultáneos no se mezclen ni se lleven las muestras del otro al guardar.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = LATENCIAS_PATH):
+        self.ruta = ruta
+        # {portal: {paso: [ms, ...]}} histórico cargado de disco
+        self._historico: dict[str, dict[str, list[float]]] | None = None
+        # Muestras y timeouts de la ejecución en curso por tenant.clave(portal) (se vuelcan al histórico al guardar)
+        self._ejecucion: dict[str, dict[str, list[float]]] = {}
+        # {tenant.clave(portal): {paso: (esperas agotadas, último timeout aplicado)}}
+        self._timeouts: dict[str, dict[str, tuple[int, int]]] = {}
+
+
+    # === 1. PERSISTENCIA ===
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _clave(portal: str) -> str:
+        return tenant_actual().clave(portal)
+
+    @property
+    def historico(self) -> dict[str, dict[str, list[float]]]:
+        if self._historico is None:
+            self._historico = self._leer()
+        return self._historico
+
+    def guardar(self, portal: str) -> None:
+        '''
+        Añade las muestras de la ejecución del portal en el tenant en curso al histórico en disco (releído para
+        no pisar otras ejecuciones) conservando las últimas LATENCIA_MAX_MUESTRAS por paso.
+        Parametros:
+            - portal (str): Identificador del portal cuya ejecución termina.
+        '''
+        clave = self._clave(portal)
+        pasos = self._ejecucion.pop(clave, {})
+        self._timeouts.pop(clave, None)
+        if not pasos:
+            return
+
+        estado = self._leer()
+        for paso, muestras in pasos.items():
+            serie = estado.setdefault(portal, {}).setdefault(paso, [])
+            serie.extend(round(m) for m in muestras)
+            del serie[:-LATENCIA_MAX_MUESTRAS]
+
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(estado, f)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.warning(f"[LATENCIA] No se pudo guardar el histórico de latencias: {e}")
+        self._historico = estado
+
+
+    # === 2. TIMEOUT ADAPTATIVO ===
+    def timeout(self, portal: str, paso: str, techo: int) -> int:
+        '''
+        Calcula el timeout de un paso a partir de su latencia histórica.
+        Parametros:
+            - portal (str): Identificador del portal ("endesa" o "enel").
+            - paso (str): Nombre del paso medido (ej: "carga_datos").
+            - techo (int): Timeout fijo original en ms, usado como máximo y mientras no haya muestras suficientes.
+        Retorna
+            - int: Timeout en milisegundos.
+        '''
+        # Tras agotar una espera del paso, el resto de la ejecución usa el techo (el portal va más lento que el histórico)
+        if paso in self._timeouts.get(self._clave(portal), {}):
+            return techo
+        muestras = self.historico.get(portal, {}).get(paso, [])
+        if not LATENCIAS_ADAPTATIVAS or len(muestras) < LATENCIA_MIN_MUESTRAS:
+            return techo
+        p99 = statistics.quantiles(muestras, n=100)[98]
+        return int(min(techo, max(LATENCIA_TIMEOUT_MIN_MS, p99 * LATENCIA_MARGEN)))
+
+
+    # === 3. MEDICION DE UN PASO ===
+    @contextmanager
+    def medir(self, portal: str, paso: str, techo: int):
+        '''
+        Mide la duración de un bloque de espera y registra la muestra.
+        Una espera agotada se registra como muestra censurada con el valor de su timeout (la latencia real fue al menos esa):
+        sin ella, un timeout aprendido demasiado bajo no volvería a subir. Además, el resto de la ejecución usa el techo.
+        Uso:
+            with registro_latencias.medir("endesa", "carga_datos", 90000) as medicion:
+                await locator.wait_for(timeout=medicion.timeout)
+        '''
+        medicion = Medicion(self.timeout(portal, paso, techo))
+        inicio = time.monotonic()
+        try:
+            yield medicion
+        except TimeoutError:
+            self._contar_timeout(portal, paso, medicion.timeout)
+            raise
+        if medicion.fallida:
+            self._contar_timeout(portal, paso, medicion.timeout)
+        else:
+            self._ejecucion.setdefault(self._clave(portal), {}).setdefault(paso, []).append((time.monotonic() - inicio) * 1000)
+
+    def _contar_timeout(self, portal: str, paso: str, timeout: int) -> None:
+        clave = self._clave(portal)
+        pasos = self._timeouts.setdefault(clave, {})
+        pasos[paso] = (pasos.get(paso, (0, 0))[0] + 1, timeout)
+        self._ejecucion.setdefault(clave, {}).setdefault(paso, []).append(timeout)
+
+
+    # === 4. INFORME DE DERIVA ===
+    def informe_deriva(self, portal: str) -> list[str]:
+        '''
+        Compara la mediana de cada paso en la ejecución actual con la histórica y lista los pasos
+        que se han desviado más del factor configurado, además de los pasos con timeouts agotados.
+        Parametros:
+            - portal (str): Identificador del portal.
+        Retorna
+            - list[str]: Líneas del informe (vacía si no hay deriva).
+        '''
+        lineas = []
+        clave = self._clave(portal)
+        historico = self.historico.get(portal, {})
+
+        # A. Pasos cuya mediana actual se aleja de la histórica
+        for paso, muestras in self._ejecucion.get(clave, {}).items():
+            previas = historico.get(paso, [])
+            if len(previas) < LATENCIA_MIN_MUESTRAS or not muestras:
+                continue
+            actual, habitual = statistics.median(muestras), statistics.median(previas)
+            if habitual and (actual / habitual >= LATENCIA_FACTOR_DERIVA or habitual / max(actual, 1) >= LATENCIA_FACTOR_DERIVA):
+                lineas.append(f"{paso}: mediana {actual:.0f} ms frente a {habitual:.0f} ms habitual ({len(muestras)} muestras)")
+
+        # B. Pasos que han agotado su timeout
+        for paso, (n, timeout) in self._timeouts.get(clave, {}).items():
+            lineas.append(f"{paso}: {n} espera(s) agotada(s) con timeout {timeout} ms")
+
+        for linea in lineas:
+            log.warning(f"[LATENCIA] Deriva en {clave} -> {linea}")
+        return lineas
+
+
+# Instancia compartida del registro de latencias
+registro_latencias = RegistroLatencias()
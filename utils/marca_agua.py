@@ -0,0 +1,70 @@
+from datetime import datetime
+from logic.logs_logic import log
+from config import CORTE_PAGINAS_PROCESADAS
+
+
+### CORTE DE PAGINACION POR FACTURAS YA PROCESADAS
+class MarcaAgua:
+    """
+    Clase que sigue, página a página, si la tabla de resultados solo contiene facturas ya registradas
+    como procesadas. Con los resultados ordenados por fecha de emisión de la más reciente a la más antigua,
+    K páginas seguidas sin nada pendiente indican que el resto del rango ya se procesó en ejecuciones
+    anteriores y se puede dejar de paginar. En orden ascendente las facturas nuevas quedan al final, así que
+    el corte solo se aplica una vez comprobado que las fechas bajan; si no vienen ordenadas, se desactiva
+    para esa tabla.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, portal: str, paginas: int = CORTE_PAGINAS_PROCESADAS):
+        self.portal = portal
+        self.paginas = paginas
+        self.consecutivas = 0
+        # Filas leídas de la tabla (con el corte activo, solo las de las páginas recorridas)
+        self.filas = 0
+        self.ordenada = True
+        # Sentido del orden de fechas: -1 descendente, 1 ascendente, 0 aún desconocido
+        self._sentido = 0
+        self._ultima: datetime | None = None
+
+    @property
+    def activa(self) -> bool:
+        return self.paginas > 0 and self.ordenada
+
+
+    # === 1. COMPROBACION DEL ORDEN ===
+    def _comprobar_orden(self, fechas: list[str]) -> None:
+        for texto in fechas:
+            try:
+                fecha = datetime.strptime(texto.strip(), "%d/%m/%Y")
+            except (ValueError, AttributeError):
+                continue
+            if self._ultima is not None and fecha != self._ultima:
+                sentido = 1 if fecha > self._ultima else -1
+                if self._sentido == 0:
+                    self._sentido = sentido
+                elif sentido != self._sentido:
+                    self.ordenada = False
+                    log.info(f"\t[CORTE] Resultados de {self.portal} no ordenados por fecha de emisión; se recorren todas las páginas.")
+                    return
+            self._ultima = fecha
+
+
+    # === 2. REGISTRO DE UNA PAGINA ===
+    def registrar_pagina(self, fechas: list[str], pendientes: int) -> bool:
+        '''
+        Registra una página leída y decide si se puede dejar de paginar.
+        Parametros:
+            - fechas (list[str]): Fechas de emisión de las filas de la página (DD/MM/AAAA), en orden.
+            - pendientes (int): Filas de la página que no constan como procesadas.
+        Retorna
+            - bool: True si se han alcanzado K páginas seguidas sin facturas pendientes en una tabla de orden descendente.
+        '''
+        self.filas += len(fechas)
+        if not self.activa:
+            return False
+        self._comprobar_orden(fechas)
+        if not self.ordenada:
+            return False
+        self.consecutivas = 0 if pendientes else self.consecutivas + 1
+        # Solo se corta con el orden descendente ya confirmado (ni ascendente ni con todas las fechas iguales hasta ahora)
+        return self._sentido == -1 and self.consecutivas >= self.paginas
@@ -1,59 +1,201 @@
-from playwright.async_api import async_playwright, Playwright, Browser, Page, BrowserContext
-from config import TEMP_DOWNLOAD_ROOT, HEADLESS_MODE
+from playwright.async_api import async_playwright, Playwright, Browser, Page, BrowserContext, APIRequestContext
+from config import TEMP_DOWNLOAD_ROOT, HEADLESS_MODE, PERFIL_PERSISTENTE, FILTRO_RED_ACTIVO
+from utils.pool_navegadores import pool_navegadores
+from utils.perfil_navegador import preparar_perfil, regenerar_perfil, liberar_perfil, argumentos_cache
+from utils.filtro_red import FiltroRed
+from utils.trazas import iniciar_trazas, detener_trazas
+from logic.logs_logic import log
+import json
 import os
 
 
 ### NAVEGADOR ASINCRONO
 class NavegadorAsync:
     """
-    Clase que encapsula la inicialización, uso y cierre de una sesión 
+    Clase que encapsula la inicialización, uso y cierre de una sesión
     de Playwright Asíncrona.
     """
 
     # === 0. INICIALIZACION DE LA CLASE ===
-    def __init__(self):
+    def __init__(self, portal: str | None = None):
         self.playwright: Playwright | None = None
         self.browser: Browser | None = None
         self.page: Page | None = None
         self.context: BrowserContext | None = None
-        
+        # Portal asociado (necesario para el perfil persistente)
+        self.portal = portal
+        # Indica si el contexto proviene del pool compartido (no se debe cerrar el navegador)
+        self.arrendado: bool = False
+        # Indica si el contexto es persistente (user-data-dir en disco, sin objeto Browser)
+        self.persistente: bool = False
+        self.ruta_perfil: str | None = None
+        self._playwright_propio: bool = False
+        # Filtro de peticiones de red y contadores de ahorro
+        self.filtro_red: FiltroRed | None = None
+        # Contextos clonados abiertos para trabajadores concurrentes
+        self._contextos_trabajo: set[BrowserContext] = set()
+        # Lecturas de memoria registradas en cada reciclaje de contexto durante la ejecución
+        self.lecturas_reciclaje: list[dict] = []
+
         # Aseguramos que el directorio para descargas exista
         os.makedirs(TEMP_DOWNLOAD_ROOT, exist_ok=True)
 
     # === 1. INICIALIZACION DEL NAVEGADOR ===
-    async def iniciar(self):
+    async def iniciar(self, storage_state: str | None = None):
         """
         Inicializa la sesión de Playwright y lanza el navegador.
+        Si el pool compartido está activo (API), arrienda un contexto sobre un navegador ya lanzado.
+        Si el perfil persistente está activo, abre el user-data-dir del portal con su caché HTTP en disco.
+        Si se indica un storage_state, el contexto se crea con esa sesión (cookies y localStorage) ya cargada.
         """
 
-        # A. Iniciación en modo asíncrono y headless
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=HEADLESS_MODE) 
-        
-        # B. Configuración del contexto del navegador
-        self.context = await self.browser.new_context(
+        # A. Perfil persistente por portal (tiene prioridad sobre el pool)
+        if PERFIL_PERSISTENTE and self.portal:
+            self.ruta_perfil = preparar_perfil(self.portal)
+            if self.ruta_perfil:
+                await self._iniciar_persistente(storage_state)
+                return self
+
+        # B. Contexto arrendado del pool de navegadores calientes
+        if pool_navegadores.activo:
+            self.context = await pool_navegadores.nuevo_contexto(**self._opciones_contexto(storage_state))
+            self.browser = self.context.browser
+            self.arrendado = True
+
+        # C. Iniciación en modo asíncrono y headless con navegador propio
+        else:
+            self.playwright = await async_playwright().start()
+            self._playwright_propio = True
+            self.browser = await self.playwright.chromium.launch(headless=HEADLESS_MODE)
+            self.context = await self.browser.new_context(**self._opciones_contexto(storage_state))
+            self.arrendado = False
+
+        # D. Filtrado de peticiones innecesarias antes de abrir la página
+        await self._instrumentar_contexto()
+
+        # E. Creación de una nueva página en el contexto
+        self.page = await self.context.new_page()
+
+        return self
+
+
+    # === 1.1 CONFIGURACION DEL CONTEXTO ===
+    def _opciones_contexto(self, storage_state: str | None = None) -> dict:
+        """
+        Devuelve las opciones comunes de creación del contexto del navegador.
+        """
+        return dict(
+            storage_state=storage_state, # Sesión previa a restaurar (None = contexto limpio)
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36", # User Agent real (Chrome en Windows 10)
             #viewport={'width': 1920, 'height': 1080}, # Resolución de pantalla estándar
             extra_http_headers={"Accept-Language": "es-ES,es;q=0.9"}, # Idioma aceptado (evita que la web cargue versiones raras)
             accept_downloads=True # Permitir descargas
         )
-        # C. Creación de una nueva página en el contexto
-        self.page = await self.context.new_page()
-        
-        return self 
+
+
+    # === 1.2 INICIALIZACION CON PERFIL PERSISTENTE ===
+    async def _iniciar_persistente(self, storage_state: str | None = None):
+        """
+        Lanza Chromium sobre el perfil en disco del portal. Los bundles estáticos de Salesforce
+        (Lightning/Aura) se sirven desde la caché HTTP del perfil en las ejecuciones siguientes.
+        Si el perfil no arranca se regenera vacío y se reintenta una vez.
+        """
+        # A. Reutilizamos el Playwright del pool si está activo
+        if pool_navegadores.activo:
+            self.playwright = pool_navegadores.playwright
+        else:
+            self.playwright = await async_playwright().start()
+            self._playwright_propio = True
+
+        # B. El contexto persistente no admite storage_state: la sesión se restaura tras lanzar (D)
+        opciones = self._opciones_contexto()
+        opciones.pop("storage_state")
+
+        # C. Lanzamiento con recuperación ante perfil dañado
+        try:
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                self.ruta_perfil, headless=HEADLESS_MODE, args=argumentos_cache(), **opciones
+            )
+        except Exception as e:
+            log.warning(f"[PERFIL] Fallo al abrir el perfil de {self.portal}: {e}")
+            liberar_perfil(self.ruta_perfil)
+            regenerar_perfil(self.portal)
+            self.ruta_perfil = preparar_perfil(self.portal)
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                self.ruta_perfil, headless=HEADLESS_MODE, args=argumentos_cache(), **opciones
+            )
+
+        self.browser = None
+        self.persistente = True
+        await self._instrumentar_contexto()
+
+        # D. Restauración de la sesión guardada completa: cookies y localStorage de cada origen
+        if storage_state:
+            with open(storage_state, encoding="utf-8") as f:
+                estado = json.load(f)
+            if estado.get("cookies"):
+                await self.context.add_cookies(estado["cookies"])
+            await self._restaurar_origenes(estado.get("origins", []))
+
+        # E. El contexto persistente ya abre una pestaña inicial
+        self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+
+
+    async def _restaurar_origenes(self, origenes: list[dict]):
+        """
+        Escribe el localStorage guardado de cada origen en el contexto persistente, como hace Playwright con
+        `storage_state` en un contexto normal: una pestaña auxiliar visita cada origen con la respuesta simulada
+        (sin cargar el portal) y rellena su almacenamiento.
+        """
+        origenes = [o for o in origenes if o.get("localStorage")]
+        if not origenes:
+            return
+        pagina = await self.context.new_page()
+        try:
+            await pagina.route("**/*", lambda route: route.fulfill(status=200, content_type="text/html", body="<html></html>"))
+            for origen in origenes:
+                await pagina.goto(origen["origin"])
+                await pagina.evaluate("items => { for (const {name, value} of items) localStorage.setItem(name, value); }",
+                                      origen["localStorage"])
+        except Exception as e:
+            log.warning(f"[PERFIL] No se pudo restaurar el localStorage de la sesión guardada: {e}")
+        finally:
+            await pagina.close()
+
+
+    # === 1.3 FILTRADO DE PETICIONES DE RED ===
+    async def _instalar_filtro_red(self, context: BrowserContext | None = None):
+        """
+        Instala el filtro de peticiones (imágenes, fuentes, analítica, chats...) sobre el contexto indicado o el actual.
+        """
+        if not FILTRO_RED_ACTIVO:
+            return
+        if self.filtro_red is None:
+            self.filtro_red = FiltroRed()
+        await self.filtro_red.instalar(context or self.context, persistente=self.persistente)
+
+    async def _instrumentar_contexto(self, context: BrowserContext | None = None):
+        """
+        Prepara un contexto recién creado: filtro de red y, si está activa, traza en anillo para guardar los fallos.
+        """
+        context = context or self.context
+        await self._instalar_filtro_red(context)
+        await iniciar_trazas(context, self.portal or "navegador")
 
 
     # === 2. NAVEGACION A UNA URL ===
     async def goto_url(self, url: str, timeout_ms: int = 60000) -> Page:
         """
         Navega a la URL especificada.
+        No se espera a `networkidle`: el long-polling de Salesforce puede impedir que la red quede inactiva.
+        Cada flujo espera después al elemento concreto que necesita (formulario de login, tabla...).
         """
 
         await self.page.goto(
-            url, 
-            wait_until="networkidle", # Cambiado de domcontentloaded a networkidle
+            url,
+            wait_until="domcontentloaded",
             timeout=timeout_ms
-        ) 
+        )
         return self.page
 
 
@@ -61,13 +203,48 @@ class NavegadorAsync:
     async def cerrar(self):
         """
         Cierra el navegador y detiene el contexto.
+        Con un contexto arrendado solo se cierra el contexto; el navegador sigue vivo en el pool.
+        Con un perfil persistente se cierra el contexto (que es el propio navegador) y se libera el perfil.
         """
 
-        if self.browser:
+        # A. Informe de peticiones filtradas y cierre de contextos cuando no hay un navegador propio que los cierre
+        if self.filtro_red and self.context:
+            log.info(self.filtro_red.resumen())
+
+        for context in list(self._contextos_trabajo):
+            try:
+                await detener_trazas(context)
+                await context.close()
+            except Exception:
+                pass
+        self._contextos_trabajo.clear()
+
+        if self.context:
+            await detener_trazas(self.context)
+        if (self.arrendado or self.persistente) and self.context:
+            try:
+                await self.context.close()
+            except Exception:
+                pass
+
+        # B. Cierre del navegador propio y de Playwright
+        if not self.arrendado and self.browser:
             await self.browser.close()
-        if self.playwright:
+        if self._playwright_propio and self.playwright:
             await self.playwright.stop()
-    
+
+        if self.persistente:
+            liberar_perfil(self.ruta_perfil)
+
+        self.page = None
+        self.context = None
+        self.browser = None
+        self.playwright = None
+        self.arrendado = False
+        self.persistente = False
+        self.ruta_perfil = None
+        self._playwright_propio = False
+
 
     # === 4. OBTENER LA PAGINA ACTUAL ===
     def get_page(self) -> Page:
@@ -76,4 +253,140 @@ class NavegadorAsync:
         """
         if not self.page:
             raise RuntimeError("El navegador no ha sido inicializado.")
-        return self.page
\ No newline at end of file
+        return self.page
+
+
+    # === 5. PAGINAS DE TRABAJO PARA PROCESAMIENTO CONCURRENTE ===
+    async def abrir_pagina_trabajo(self, clonar_sesion: bool = True) -> Page:
+        """
+        Abre una página para un trabajador concurrente que comparte la sesión autenticada.
+        Se crea en un contexto nuevo clonado del storage_state actual (aislado en memoria y eventos);
+        con perfil persistente (sin objeto Browser) se abre como una pestaña más del mismo contexto.
+        Con `clonar_sesion=False` el contexto nuevo se abre limpio, para que el trabajador haga su propio login
+        (una sesión del servidor independiente); el perfil persistente no lo admite y lanza RuntimeError.
+        """
+        # A. Perfil persistente: no se pueden crear contextos adicionales
+        if self.persistente or not self.browser:
+            if not clonar_sesion:
+                raise RuntimeError("El perfil persistente no admite contextos con una sesión independiente.")
+            return await self.context.new_page()
+
+        # B. Clonado de la sesión (o contexto limpio) en un contexto nuevo, del pool o del navegador propio
+        estado = await self.context.storage_state() if clonar_sesion else None
+        if self.arrendado:
+            context = await pool_navegadores.nuevo_contexto(**self._opciones_contexto(estado))
+        else:
+            context = await self.browser.new_context(**self._opciones_contexto(estado))
+        await self._instrumentar_contexto(context)
+        self._contextos_trabajo.add(context)
+
+        return await context.new_page()
+
+
+    async def cerrar_pagina_trabajo(self, page: Page):
+        """
+        Cierra una página de trabajo y, si tenía un contexto clonado propio, también el contexto.
+        """
+        try:
+            if page.context in self._contextos_trabajo:
+                self._contextos_trabajo.discard(page.context)
+                await detener_trazas(page.context)
+                await page.context.close()
+            elif not page.is_closed():
+                await page.close()
+        except Exception as e:
+            log.debug(f"Error cerrando página de trabajo: {e}")
+
+
+    # === 6. RECICLAJE DE PAGINAS Y CONTEXTOS ===
+    async def reciclar_pagina(self, page: Page) -> Page:
+        """
+        Sustituye una página por otra nueva con la misma sesión, liberando la memoria del renderizador.
+        Para la página principal se crea un contexto nuevo a partir del storage_state actual y se cierra el anterior;
+        para una página de trabajo se abre otra clonada y se cierra la antigua.
+        Con perfil persistente solo se sustituye la pestaña dentro del mismo contexto.
+        """
+        # A. Páginas de trabajo de los trabajadores concurrentes
+        if page is not self.page:
+            nueva = await self.abrir_pagina_trabajo()
+            await self.cerrar_pagina_trabajo(page)
+            return nueva
+
+        # B. Página principal con perfil persistente: nueva pestaña en el mismo contexto
+        if self.persistente or not self.browser:
+            nueva = await self.context.new_page()
+            await page.close()
+            self.page = nueva
+            return nueva
+
+        # C. Página principal: contexto nuevo con la sesión actual y cierre del anterior
+        estado = await self.context.storage_state()
+        anterior = self.context
+        if self.arrendado:
+            self.context = await pool_navegadores.nuevo_contexto(**self._opciones_contexto(estado))
+        else:
+            self.context = await self.browser.new_context(**self._opciones_contexto(estado))
+        await self._instrumentar_contexto()
+        self.page = await self.context.new_page()
+
+        try:
+            await detener_trazas(anterior)
+            await anterior.close()
+        except Exception as e:
+            log.debug(f"Error cerrando el contexto reciclado: {e}")
+        return self.page
+
+
+    # === 7. REINICIO DEL CONTEXTO PARA REINTENTOS DE LOGIN ===
+    async def reiniciar_contexto(self):
+        """
+        Descarta el contexto actual (cookies, almacenamiento y páginas) y abre uno limpio sin relanzar Chromium.
+        Con perfil persistente el contexto es el propio navegador: se borran sus cookies y se abre una pestaña nueva.
+        Si el navegador no está iniciado o se ha caído, se hace un arranque completo.
+        """
+        # A. Sin navegador vivo: arranque completo
+        if not self.context or (self.browser and not self.browser.is_connected()):
+            if self.context or self.browser:
+                await self.cerrar()
+            return await self.iniciar()
+
+        # B. Perfil persistente: limpieza de la sesión dentro del mismo contexto
+        if self.persistente or not self.browser:
+            await self.context.clear_cookies()
+            nueva = await self.context.new_page()
+            for pagina in list(self.context.pages):
+                if pagina is not nueva:
+                    await pagina.close()
+            self.page = nueva
+            return self
+
+        # C. Contexto nuevo sobre el mismo navegador (propio o del pool) y cierre del anterior
+        anterior = self.context
+        if self.arrendado:
+            self.context = await pool_navegadores.nuevo_contexto(**self._opciones_contexto())
+        else:
+            self.context = await self.browser.new_context(**self._opciones_contexto())
+        await self._instrumentar_contexto()
+        self.page = await self.context.new_page()
+
+        try:
+            await detener_trazas(anterior)
+            await anterior.close()
+        except Exception as e:
+            log.debug(f"Error cerrando el contexto anterior: {e}")
+        return self
+
+
+    # === 8. CLIENTE HTTP CON LA SESION ACTUAL ===
+    async def nuevo_cliente_http(self) -> APIRequestContext:
+        """
+        Crea un cliente HTTP de Playwright (sin navegador ni renderizado) con las cookies de la sesión actual,
+        para repetir llamadas Aura y descargar documentos sin interactuar con la página.
+        """
+        motor = self.playwright or pool_navegadores.playwright
+        opciones = self._opciones_contexto(await self.context.storage_state())
+        return await motor.request.new_context(
+            storage_state=opciones["storage_state"],
+            user_agent=opciones["user_agent"],
+            extra_http_headers=opciones["extra_http_headers"],
+        )
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import socket
+from logic.logs_logic import log
+from config import PERFILES_ROOT, PERFIL_CACHE_MAX_MB
+
+
+# === 0. ESTADO DE USO DE LOS PERFILES ===
+# Un user-data-dir solo puede abrirlo un proceso Chromium a la vez
+_perfiles_en_uso: set[str] = set()
+
+# Subcarpetas de caché que pueden vaciarse sin perder cookies ni preferencias
+_CARPETAS_CACHE = [
+    os.path.join("Default", "Cache"),
+    os.path.join("Default", "Code Cache"),
+    os.path.join("Default", "Service Worker", "CacheStorage"),
+    "GrShaderCache",
+    "ShaderCache",
+]
+
+# Ficheros de bloqueo que deja Chromium si el proceso anterior terminó de forma abrupta
+_FICHEROS_BLOQUEO = ["SingletonLock", "SingletonCookie", "SingletonSocket"]
+
+
+# === 1. GESTIÓN DEL DIRECTORIO DE PERFIL ===
+
+# PRF.1 Tamaño en disco de un directorio
+def _tamano_mb(ruta: str) -> float:
+    '''
+    Calcula el tamaño total en MB de un directorio de forma recursiva.
+    Parametros:
+        - ruta (str): Directorio a medir.
+    Retorna
+        - float: Tamaño en megabytes.
+    '''
+    total = 0
+    for raiz, _, ficheros in os.walk(ruta):
+        for nombre in ficheros:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError:
+                continue
+    return total / (1024 * 1024)
+
+
+# PRF.2 Detección de un perfil corrupto
+def _perfil_corrupto(ruta: str) -> bool:
+    '''
+    Comprueba que las preferencias del perfil son un JSON legible.
+    Un fichero Preferences truncado (apagado abrupto) impide arrancar Chromium con ese perfil.
+    '''
+    preferencias = os.path.join(ruta, "Default", "Preferences")
+    if not os.path.isfile(preferencias):
+        return False
+    try:
+        with open(preferencias, encoding="utf-8") as f:
+            json.load(f)
+        return False
+    except Exception:
+        return True
+
+
+# PRF.3 Regeneración de un perfil dañado
+def regenerar_perfil(portal: str) -> str:
+    '''
+    Aparta el perfil actual (se conserva una única copia `.corrupto` para diagnóstico) y crea uno vacío.
+    Parametros:
+        - portal (str): Portal al que pertenece el perfil.
+    Retorna
+        - str: Ruta del nuevo perfil vacío.
+    '''
+    ruta = os.path.join(PERFILES_ROOT, portal.lower())
+    apartado = ruta + ".corrupto"
+    log.warning(f"[PERFIL] Regenerando perfil persistente de {portal}.")
+    try:
+        if os.path.isdir(apartado):
+            shutil.rmtree(apartado, ignore_errors=True)
+        if os.path.isdir(ruta):
+            os.rename(ruta, apartado)
+    except Exception as e:
+        log.error(f"[PERFIL] No se pudo apartar el perfil {ruta}: {e}")
+        shutil.rmtree(ruta, ignore_errors=True)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+# PRF.4 Comprobación del proceso dueño del bloqueo
+def _bloqueo_activo(ruta: str) -> bool:
+    '''
+    Indica si el SingletonLock del perfil pertenece a un Chromium que sigue vivo (otro proceso de la API, otro robot...).
+    En Linux y macOS el bloqueo es un enlace simbólico a "<host>-<pid>"; en Windows es un fichero que el sistema
+    mantiene abierto mientras el navegador vive, así que basta con intentar borrarlo.
+    Parametros:
+        - ruta (str): Directorio del perfil.
+    Retorna
+        - bool: True si el bloqueo está en uso (o no puede comprobarse); False si no hay bloqueo o es huérfano.
+    '''
+    bloqueo = os.path.join(ruta, "SingletonLock")
+    if not os.path.lexists(bloqueo):
+        return False
+    try:
+        destino = os.readlink(bloqueo)
+    except OSError:
+        try:
+            os.remove(bloqueo)
+            return False
+        except OSError:
+            return True
+
+    host, _, pid = destino.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        # Bloqueo de otra máquina (perfil en disco compartido) o ilegible: no se puede saber si sigue vivo
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# PRF.5 Preparación del perfil antes de lanzar Chromium
+def preparar_perfil(portal: str) -> str | None:
+    '''
+    Devuelve el user-data-dir del portal listo para `launch_persistent_context`:
+    limpia bloqueos huérfanos, recupera perfiles corruptos y aplica el límite de tamaño de caché.
+    Si el bloqueo del perfil pertenece a un Chromium vivo (otro proceso), no se toca y se usa el modo no persistente.
+    Parametros:
+        - portal (str): Portal al que pertenece el perfil.
+    Retorna
+        - str: Ruta del perfil reservado para este proceso.
+        - None: Si el perfil ya está en uso por otra ejecución concurrente (de este u otro proceso).
+    '''
+    ruta = os.path.join(PERFILES_ROOT, portal.lower())
+
+    # A. Un mismo perfil no puede compartirse entre ejecuciones simultáneas
+    if ruta in _perfiles_en_uso:
+        log.debug(f"[PERFIL] Perfil de {portal} ocupado por otra ejecución.")
+        return None
+    os.makedirs(ruta, exist_ok=True)
+
+    # B. Eliminación de bloqueos de un proceso anterior que no cerró limpio (solo si ese proceso ya no existe)
+    if _bloqueo_activo(ruta):
+        log.info(f"[PERFIL] Perfil de {portal} bloqueado por otro proceso Chromium activo. Se usa un contexto no persistente.")
+        return None
+    for nombre in _FICHEROS_BLOQUEO:
+        fichero = os.path.join(ruta, nombre)
+        if os.path.lexists(fichero):
+            try:
+                os.remove(fichero)
+            except OSError:
+                pass
+
+    # C. Recuperación de perfiles corruptos
+    if _perfil_corrupto(ruta):
+        ruta = regenerar_perfil(portal)
+
+    # D. Límite de tamaño: si se supera se vacían solo las cachés
+    tamano = _tamano_mb(ruta)
+    if tamano > PERFIL_CACHE_MAX_MB:
+        log.info(f"[PERFIL] Perfil de {portal} ocupa {tamano:.0f} MB (> {PERFIL_CACHE_MAX_MB} MB). Vaciando cachés.")
+        for carpeta in _CARPETAS_CACHE:
+            shutil.rmtree(os.path.join(ruta, carpeta), ignore_errors=True)
+
+    _perfiles_en_uso.add(ruta)
+    return ruta
+
+
+# PRF.6 Liberación del perfil al cerrar el navegador
+def liberar_perfil(ruta: str | None) -> None:
+    '''
+    Marca el perfil como disponible para la siguiente ejecución.
+    '''
+    if ruta:
+        _perfiles_en_uso.discard(ruta)
+
+
+# PRF.7 Argumentos de Chromium para limitar la caché HTTP
+def argumentos_cache() -> list[str]:
+    '''
+    Devuelve los argumentos de lanzamiento que acotan la caché de disco de Chromium.
+    La mitad del presupuesto se reserva a la caché HTTP; el resto cubre Code Cache y datos de sesión.
+    '''
+    return [f"--disk-cache-size={PERFIL_CACHE_MAX_MB * 1024 * 1024 // 2}"]
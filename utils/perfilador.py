@@ -0,0 +1,195 @@
+import functools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from playwright.async_api import Page, Locator
+from logic.logs_logic import log
+from utils.tenants import tenant_actual
+from config import PERFILADOR_ACCIONES, PERFILADOR_TOP, PERFILADOR_INFORMES_MAX, ACCIONES_ROOT
+
+# Raíz del proyecto: los puntos de llamada se buscan en la pila dentro de ella
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ESTE_FICHERO = os.path.abspath(__file__)
+
+# Métodos instrumentados de Page y Locator
+METODOS_PAGE = ("goto", "click", "fill", "wait_for_selector", "wait_for_load_state", "wait_for_timeout", "inner_text", "text_content")
+METODOS_LOCATOR = ("click", "fill", "wait_for", "inner_text", "text_content", "get_attribute")
+# Métodos que devuelven un gestor de contexto (se mide desde que se entra hasta que se sale del bloque)
+METODOS_CONTEXTO = ("expect_download",)
+
+
+def _selector(objeto, args: tuple) -> str:
+    # En Page el selector es el primer argumento; un Locator lleva el suyo
+    if isinstance(objeto, Locator):
+        return getattr(getattr(objeto, "_impl_obj", None), "_selector", None) or repr(objeto)
+    return str(args[0])[:120] if args and isinstance(args[0], (str, int, float)) else ""
+
+
+### MEDICION DE UN BLOQUE "async with" (expect_download)
+class _ContextoMedido:
+    def __init__(self, contexto, al_salir):
+        self._contexto = contexto
+        self._al_salir = al_salir
+        self._inicio = 0.0
+
+    async def __aenter__(self):
+        self._inicio = time.monotonic()
+        return await self._contexto.__aenter__()
+
+    async def __aexit__(self, *excepcion):
+        try:
+            return await self._contexto.__aexit__(*excepcion)
+        finally:
+            self._al_salir((time.monotonic() - self._inicio) * 1000, excepcion[0] is not None)
+
+
+### PERFILADOR DE ACCIONES DE PLAYWRIGHT
+class PerfiladorAcciones:
+    """
+    Clase que mide el tiempo real de cada acción de Playwright (click, fill, esperas, lecturas de texto,
+    navegación y descargas) y lo agrupa por punto del código que la lanza, función y selector. Al final de
+    cada ejecución escribe un informe con las acciones y funciones que más tiempo han consumido, para saber
+    si una ejecución lenta se fue en esperas de carga, modales, descargas o navegación.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, activo: bool = PERFILADOR_ACCIONES, ruta: str = ACCIONES_ROOT):
+        self.activo = activo
+        self.ruta = ruta
+        self._instalado = False
+        # {portal: {(punto, función, método, selector): [ms, ...]}} y fallos por la misma clave
+        self._muestras: dict[str, dict[tuple[str, str, str, str], list[float]]] = {}
+        self._fallos: dict[str, dict[tuple[str, str, str, str], int]] = {}
+
+
+    # === 1. INSTRUMENTACION DE PLAYWRIGHT ===
+    def instalar(self) -> None:
+        '''
+        Sustituye los métodos instrumentados de Page y Locator por versiones que miden su duración.
+        Se hace una sola vez por proceso y solo si el perfilador está activo.
+        '''
+        if not self.activo or self._instalado:
+            return
+        for clase, metodos in ((Page, METODOS_PAGE), (Locator, METODOS_LOCATOR)):
+            for nombre in metodos:
+                setattr(clase, nombre, self._envolver(getattr(clase, nombre)))
+        for nombre in METODOS_CONTEXTO:
+            setattr(Page, nombre, self._envolver_contexto(getattr(Page, nombre)))
+        self._instalado = True
+        log.info("[PERFIL] Perfilado de acciones de Playwright activo.")
+
+    def _envolver(self, metodo):
+        @functools.wraps(metodo)
+        async def medido(objeto, *args, **kwargs):
+            origen = self._origen()
+            inicio, fallo = time.monotonic(), True
+            try:
+                resultado = await metodo(objeto, *args, **kwargs)
+                fallo = False
+                return resultado
+            finally:
+                self._registrar(origen, metodo.__name__, _selector(objeto, args), (time.monotonic() - inicio) * 1000, fallo)
+        return medido
+
+    def _envolver_contexto(self, metodo):
+        @functools.wraps(metodo)
+        def medido(objeto, *args, **kwargs):
+            origen = self._origen()
+            return _ContextoMedido(metodo(objeto, *args, **kwargs),
+                                   lambda ms, fallo: self._registrar(origen, metodo.__name__, "", ms, fallo))
+        return medido
+
+    @staticmethod
+    def _origen() -> tuple[str, str, str]:
+        '''
+        Busca en la pila el primer punto de llamada del proyecto y el portal al que pertenece.
+        Retorna
+            - tuple: (fichero:línea, función, portal).
+        '''
+        punto = funcion = portal = ""
+        marco = sys._getframe(2)
+        while marco is not None and not portal:
+            fichero = marco.f_code.co_filename
+            if fichero.startswith(_RAIZ) and fichero != _ESTE_FICHERO and "site-packages" not in fichero:
+                if not punto:
+                    punto = f"{os.path.relpath(fichero, _RAIZ)}:{marco.f_lineno}"
+                    funcion = marco.f_code.co_name
+                # El portal sale del módulo (endesa_logic, enel_logic) o de la función del robot que llama
+                nombre = f"{os.path.basename(fichero)} {marco.f_code.co_name}".lower()
+                portal = "endesa" if "endesa" in nombre else "enel" if "enel" in nombre else ""
+            marco = marco.f_back
+        return punto, funcion, portal
+
+    def _registrar(self, origen: tuple[str, str, str], metodo: str, selector: str, ms: float, fallo: bool) -> None:
+        punto, funcion, portal = origen
+        # Las acciones que no se pueden atribuir a un portal no entran en ningún informe
+        if not portal:
+            return
+        portal = tenant_actual().clave(portal)
+        clave = (punto, funcion, metodo, selector)
+        self._muestras.setdefault(portal, {}).setdefault(clave, []).append(ms)
+        if fallo:
+            fallos = self._fallos.setdefault(portal, {})
+            fallos[clave] = fallos.get(clave, 0) + 1
+
+
+    # === 2. INFORME DE LA EJECUCION ===
+    def informe(self, portal: str) -> str | None:
+        '''
+        Escribe el informe de la ejecución del portal (acciones y funciones ordenadas por tiempo total) y vacía sus muestras.
+        Parametros:
+            - portal (str): Identificador del portal (con el sufijo del tenant si no es el principal).
+        Retorna
+            - str: Ruta del informe escrito.
+            - None: Si el perfilador no está activo o no hay muestras.
+        '''
+        muestras = self._muestras.pop(portal, {})
+        fallos = self._fallos.pop(portal, {})
+        if not self.activo or not muestras:
+            return None
+
+        # A. Ranking por punto de llamada y selector
+        acciones = sorted((
+            {"punto": punto, "funcion": funcion, "metodo": metodo, "selector": selector, "llamadas": len(ms),
+             "total_ms": round(sum(ms)), "media_ms": round(sum(ms) / len(ms)), "max_ms": round(max(ms)),
+             "fallos": fallos.get((punto, funcion, metodo, selector), 0)}
+            for (punto, funcion, metodo, selector), ms in muestras.items()
+        ), key=lambda a: a["total_ms"], reverse=True)
+
+        # B. Tiempo agregado por función (paso del flujo que contiene las acciones)
+        funciones: dict[str, dict] = {}
+        for accion in acciones:
+            datos = funciones.setdefault(accion["funcion"], {"funcion": accion["funcion"], "llamadas": 0, "total_ms": 0})
+            datos["llamadas"] += accion["llamadas"]
+            datos["total_ms"] += accion["total_ms"]
+        por_funcion = sorted(funciones.values(), key=lambda f: f["total_ms"], reverse=True)
+
+        # C. Resumen en el log y fichero del informe (se conservan los últimos PERFILADOR_INFORMES_MAX por portal)
+        total = sum(a["total_ms"] for a in acciones)
+        lineas = [f"[PERFIL] {portal}: {sum(a['llamadas'] for a in acciones)} acciones de Playwright, {total / 1000:.0f} s en total."]
+        for f in por_funcion[:PERFILADOR_TOP]:
+            lineas.append(f"\t{f['total_ms'] / 1000:8.1f} s  {f['llamadas']:5d} acciones  {f['funcion']}")
+        for a in acciones[:PERFILADOR_TOP]:
+            lineas.append(f"\t{a['total_ms'] / 1000:8.1f} s  {a['llamadas']:5d} x {a['metodo']}({a['selector'][:60]})  {a['punto']}"
+                          + (f"  [{a['fallos']} fallos]" if a["fallos"] else ""))
+        log.info("\n".join(lineas))
+
+        nombre = f"{portal.replace('@', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        ruta = os.path.join(self.ruta, nombre)
+        try:
+            os.makedirs(self.ruta, exist_ok=True)
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump({"portal": portal, "total_ms": total, "funciones": por_funcion, "acciones": acciones}, f, indent=2, ensure_ascii=False)
+            previos = sorted(n for n in os.listdir(self.ruta) if n.startswith(f"{portal.replace('@', '_')}_2"))
+            for antiguo in previos[:-PERFILADOR_INFORMES_MAX]:
+                os.remove(os.path.join(self.ruta, antiguo))
+        except Exception as e:
+            log.warning(f"[PERFIL] No se pudo guardar el informe de acciones: {e}")
+            return None
+        return ruta
+
+
+# Instancia compartida del perfilador de acciones
+perfilador_acciones = PerfiladorAcciones()
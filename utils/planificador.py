@@ -0,0 +1,209 @@
+import json
+import math
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from logic.logs_logic import log
+from utils.latencias import registro_latencias
+from config import (BUSQUEDAS_PATH, TABLE_LIMIT, PLANIFICADOR_BUSQUEDAS, PLAN_COSTE_BUSQUEDA_S, PLAN_COSTE_PAGINA_S,
+                    PLAN_CUPS_GLOBAL_SIN_HISTORICO, DIVISION_VENTANAS)
+
+# Filas que muestra cada página de la tabla de resultados
+FILAS_POR_PAGINA = 5
+
+# Estrategias de búsqueda en modo lista
+POR_CUP = "por_cup"
+GLOBAL = "global"
+
+
+def clave_cup(cup: str | None) -> str:
+    # CUPS20 y CUPS22 del mismo suministro comparten los 20 primeros caracteres
+    return (cup or "").strip().upper()[:20]
+
+
+# Formato de las fechas de los filtros de búsqueda (DD/MM/YYYY)
+FORMATO_FECHA = "%d/%m/%Y"
+
+
+def dividir_ventana(fecha_desde: str, fecha_hasta: str) -> tuple[tuple[str, str], tuple[str, str]] | None:
+    '''
+    Divide un rango de fechas (ambos extremos incluidos) en dos mitades consecutivas sin solapamiento.
+    Parametros:
+        - fecha_desde (str): Inicio del rango (DD/MM/YYYY).
+        - fecha_hasta (str): Fin del rango (DD/MM/YYYY).
+    Retorna
+        - tuple: ((desde, mitad), (mitad + 1 día, hasta)).
+        - None: Si el rango es de un único día o las fechas no tienen el formato esperado.
+    '''
+    try:
+        desde = datetime.strptime(fecha_desde.strip(), FORMATO_FECHA)
+        hasta = datetime.strptime(fecha_hasta.strip(), FORMATO_FECHA)
+    except ValueError:
+        return None
+    dias = (hasta - desde).days
+    if dias < 1:
+        return None
+    mitad = desde + timedelta(days=dias // 2)
+    return ((fecha_desde, mitad.strftime(FORMATO_FECHA)),
+            ((mitad + timedelta(days=1)).strftime(FORMATO_FECHA), fecha_hasta))
+
+
+### FILTRO LOCAL DE CUPS SOBRE LA TABLA DE RESULTADOS
+class FiltroCups:
+    """
+    Clase que decide qué filas de la tabla se procesan cuando se busca sin filtro de CUP y registra
+    qué facturas ha encontrado para cada CUP solicitado y cuántas filas se han leído en total.
+    """
+
+    def __init__(self, cups: list[str], descartar: bool = True):
+        '''
+        Parametros:
+            - cups (list): CUPS solicitados.
+            - descartar (bool): Si es False solo se registran las coincidencias (búsqueda ya filtrada por CUP en el portal).
+        '''
+        self.coincidencias: dict[str, list[str]] = {clave_cup(c): [] for c in cups}
+        self.descartar = descartar
+        self.filas_leidas = 0
+        # Filas que anuncia la paginación de la tabla (cuenta aunque se deje de paginar antes del final)
+        self.filas_tabla = 0
+        # False si alguna tabla o ventana no se ha recorrido entera (fallo, paginación interrumpida...): un CUP sin
+        # coincidencias no puede darse entonces por "sin facturas"
+        self.completa = True
+
+    def contiene(self, cup: str | None) -> bool:
+        # Las filas sin CUP legible no se descartan (no se puede saber a quién pertenecen)
+        clave = clave_cup(cup)
+        return not self.descartar or not clave or clave in self.coincidencias
+
+    def admite(self, cup: str | None, numero_factura: str) -> bool:
+        '''
+        Indica si una fila de la tabla pertenece a alguno de los CUPS solicitados y, si es así, la registra.
+        Parametros:
+            - cup (str): CUP de la fila.
+            - numero_factura (str): Número de factura de la fila.
+        Retorna
+            - bool: True si la fila debe procesarse.
+        '''
+        self.filas_leidas += 1
+        clave = clave_cup(cup)
+        if clave in self.coincidencias:
+            self.coincidencias[clave].append(numero_factura)
+        return self.contiene(cup)
+
+    def facturas_de(self, cup: str) -> list[str]:
+        return self.coincidencias.get(clave_cup(cup), [])
+
+
+### PLANIFICADOR DE BUSQUEDAS POR LISTA DE CUPS
+class PlanificadorBusquedas:
+    """
+    Clase que elige, para una lista de CUPS, entre una búsqueda por CUP (recarga y filtros en cada una)
+    o una única búsqueda global filtrada localmente, comparando el coste estimado de ambas con el número
+    de filas que devolvieron las búsquedas anteriores. Los recuentos se guardan entre ejecuciones.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = BUSQUEDAS_PATH):
+        self.ruta = ruta
+        # {portal: {"global": filas, "cups": {cup: filas}}} observado en la ejecución en curso (portal con el sufijo del tenant)
+        self._ejecucion: dict[str, dict] = {}
+
+
+    # === 1. PERSISTENCIA ===
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def guardar(self, portal: str) -> None:
+        '''
+        Vuelca al fichero de estado los recuentos de filas observados en la ejecución del portal.
+        Parametros:
+            - portal (str): Identificador del portal.
+        '''
+        observado = self._ejecucion.pop(portal, None)
+        if not observado:
+            return
+        estado = self._leer()
+        datos = estado.setdefault(portal, {"global": None, "cups": {}})
+        if observado.get("global") is not None:
+            datos["global"] = observado["global"]
+            datos["instante_global"] = time.time()
+        datos.setdefault("cups", {}).update(observado.get("cups", {}))
+
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(estado, f, indent=2)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.warning(f"[PLAN] No se pudo guardar el histórico de búsquedas: {e}")
+
+
+    # === 2. REGISTRO DE RESULTADOS ===
+    def registrar_cup(self, portal: str, cup: str, filas: int) -> None:
+        self._ejecucion.setdefault(portal, {}).setdefault("cups", {})[clave_cup(cup)] = filas
+
+    def registrar_global(self, portal: str, filtro: FiltroCups) -> None:
+        observado = self._ejecucion.setdefault(portal, {})
+        observado["global"] = max(filtro.filas_leidas, filtro.filas_tabla)
+        for clave, facturas in filtro.coincidencias.items():
+            observado.setdefault("cups", {})[clave] = len(facturas)
+
+
+    # === 3. ELECCION DE ESTRATEGIA ===
+    def _coste_pagina(self, portal: str) -> float:
+        # Mediana real del cambio de página si ya hay muestras suficientes (las latencias son del portal, comunes a todos los tenants)
+        muestras = registro_latencias.historico.get(portal.split("@")[0], {}).get("pagina_siguiente", [])
+        return statistics.median(muestras) / 1000 if len(muestras) >= 5 else PLAN_COSTE_PAGINA_S
+
+    def planificar(self, portal: str, cups: list[str], trabajadores: int = 1) -> str:
+        '''
+        Elige la estrategia de búsqueda para una lista de CUPS.
+        Parametros:
+            - portal (str): Identificador del portal.
+            - cups (list): CUPS solicitados.
+            - trabajadores (int): Trabajadores concurrentes disponibles para la búsqueda por CUP.
+        Retorna
+            - str: POR_CUP o GLOBAL.
+        '''
+        if not PLANIFICADOR_BUSQUEDAS or len(cups) < 2:
+            return POR_CUP
+        historico = self._leer().get(portal, {})
+        filas_global = historico.get("global")
+
+        # A. Sin histórico de la búsqueda global se decide solo por tamaño de la lista
+        if filas_global is None:
+            estrategia = GLOBAL if len(cups) >= PLAN_CUPS_GLOBAL_SIN_HISTORICO else POR_CUP
+            log.info(f"\t[PLAN] Sin histórico de búsqueda global: {len(cups)} CUPS -> {estrategia}.")
+            return estrategia
+
+        # B. Una búsqueda global que llegó al límite de filas de la tabla no devolvería todas las facturas,
+        #    salvo que se divida en ventanas de fechas (cada división añade búsquedas)
+        busquedas_global = 1
+        if filas_global >= TABLE_LIMIT:
+            if not DIVISION_VENTANAS:
+                log.info(f"\t[PLAN] La búsqueda global devolvió {filas_global} filas (límite {TABLE_LIMIT}) -> {POR_CUP}.")
+                return POR_CUP
+            # Bisección: N ventanas finales bajo el límite requieren 2N-1 búsquedas
+            busquedas_global = 2 * math.ceil((filas_global + 1) / TABLE_LIMIT) - 1
+
+        # C. Coste estimado: los CUPS sin histórico cuentan con la media de los conocidos (al menos una página)
+        conocidos = historico.get("cups", {})
+        media = statistics.mean(conocidos.values()) if conocidos else FILAS_POR_PAGINA
+        coste_pagina = self._coste_pagina(portal)
+        paginas_cup = sum(max(1, math.ceil(conocidos.get(clave_cup(c), media) / FILAS_POR_PAGINA)) for c in cups)
+        coste_por_cup = (len(cups) * PLAN_COSTE_BUSQUEDA_S + paginas_cup * coste_pagina) / max(1, min(trabajadores, len(cups)))
+        coste_global = busquedas_global * PLAN_COSTE_BUSQUEDA_S + max(1, math.ceil(filas_global / FILAS_POR_PAGINA)) * coste_pagina
+
+        estrategia = GLOBAL if coste_global < coste_por_cup else POR_CUP
+        log.info(f"\t[PLAN] {len(cups)} CUPS: coste estimado por CUP {coste_por_cup:.0f}s frente a global {coste_global:.0f}s -> {estrategia}.")
+        return estrategia
+
+
+# Instancia compartida del planificador de búsquedas
+planificador_busquedas = PlanificadorBusquedas()
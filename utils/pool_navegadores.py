@@ -0,0 +1,159 @@
+import asyncio
+from playwright.async_api import async_playwright, Playwright, Browser, BrowserContext
+from logic.logs_logic import log
+from config import HEADLESS_MODE, POOL_NAVEGADORES_TAMANO, POOL_INTERVALO_SALUD
+
+
+### POOL DE NAVEGADORES COMPARTIDOS
+class PoolNavegadores:
+    """
+    Clase que mantiene procesos Chromium de larga duración para la API.
+    Los robots arriendan contextos sobre navegadores ya lanzados, evitando el arranque en frío
+    de Playwright y Chromium en cada ejecución. Un bucle de salud relanza los navegadores caídos.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, tamano: int = POOL_NAVEGADORES_TAMANO):
+        self.tamano = max(1, tamano)
+        self.playwright: Playwright | None = None
+        self.navegadores: list[Browser | None] = []
+        self.arrendamientos: list[int] = []
+        self.activo = False
+
+        self._lock = asyncio.Lock()
+        self._tarea_salud: asyncio.Task | None = None
+
+
+    # === 1. ARRANQUE DEL POOL ===
+    async def iniciar(self):
+        '''
+        Arranca Playwright, lanza los navegadores del pool y el bucle de comprobación de salud.
+        Retorna
+            - PoolNavegadores: La propia instancia, ya operativa.
+        '''
+        if self.activo:
+            return self
+
+        # A. Arranque único de Playwright para todo el pool
+        log.info(f"[POOL] Iniciando pool de {self.tamano} navegador(es) Chromium.")
+        self.playwright = await async_playwright().start()
+
+        # B. Lanzamiento de los navegadores
+        self.navegadores = [await self._lanzar_navegador(i) for i in range(self.tamano)]
+        self.arrendamientos = [0] * self.tamano
+        self.activo = True
+
+        # C. Bucle en segundo plano de salud de los navegadores
+        self._tarea_salud = asyncio.create_task(self._bucle_salud())
+        return self
+
+
+    # === 2. ARRENDAMIENTO DE CONTEXTOS ===
+    async def nuevo_contexto(self, **opciones) -> BrowserContext:
+        '''
+        Crea un contexto aislado sobre el navegador sano con menos arrendamientos activos.
+        El arrendamiento se libera automáticamente al cerrar el contexto.
+        Parametros:
+            - **opciones: Argumentos de `Browser.new_context` (user agent, storage_state, etc).
+        Retorna
+            - BrowserContext: Contexto nuevo listo para abrir páginas.
+        '''
+        if not self.activo:
+            raise RuntimeError("El pool de navegadores no está iniciado.")
+
+        # A. Selección del navegador menos cargado, relanzándolo si se ha caído
+        async with self._lock:
+            indice = min(range(self.tamano), key=lambda i: self.arrendamientos[i])
+            if not self._esta_sano(indice):
+                await self._relanzar(indice)
+            navegador = self.navegadores[indice]
+            self.arrendamientos[indice] += 1
+
+        # B. Creación del contexto y registro de la liberación al cerrarse
+        try:
+            context = await navegador.new_context(**opciones)
+        except Exception:
+            self._liberar(indice, navegador)
+            raise
+
+        context.on("close", lambda _: self._liberar(indice, navegador))
+        log.debug(f"[POOL] Contexto arrendado en navegador {indice} ({self.arrendamientos[indice]} activos).")
+        return context
+
+
+    # === 3. CIERRE DEL POOL ===
+    async def cerrar(self):
+        '''
+        Detiene el bucle de salud, cierra todos los navegadores y detiene Playwright.
+        '''
+        self.activo = False
+
+        # A. Parada del bucle de salud
+        if self._tarea_salud:
+            self._tarea_salud.cancel()
+            try:
+                await self._tarea_salud
+            except asyncio.CancelledError:
+                pass
+            self._tarea_salud = None
+
+        # B. Cierre de navegadores y de Playwright
+        for navegador in self.navegadores:
+            if navegador and navegador.is_connected():
+                try:
+                    await navegador.close()
+                except Exception as e:
+                    log.warning(f"[POOL] Error cerrando navegador: {e}")
+        self.navegadores = []
+        self.arrendamientos = []
+
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+        log.info("[POOL] Pool de navegadores detenido.")
+
+
+    # === 4. GESTION INTERNA DE NAVEGADORES ===
+    async def _lanzar_navegador(self, indice: int) -> Browser:
+        '''
+        Lanza un proceso Chromium para la posición indicada del pool.
+        '''
+        log.debug(f"[POOL] Lanzando navegador {indice}...")
+        return await self.playwright.chromium.launch(headless=HEADLESS_MODE)
+
+    def _esta_sano(self, indice: int) -> bool:
+        navegador = self.navegadores[indice]
+        return navegador is not None and navegador.is_connected()
+
+    async def _relanzar(self, indice: int):
+        '''
+        Sustituye un navegador caído por uno nuevo. Los contextos del proceso caído ya no son utilizables.
+        '''
+        log.warning(f"[POOL] Navegador {indice} caído. Relanzando...")
+        self.arrendamientos[indice] = 0
+        self.navegadores[indice] = await self._lanzar_navegador(indice)
+
+    def _liberar(self, indice: int, navegador: Browser):
+        # Solo se descuenta si el navegador sigue siendo el mismo (no ha sido relanzado)
+        if indice < len(self.navegadores) and self.navegadores[indice] is navegador:
+            self.arrendamientos[indice] = max(0, self.arrendamientos[indice] - 1)
+
+    async def _bucle_salud(self):
+        '''
+        Comprueba periódicamente la conexión de cada navegador y relanza los caídos.
+        '''
+        while self.activo:
+            await asyncio.sleep(POOL_INTERVALO_SALUD)
+            async with self._lock:
+                for indice in range(self.tamano):
+                    if self._esta_sano(indice):
+                        continue
+                    try:
+                        await self._relanzar(indice)
+                    except Exception as e:
+                        log.error(f"[POOL] No se pudo relanzar el navegador {indice}: {e}")
+
+
+# === INSTANCIA COMPARTIDA ===
+# Solo se activa desde el ciclo de vida de la API; los scripts sueltos siguen lanzando su propio navegador.
+pool_navegadores = PoolNavegadores()
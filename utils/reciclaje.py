@@ -0,0 +1,150 @@
+import time
+from playwright.async_api import Page, CDPSession
+from logic.logs_logic import log
+from config import RECICLAJE_MAX_FILAS, RECICLAJE_MAX_MB, RECICLAJE_MAX_MINUTOS
+
+
+### CONTROL DE RECICLAJE DE CONTEXTOS
+class ControlReciclaje:
+    """
+    Clase que decide cuándo sustituir la página/contexto de trabajo por uno nuevo para acotar
+    la memoria de Chromium en ejecuciones largas. Recicla tras N filas, M MB de memoria del
+    renderizador o T minutos (un umbral a 0 lo desactiva) y guarda una lectura por reciclaje.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, robot, etiqueta: str = "principal",
+                 max_filas: int = RECICLAJE_MAX_FILAS, max_mb: int = RECICLAJE_MAX_MB, max_minutos: int = RECICLAJE_MAX_MINUTOS):
+        '''
+        Parametros:
+            - robot (NavegadorAsync): Navegador que abre la página de sustitución.
+            - etiqueta (str): Nombre del trabajador (para el log y las lecturas).
+            - max_filas (int): Filas procesadas antes de reciclar.
+            - max_mb (int): Memoria del renderizador (heap JS) antes de reciclar.
+            - max_minutos (int): Antigüedad máxima de la página de trabajo.
+        '''
+        self.robot = robot
+        self.etiqueta = etiqueta
+        self.max_filas = max_filas
+        self.max_mb = max_mb
+        self.max_minutos = max_minutos
+
+        self.filas = 0
+        self.inicio = time.monotonic()
+        # Historial de lecturas de memoria en cada reciclaje, para ajustar los umbrales
+        self.lecturas: list[dict] = []
+        # Última página abierta por un reciclaje y aún no adoptada por el llamador (ver `adoptar`)
+        self.pagina: Page | None = None
+        self._cdp: dict[int, CDPSession] = {}
+
+
+    # === 1. CONTABILIDAD DE TRABAJO ===
+    def contar_filas(self, n: int) -> None:
+        self.filas += n
+
+    @property
+    def activo(self) -> bool:
+        return bool(self.max_filas or self.max_mb or self.max_minutos)
+
+    def adoptar(self, page: Page) -> Page:
+        '''
+        Devuelve la página con la que debe seguir el llamador: la abierta por un reciclaje dentro de la tabla,
+        si la hay, o la suya. La página pendiente se olvida al adoptarla, para no volver a una página
+        ya cerrada si después se sustituye por otra vía (página caída, nueva página de trabajo...).
+        Parametros:
+            - page (Page): Página de trabajo que tiene el llamador.
+        Retorna
+            - Page: Página de trabajo vigente.
+        '''
+        nueva, self.pagina = self.pagina, None
+        return nueva or page
+
+
+    # === 2. LECTURA DE MEMORIA DEL RENDERIZADOR ===
+    async def medir_memoria(self, page: Page) -> float:
+        '''
+        Devuelve la memoria del heap JS de la página en MB (métrica JSHeapTotalSize vía CDP),
+        con `performance.memory` como alternativa si no hay sesión CDP disponible.
+        Parametros:
+            - page (Page): Página a medir.
+        Retorna
+            - float: Memoria en MB (0.0 si no se puede medir).
+        '''
+        try:
+            cdp = self._cdp.get(id(page))
+            if cdp is None:
+                cdp = await page.context.new_cdp_session(page)
+                await cdp.send("Performance.enable")
+                self._cdp[id(page)] = cdp
+            metricas = await cdp.send("Performance.getMetrics")
+            valores = {m["name"]: m["value"] for m in metricas.get("metrics", [])}
+            return valores.get("JSHeapTotalSize", 0) / (1024 * 1024)
+        except Exception:
+            try:
+                return (await page.evaluate("performance.memory ? performance.memory.totalJSHeapSize : 0")) / (1024 * 1024)
+            except Exception:
+                return 0.0
+
+
+    # === 3. DECISION DE RECICLAJE ===
+    async def debe_reciclar(self, page: Page) -> str | None:
+        '''
+        Evalúa los umbrales configurados.
+        Parametros:
+            - page (Page): Página de trabajo actual.
+        Retorna
+            - str: Motivo del reciclaje si se ha superado algún umbral.
+            - None: Si la página puede seguir usándose.
+        '''
+        if not self.activo:
+            return None
+
+        minutos = (time.monotonic() - self.inicio) / 60
+        if self.max_filas and self.filas >= self.max_filas:
+            return f"{self.filas} filas"
+        if self.max_minutos and minutos >= self.max_minutos:
+            return f"{minutos:.1f} min"
+        if self.max_mb:
+            memoria = await self.medir_memoria(page)
+            if memoria >= self.max_mb:
+                return f"{memoria:.0f} MB"
+        return None
+
+
+    # === 4. RECICLAJE ===
+    async def reciclar(self, page: Page, motivo: str = "") -> Page:
+        '''
+        Sustituye la página (y su contexto) por una nueva con la misma sesión y reinicia los contadores.
+        El llamador es responsable de reanudar el trabajo (misma página de la tabla o siguiente CUP).
+        Parametros:
+            - page (Page): Página de trabajo a sustituir.
+            - motivo (str): Umbral que ha disparado el reciclaje.
+        Retorna
+            - Page: Nueva página de trabajo.
+        '''
+        # A. Lectura previa al reciclaje
+        memoria_antes = await self.medir_memoria(page)
+        minutos = (time.monotonic() - self.inicio) / 60
+        self._cdp.pop(id(page), None)
+
+        # B. Sustitución de la página por otra con la sesión clonada
+        nueva = await self.robot.reciclar_pagina(page)
+        self.pagina = nueva
+
+        # C. Registro de la lectura y reinicio de contadores
+        lectura = {
+            "trabajador": self.etiqueta,
+            "motivo": motivo,
+            "filas": self.filas,
+            "minutos": round(minutos, 1),
+            "memoria_mb_antes": round(memoria_antes, 1),
+            "memoria_mb_despues": round(await self.medir_memoria(nueva), 1),
+        }
+        self.lecturas.append(lectura)
+        self.robot.lecturas_reciclaje.append(lectura)
+        log.info(f"\t[RECICLAJE] {self.etiqueta}: contexto reciclado por {motivo} "
+                 f"(filas={lectura['filas']}, {lectura['minutos']} min, "
+                 f"{lectura['memoria_mb_antes']} MB -> {lectura['memoria_mb_despues']} MB)")
+        self.filas = 0
+        self.inicio = time.monotonic()
+        return nueva
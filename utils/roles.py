@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import time
+from logic.logs_logic import log
+from config import ROLES_PATH, ROLES_CACHE_HORAS, ROLES_RONDAS_INACTIVO
+
+
+### CATALOGO DE ROLES Y SU HISTORIAL DE FACTURAS
+class CatalogoRoles:
+    """
+    Clase que guarda entre ejecuciones, por cuenta del portal, la lista de roles leída del menú
+    "Cambio de rol" (con una vigencia máxima) y cuántas filas de factura tuvo cada rol en las últimas
+    ejecuciones. Con ese historial se identifican los roles que llevan varias ejecuciones sin facturas,
+    que se sondean de forma barata antes de pagar la búsqueda completa en el navegador.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, ruta: str = ROLES_PATH, ttl_horas: int = ROLES_CACHE_HORAS, rondas: int = ROLES_RONDAS_INACTIVO):
+        '''
+        Parametros:
+            - ruta (str): Fichero JSON del catálogo.
+            - ttl_horas (int): Vigencia de la lista de roles guardada (0 la desactiva).
+            - rondas (int): Ejecuciones seguidas sin facturas para considerar inactivo un rol (0 lo desactiva).
+        '''
+        self.ruta = ruta
+        self.ttl_segundos = ttl_horas * 3600
+        self.rondas = rondas
+        # Filas observadas por rol en la ejecución en curso {cuenta: {rol: filas}}
+        self._ejecucion: dict[str, dict[str, int]] = {}
+
+
+    # === 1. PERSISTENCIA ===
+    @staticmethod
+    def _cuenta(usuario: str | None) -> str:
+        # El usuario se resume con un hash para no escribir credenciales en el fichero
+        return hashlib.sha1((usuario or "").encode("utf-8")).hexdigest()[:12]
+
+    def _leer(self) -> dict:
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _escribir(self, estado: dict) -> None:
+        temporal = self.ruta + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(estado, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+        except Exception as e:
+            log.warning(f"[ROLES] No se pudo guardar el catálogo de roles: {e}")
+
+
+    # === 2. LISTA DE ROLES ===
+    def roles(self, usuario: str | None) -> list[str] | None:
+        '''
+        Devuelve la lista de roles guardada de la cuenta si sigue vigente.
+        Parametros:
+            - usuario (str): Usuario de acceso al portal.
+        Retorna
+            - list[str]: Roles guardados.
+            - None: Si no hay lista guardada, ha caducado o la caché está desactivada.
+        '''
+        if not self.ttl_segundos:
+            return None
+        datos = self._leer().get(self._cuenta(usuario), {})
+        antiguedad = time.time() - datos.get("instante", 0)
+        if not datos.get("roles") or antiguedad > self.ttl_segundos:
+            return None
+        log.debug(f"[ROLES] Lista de roles guardada disponible ({int(antiguedad / 60)} min).")
+        return list(datos["roles"])
+
+    def guardar_roles(self, usuario: str | None, roles: list[str]) -> None:
+        estado = self._leer()
+        datos = estado.setdefault(self._cuenta(usuario), {})
+        datos["roles"] = list(roles)
+        datos["instante"] = time.time()
+        self._escribir(estado)
+
+    def invalidar(self, usuario: str | None) -> None:
+        '''
+        Descarta la lista de roles guardada (por ejemplo, si un rol guardado ya no existe en el menú).
+        '''
+        estado = self._leer()
+        datos = estado.get(self._cuenta(usuario))
+        if datos and datos.pop("instante", None) is not None:
+            log.info("[ROLES] Lista de roles guardada descartada; se leerá de nuevo el menú en la próxima ejecución.")
+            self._escribir(estado)
+
+
+    # === 3. HISTORIAL DE FACTURAS POR ROL ===
+    def registrar(self, usuario: str | None, rol: str, filas: int) -> None:
+        self._ejecucion.setdefault(self._cuenta(usuario), {})[rol] = filas
+
+    def inactivo(self, usuario: str | None, rol: str) -> bool:
+        '''
+        Indica si el rol no ha tenido ninguna fila de factura en las últimas `rondas` ejecuciones registradas.
+        '''
+        if not self.rondas:
+            return False
+        historial = self._leer().get(self._cuenta(usuario), {}).get("historial", {}).get(rol, [])
+        return len(historial) >= self.rondas and not any(historial[-self.rondas:])
+
+    def guardar(self, usuario: str | None) -> None:
+        '''
+        Añade al historial de cada rol las filas observadas en la ejecución en curso.
+        Parametros:
+            - usuario (str): Usuario de acceso al portal.
+        '''
+        observado = self._ejecucion.pop(self._cuenta(usuario), None)
+        if not observado:
+            return
+        estado = self._leer()
+        historial = estado.setdefault(self._cuenta(usuario), {}).setdefault("historial", {})
+        for rol, filas in observado.items():
+            historial[rol] = (historial.get(rol, []) + [filas])[-max(self.rondas, 1) * 2:]
+        self._escribir(estado)
+
+
+# === INSTANCIA COMPARTIDA ===
+catalogo_roles = CatalogoRoles()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import time
+from playwright.async_api import BrowserContext
+from logic.logs_logic import log
+from config import SESIONES_ROOT, SESION_TTL_MINUTOS
+
+
+### ALMACEN DE SESIONES AUTENTICADAS
+class AlmacenSesiones:
+    """
+    Clase que persiste en disco el `storage_state` de Playwright (cookies y localStorage)
+    por portal y cuenta, para reutilizar sesiones válidas y evitar el login completo.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, carpeta: str = SESIONES_ROOT, ttl_minutos: int = SESION_TTL_MINUTOS):
+        self.carpeta = carpeta
+        self.ttl_segundos = ttl_minutos * 60
+        os.makedirs(self.carpeta, exist_ok=True)
+
+
+    # === 1. RUTA DEL FICHERO DE SESION ===
+    def ruta(self, portal: str, usuario: str | None) -> str:
+        '''
+        Devuelve la ruta del fichero de sesión para un portal y usuario.
+        El usuario se resume con un hash para no escribir credenciales en el nombre del fichero.
+        Parametros:
+            - portal (str): Identificador del portal ("endesa" o "enel").
+            - usuario (str): Usuario de acceso al portal.
+        Retorna
+            - str: Ruta al fichero JSON del storage_state.
+        '''
+        huella = hashlib.sha1((usuario or "").encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.carpeta, f"{portal.lower()}_{huella}.json")
+
+
+    # === 2. CARGA DE SESION VIGENTE ===
+    def cargar(self, portal: str, usuario: str | None) -> str | None:
+        '''
+        Comprueba si existe una sesión guardada dentro del TTL configurado.
+        Parametros:
+            - portal (str): Identificador del portal.
+            - usuario (str): Usuario de acceso al portal.
+        Retorna
+            - str: Ruta del storage_state reutilizable.
+            - None: Si no hay sesión guardada o ha caducado.
+        '''
+        path = self.ruta(portal, usuario)
+        if not os.path.isfile(path):
+            return None
+
+        # A. Verificación de caducidad por antigüedad del fichero
+        antiguedad = time.time() - os.path.getmtime(path)
+        if antiguedad > self.ttl_segundos:
+            log.debug(f"[SESION] Sesión guardada de {portal} caducada ({int(antiguedad / 60)} min).")
+            self.invalidar(portal, usuario)
+            return None
+
+        log.debug(f"[SESION] Sesión guardada de {portal} disponible ({int(antiguedad / 60)} min).")
+        return path
+
+
+    # === 3. GUARDADO DE SESION ===
+    async def guardar(self, portal: str, usuario: str | None, context: BrowserContext) -> None:
+        '''
+        Guarda el storage_state del contexto autenticado, con permisos restringidos al propietario.
+        Parametros:
+            - portal (str): Identificador del portal.
+            - usuario (str): Usuario de acceso al portal.
+            - context (BrowserContext): Contexto con la sesión iniciada.
+        '''
+        path = self.ruta(portal, usuario)
+        try:
+            await context.storage_state(path=path)
+            os.chmod(path, 0o600)
+            log.debug(f"[SESION] Sesión de {portal} guardada en {path}")
+        except Exception as e:
+            log.warning(f"[SESION] No se pudo guardar la sesión de {portal}: {e}")
+
+
+    # === 4. INVALIDACION DE SESION ===
+    def invalidar(self, portal: str, usuario: str | None) -> None:
+        '''
+        Elimina la sesión guardada (caducada o rechazada por el portal).
+        '''
+        path = self.ruta(portal, usuario)
+        try:
+            if os.path.isfile(path):
+                os.remove(path)
+        except Exception as e:
+            log.warning(f"[SESION] No se pudo eliminar la sesión {path}: {e}")
+
+
+# === INSTANCIA COMPARTIDA ===
+almacen_sesiones = AlmacenSesiones()
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pydantic import BaseModel, field_validator
+from typing import Optional
+from logic.logs_logic import log
+from config import (TENANTS_PATH, TENANTS_ROOT, TEMP_DOWNLOAD_ROOT, GRUPO_EMPRESARIAL, USER_ENDESA, PASSWORD_ENDESA, USER_ENEL,
+                    PASSWORD_ENEL, ID_SHEET_ENDESA, ID_FOLDER_ENDESA_PDF, ID_SHEET_ENEL, ID_FOLDER_ENEL_PDF, DESTINATARIOS_FACTURAS,
+                    ENDESA_WORKERS_CUPS, ENEL_WORKERS_ROLES, DOWNLOAD_FOLDERS, REGISTRO_FOLDERS_PROCESADAS, REGISTRO_FOLDERS_ENVIADAS)
+
+# Nombre del tenant definido por las variables de entorno (conserva las rutas y claves de estado de siempre)
+TENANT_PRINCIPAL = "principal"
+
+
+### TENANT (GRUPO EMPRESARIAL O CUENTA DE PORTAL)
+class Tenant(BaseModel):
+    """
+    Clase que agrupa todo lo que distingue a un grupo empresarial o cuenta de portal: credenciales,
+    filtro de grupo, destino en Google (Sheets y Drive), destinatarios, carpetas locales y límites de concurrencia.
+    """
+
+    # === 0. IDENTIFICACION ===
+    nombre: str
+
+    # === 1. PORTALES ===
+    grupo_empresarial: Optional[str] = None
+    usuario_endesa: Optional[str] = None
+    password_endesa: Optional[str] = None
+    usuario_enel: Optional[str] = None
+    password_enel: Optional[str] = None
+    # CUPS Endesa que se procesan si la ejecución no indica una lista (vacía = búsqueda global)
+    cups_endesa: list[str] = []
+
+    # === 2. GOOGLE Y CORREO ===
+    id_sheet_endesa: Optional[str] = None
+    id_folder_endesa_pdf: Optional[str] = None
+    id_sheet_enel: Optional[str] = None
+    id_folder_enel_pdf: Optional[str] = None
+    destinatarios: list[str] = []
+
+    # === 3. CONCURRENCIA PROPIA ===
+    workers_cups: int = ENDESA_WORKERS_CUPS
+    workers_roles: int = ENEL_WORKERS_ROLES
+
+    # === 4. CARPETAS LOCALES (se derivan del nombre si no se indican) ===
+    carpetas_descarga: dict[str, str] = {}
+    registro_procesadas: dict[str, str] = {}
+    registro_enviadas: dict[str, str] = {}
+
+    @field_validator("nombre")
+    @classmethod
+    def _nombre_valido(cls, valor: str) -> str:
+        # El nombre forma parte de rutas y claves de estado
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", valor or ""):
+            raise ValueError(f"Nombre de tenant no válido: '{valor}' (solo letras, números, '-' y '_')")
+        return valor
+
+    @field_validator("workers_cups", "workers_roles")
+    @classmethod
+    def _minimo_un_trabajador(cls, valor: int) -> int:
+        return max(1, valor)
+
+    def clave(self, portal: str) -> str:
+        '''
+        Identificador del portal para este tenant en el estado compartido (sesiones, perfiles, circuito, históricos).
+        El tenant principal conserva el identificador del portal sin sufijo.
+        '''
+        return portal if self.nombre == TENANT_PRINCIPAL else f"{portal}@{self.nombre}"
+
+    def credenciales(self, portal: str) -> tuple[str | None, str | None]:
+        if portal == "endesa":
+            return self.usuario_endesa, self.password_endesa
+        return self.usuario_enel, self.password_enel
+
+
+# === CARGA DE LA LISTA DE TENANTS ===
+
+# TEN.1 Carpetas de un tenant adicional con la misma estructura que las del principal
+def _carpetas_tenant(nombre: str, carpetas: dict[str, str]) -> dict[str, str]:
+    raiz = os.path.join(TENANTS_ROOT, nombre)
+    propias = {clave: os.path.join(raiz, os.path.relpath(ruta, TEMP_DOWNLOAD_ROOT)) for clave, ruta in carpetas.items()}
+    for ruta in propias.values():
+        os.makedirs(ruta, exist_ok=True)
+    return propias
+
+
+# TEN.2 Tenant principal a partir de las variables de entorno
+def _tenant_principal() -> Tenant:
+    return Tenant(
+        nombre=TENANT_PRINCIPAL, grupo_empresarial=GRUPO_EMPRESARIAL,
+        usuario_endesa=USER_ENDESA, password_endesa=PASSWORD_ENDESA, usuario_enel=USER_ENEL, password_enel=PASSWORD_ENEL,
+        id_sheet_endesa=ID_SHEET_ENDESA, id_folder_endesa_pdf=ID_FOLDER_ENDESA_PDF,
+        id_sheet_enel=ID_SHEET_ENEL, id_folder_enel_pdf=ID_FOLDER_ENEL_PDF, destinatarios=DESTINATARIOS_FACTURAS,
+        carpetas_descarga=DOWNLOAD_FOLDERS, registro_procesadas=REGISTRO_FOLDERS_PROCESADAS, registro_enviadas=REGISTRO_FOLDERS_ENVIADAS,
+    )
+
+
+# TEN.3 Lectura del fichero de tenants
+def cargar_tenants(ruta: str = TENANTS_PATH) -> list[Tenant]:
+    '''
+    Devuelve el tenant principal seguido de los definidos en el fichero JSON de tenants (si existe).
+    Los valores de texto admiten referencias a variables de entorno (${VARIABLE}) para no escribir contraseñas
+    en el fichero. Una entrada llamada "principal" sustituye al tenant de las variables de entorno.
+    Parametros:
+        - ruta (str): Fichero JSON con una lista de tenants.
+    Retorna
+        - list[Tenant]: Tenants configurados, sin nombres repetidos.
+    '''
+    tenants = {TENANT_PRINCIPAL: _tenant_principal()}
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            entradas = json.load(f)
+    except FileNotFoundError:
+        return list(tenants.values())
+    except json.JSONDecodeError as e:
+        log.error(f"[TENANTS] Fichero de tenants {ruta} no válido: {e}")
+        return list(tenants.values())
+
+    for entrada in entradas:
+        datos = {campo: os.path.expandvars(valor) if isinstance(valor, str) else valor for campo, valor in entrada.items()}
+        try:
+            tenant = Tenant(**datos)
+        except Exception as e:
+            log.error(f"[TENANTS] Tenant descartado ({entrada.get('nombre')}): {e}")
+            continue
+        if tenant.nombre != TENANT_PRINCIPAL:
+            tenant.carpetas_descarga = tenant.carpetas_descarga or _carpetas_tenant(tenant.nombre, DOWNLOAD_FOLDERS)
+            tenant.registro_procesadas = tenant.registro_procesadas or _carpetas_tenant(tenant.nombre, REGISTRO_FOLDERS_PROCESADAS)
+            tenant.registro_enviadas = tenant.registro_enviadas or _carpetas_tenant(tenant.nombre, REGISTRO_FOLDERS_ENVIADAS)
+        else:
+            principal = tenants[TENANT_PRINCIPAL]
+            tenant.carpetas_descarga = tenant.carpetas_descarga or principal.carpetas_descarga
+            tenant.registro_procesadas = tenant.registro_procesadas or principal.registro_procesadas
+            tenant.registro_enviadas = tenant.registro_enviadas or principal.registro_enviadas
+        tenants[tenant.nombre] = tenant
+    return list(tenants.values())
+
+
+# === TENANT DE LA EJECUCION EN CURSO ===
+
+# Cada tarea asyncio hereda una copia del contexto: las tareas lanzadas dentro de un tenant siguen en ese tenant
+_tenant_actual: ContextVar[Tenant | None] = ContextVar("tenant_actual", default=None)
+_principal: Tenant | None = None
+
+
+# TEN.4 Tenant activo
+def tenant_actual() -> Tenant:
+    '''
+    Devuelve el tenant de la ejecución en curso (el principal si no se ha indicado ninguno).
+    '''
+    global _principal
+    tenant = _tenant_actual.get()
+    if tenant is not None:
+        return tenant
+    if _principal is None:
+        _principal = next(t for t in cargar_tenants() if t.nombre == TENANT_PRINCIPAL)
+    return _principal
+
+
+# TEN.5 Ejecución de un bloque dentro de un tenant
+@contextmanager
+def usar_tenant(tenant: Tenant):
+    '''
+    Fija el tenant activo para el bloque (y las tareas que se creen dentro de él).
+    Parametros:
+        - tenant (Tenant): Tenant a activar.
+    '''
+    token = _tenant_actual.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _tenant_actual.reset(token)
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import re
+import shutil
+from collections import deque
+from datetime import datetime
+from playwright.async_api import BrowserContext, Page
+from logic.logs_logic import log
+from config import TRAZAS_FALLOS, TRAZAS_TRAMO_S, TRAZAS_TRAMOS, TRAZAS_MAX_MB, TRAZAS_MAX_CAPTURAS, TRAZAS_ROOT
+
+# Tramos en curso (se sobrescriben) y trazas guardadas tras un fallo
+_ANILLO_ROOT = os.path.join(TRAZAS_ROOT, "anillo")
+_FALLOS_ROOT = os.path.join(TRAZAS_ROOT, "fallos")
+
+# Errores de factura que no dependen del navegador (no merece la pena guardar la traza)
+PASOS_SIN_NAVEGADOR = ("ERROR_GOOGLE", "ERROR_PARSEO", "ERROR_FILES")
+
+
+def _limpio(texto: str | None) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", texto or "")[:40].strip("-")
+
+
+def paso_error(msg_error: str | None) -> str | None:
+    '''
+    Deduce el paso que ha fallado a partir del mensaje de error de una factura.
+    Retorna
+        - str: Código del primer error relacionado con el navegador (ERROR_DESCARGA...).
+        - None: Si no hay errores o son ajenos al navegador (Google, parseo de documentos, email, avisos...).
+    '''
+    codigos = re.findall(r"ERROR_[A-Z]+", msg_error or "")
+    return next((c for c in codigos if c not in PASOS_SIN_NAVEGADOR), None)
+
+
+### TRAZA EN ANILLO DE UN CONTEXTO
+class GrabadorTrazas:
+    """
+    Clase que mantiene activa la traza de Playwright de un contexto (capturas, DOM y red) en tramos de
+    TRAZAS_TRAMO_S segundos, conservando en disco solo los últimos TRAZAS_TRAMOS. Cuando un paso falla,
+    el tramo en curso y los anteriores se copian a una carpeta etiquetada con el CUP, la factura y el paso,
+    de forma que el fallo se puede reproducir en el visor de trazas sin trazar ejecuciones completas.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, context: BrowserContext, nombre: str):
+        self.context = context
+        self.nombre = f"{_limpio(nombre)}_{id(context):x}"
+        self.capturas = 0
+        self._tramos: deque[str] = deque()
+        self._numero = 0
+        self._lock = asyncio.Lock()
+        self._tarea: asyncio.Task | None = None
+
+
+    # === 1. TRAMOS EN ANILLO ===
+    async def iniciar(self) -> None:
+        await self.context.tracing.start(screenshots=True, snapshots=True)
+        await self.context.tracing.start_chunk()
+        self._tarea = asyncio.create_task(self._rotar_periodicamente())
+
+    async def _rotar_periodicamente(self) -> None:
+        # Si el contexto se cierra sin detener la traza, la rotación termina sin más
+        try:
+            while True:
+                await asyncio.sleep(TRAZAS_TRAMO_S)
+                async with self._lock:
+                    await self._cerrar_tramo()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.debug(f"[TRAZA] Rotación de tramos detenida: {e}")
+
+    async def _cerrar_tramo(self) -> None:
+        # El tramo cerrado pasa al anillo (el más antiguo se borra) y se abre el siguiente
+        os.makedirs(_ANILLO_ROOT, exist_ok=True)
+        ruta = os.path.join(_ANILLO_ROOT, f"{self.nombre}_{self._numero}.zip")
+        self._numero += 1
+        await self.context.tracing.stop_chunk(path=ruta)
+        self._tramos.append(ruta)
+        while len(self._tramos) > TRAZAS_TRAMOS:
+            _borrar(self._tramos.popleft())
+        await self.context.tracing.start_chunk()
+
+
+    # === 2. GUARDADO TRAS UN FALLO ===
+    async def guardar(self, etiqueta: str) -> str | None:
+        '''
+        Cierra el tramo en curso y copia los del anillo a una carpeta de fallos con la etiqueta indicada.
+        Parametros:
+            - etiqueta (str): CUP, factura y paso del fallo.
+        Retorna
+            - str: Carpeta con los tramos guardados.
+            - None: Si se ha alcanzado el máximo de capturas del contexto o el guardado falla.
+        '''
+        if self.capturas >= TRAZAS_MAX_CAPTURAS:
+            return None
+        self.capturas += 1
+        destino = os.path.join(_FALLOS_ROOT, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{etiqueta}")
+        async with self._lock:
+            try:
+                await self._cerrar_tramo()
+                os.makedirs(destino, exist_ok=True)
+                for orden, ruta in enumerate(self._tramos):
+                    shutil.copyfile(ruta, os.path.join(destino, f"tramo_{orden}.zip"))
+            except Exception as e:
+                log.warning(f"[TRAZA] No se pudo guardar la traza del fallo {etiqueta}: {e}")
+                return None
+        _limitar_disco()
+        log.info(f"[TRAZA] Traza del fallo guardada en {destino} (ver con 'playwright show-trace').")
+        return destino
+
+    async def detener(self) -> None:
+        if self._tarea:
+            self._tarea.cancel()
+        async with self._lock:
+            try:
+                await self.context.tracing.stop()
+            except Exception:
+                pass
+        while self._tramos:
+            _borrar(self._tramos.popleft())
+
+
+def _borrar(ruta: str) -> None:
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _limitar_disco() -> None:
+    # Se borran las trazas guardadas más antiguas hasta quedar por debajo de TRAZAS_MAX_MB
+    try:
+        carpetas = sorted(os.path.join(_FALLOS_ROOT, n) for n in os.listdir(_FALLOS_ROOT))
+    except FileNotFoundError:
+        return
+    tamanos = {c: sum(os.path.getsize(os.path.join(c, f)) for f in os.listdir(c)) for c in carpetas if os.path.isdir(c)}
+    total = sum(tamanos.values())
+    for carpeta in carpetas:
+        if total <= TRAZAS_MAX_MB * 1024 * 1024:
+            break
+        shutil.rmtree(carpeta, ignore_errors=True)
+        total -= tamanos.get(carpeta, 0)
+
+
+# === REGISTRO DE CONTEXTOS TRAZADOS ===
+_grabadores: dict[BrowserContext, GrabadorTrazas] = {}
+
+
+# TRZ.1 Inicio de la traza en anillo de un contexto nuevo
+async def iniciar_trazas(context: BrowserContext, nombre: str) -> None:
+    if not TRAZAS_FALLOS or context in _grabadores:
+        return
+    grabador = GrabadorTrazas(context, nombre)
+    try:
+        await grabador.iniciar()
+    except Exception as e:
+        log.warning(f"[TRAZA] No se pudo iniciar la traza del contexto: {e}")
+        return
+    _grabadores[context] = grabador
+
+
+# TRZ.2 Fin de la traza de un contexto antes de cerrarlo (se descartan sus tramos)
+async def detener_trazas(context: BrowserContext | None) -> None:
+    grabador = _grabadores.pop(context, None)
+    if grabador:
+        await grabador.detener()
+
+
+# TRZ.3 Guardado de la traza de la página que ha fallado
+async def guardar_traza(page: Page | None, cup: str | None = None, factura: str | None = None, paso: str | None = None) -> str | None:
+    '''
+    Guarda los últimos minutos de traza del contexto de la página, etiquetados con el CUP, la factura y el paso.
+    No hace nada si las trazas están desactivadas o el contexto no se está trazando.
+    Parametros:
+        - page (Page): Página en la que ha fallado el paso.
+        - cup (str): CUP afectado (opcional).
+        - factura (str): Número de factura afectado (opcional).
+        - paso (str): Paso que ha fallado (código de error, excepción...).
+    Retorna
+        - str: Carpeta con la traza guardada, o None.
+    '''
+    if not TRAZAS_FALLOS or page is None:
+        return None
+    grabador = _grabadores.get(page.context)
+    if grabador is None:
+        return None
+    etiqueta = "_".join(p for p in (_limpio(cup), _limpio(factura), _limpio(paso)) if p) or "fallo"
+    return await grabador.guardar(etiqueta)
@@ -0,0 +1,167 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+from logic.logs_logic import log
+from config import POSTPROCESO_TUBERIA, POSTPROCESO_COLA
+
+# Marca de fin de la entrada de una etapa
+_FIN = object()
+
+# Semáforos por nombre de etapa: todas las tuberías en curso (CUPS, ventanas, roles y tenants) comparten el límite de cada etapa
+_limites: dict[str, asyncio.Semaphore] = {}
+
+
+### ETAPA DEL POSTPROCESO DE UNA FACTURA
+class Etapa:
+    """
+    Paso del postproceso de una factura (parseo, OCR, Google, registro, email). La función recibe la factura y los datos
+    que la acompañan (rutas de los documentos descargados) y la modifica; si devuelve False la factura no pasa por las
+    etapas siguientes.
+    """
+
+    def __init__(self, nombre: str, funcion: Callable[..., Awaitable[bool | None]], trabajadores: int = 1):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.trabajadores = max(1, trabajadores)
+
+    def limite(self) -> asyncio.Semaphore:
+        if self.nombre not in _limites:
+            _limites[self.nombre] = asyncio.Semaphore(self.trabajadores)
+        return _limites[self.nombre]
+
+    async def ejecutar(self, factura, datos: tuple) -> bool:
+        async with self.limite():
+            return await self.funcion(factura, *datos) is not False
+
+
+# TUB.1 Postproceso completo de una factura sin colas
+async def procesar_etapas(etapas: list[Etapa], factura, *datos):
+    '''
+    Ejecuta en orden las etapas sobre una factura (procesado fila a fila, sin solapar con el navegador).
+    Parametros:
+        - etapas (list[Etapa]): Etapas del postproceso del portal.
+        - factura: Factura descargada.
+        - datos: Datos que acompañan a la factura (rutas de los documentos).
+    Retorna:
+        - La factura procesada.
+    '''
+    for etapa in etapas:
+        if not await etapa.ejecutar(factura, datos):
+            break
+    return factura
+
+
+### TUBERIA DE POSTPROCESO
+class TuberiaFacturas:
+    """
+    Clase que desacopla la lectura de la tabla en el navegador del postproceso de cada factura. El navegador entrega
+    cada fila descargada con `enviar` y sigue paginando mientras un grupo de trabajadores por etapa la procesa; las
+    colas entre etapas están acotadas, así que si el postproceso se atrasa el navegador espera en `enviar` en lugar
+    de acumular facturas en memoria. Las facturas terminadas se recogen con `terminadas` y, al acabar la tabla, `vaciar`
+    entrega las que aún estaban en curso.
+    """
+
+    # === 0. INICIALIZACION DE LA CLASE ===
+    def __init__(self, etapas: list[Etapa], capacidad: int = POSTPROCESO_COLA, activa: bool = POSTPROCESO_TUBERIA):
+        '''
+        Parametros:
+            - etapas (list[Etapa]): Etapas del postproceso, en orden.
+            - capacidad (int): Facturas que pueden esperar en la cola de cada etapa.
+            - activa (bool): Si es False cada factura se procesa completa dentro de `enviar`.
+        '''
+        self.etapas = etapas
+        self.activa = activa
+        self.en_curso = 0
+        self._colas = [asyncio.Queue(maxsize=max(1, capacidad)) for _ in etapas]
+        # La salida no se acota: la vacía el mismo código que envía (acotarla podría bloquear a los dos)
+        self._salida: asyncio.Queue = asyncio.Queue()
+        self._trabajadores: list[list[asyncio.Task]] = []
+        self._cierre: asyncio.Task | None = None
+
+
+    # === 1. ENTRADA Y SALIDA DE FACTURAS ===
+    async def enviar(self, factura, *datos) -> None:
+        '''
+        Entrega una factura descargada al postproceso; espera si la primera etapa tiene la cola llena.
+        Parametros:
+            - factura: Factura con los datos de la fila.
+            - datos: Datos que necesitan las etapas (rutas de los documentos descargados).
+        '''
+        if not self.activa:
+            if await self._procesar(procesar_etapas(self.etapas, factura, *datos), factura, "postproceso"):
+                self._salida.put_nowait(factura)
+            return
+        if not self._trabajadores:
+            self._trabajadores = [[asyncio.create_task(self._trabajador(i)) for _ in range(etapa.trabajadores)]
+                                  for i, etapa in enumerate(self.etapas)]
+        self.en_curso += 1
+        await self._colas[0].put((factura, datos))
+
+    def terminadas(self) -> list:
+        # Facturas que ya han salido de la última etapa (no espera a las que siguen en curso)
+        facturas = []
+        while not self._salida.empty():
+            facturas.append(self._salida.get_nowait())
+        return facturas
+
+    async def vaciar(self) -> AsyncIterator:
+        '''
+        Cierra la entrada y entrega las facturas según terminan, hasta que no queda ninguna en curso.
+        Retorna:
+            - AsyncIterator: Facturas procesadas pendientes de recoger.
+        '''
+        for factura in self.terminadas():
+            yield factura
+        if not self._trabajadores:
+            return
+        self._cierre = asyncio.create_task(self._cerrar())
+        while (factura := await self._salida.get()) is not _FIN:
+            yield factura
+
+    async def cancelar(self) -> None:
+        '''
+        Detiene los trabajadores (por ejemplo, si se deja de leer la tabla a mitad); las facturas en curso se descartan.
+        '''
+        tareas = [t for grupo in self._trabajadores for t in grupo] + ([self._cierre] if self._cierre else [])
+        if self.en_curso:
+            log.warning(f"\t[TUBERIA] Se descartan {self.en_curso} facturas en postproceso.")
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._trabajadores = []
+
+
+    # === 2. TRABAJADORES POR ETAPA ===
+    async def _trabajador(self, indice: int) -> None:
+        etapa, cola = self.etapas[indice], self._colas[indice]
+        while (elemento := await cola.get()) is not _FIN:
+            factura, datos = elemento
+            seguir = await self._procesar(etapa.ejecutar(factura, datos), factura, etapa.nombre)
+            if seguir and indice + 1 < len(self.etapas):
+                await self._colas[indice + 1].put(elemento)
+                continue
+            # Factura terminada (última etapa, etapa que la retira o fallo)
+            self.en_curso -= 1
+            if seguir is not None:
+                self._salida.put_nowait(factura)
+
+    async def _cerrar(self) -> None:
+        # Cada etapa recibe el fin cuando la anterior ha entregado todas sus facturas
+        for indice, grupo in enumerate(self._trabajadores):
+            for _ in grupo:
+                await self._colas[indice].put(_FIN)
+            await asyncio.gather(*grupo)
+        self._salida.put_nowait(_FIN)
+
+    @staticmethod
+    async def _procesar(paso: Awaitable, factura, nombre: str) -> bool | None:
+        '''
+        Ejecuta un paso del postproceso. Como en el procesado fila a fila, un fallo inesperado descarta la factura.
+        Retorna:
+            - bool: Si la factura sigue a la etapa siguiente.
+            - None: Si el paso ha fallado.
+        '''
+        try:
+            return await paso is not False
+        except Exception as e:
+            log.error(f"\t\t   -->[ERROR] Fallo en '{nombre}' de la factura {getattr(factura, 'numero_factura', '')}: {e}", exc_info=True)
+            return None